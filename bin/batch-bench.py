@@ -0,0 +1,355 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  benchStore.py
+#
+#  Copyright 2021 jose-marcio <martins@jose-marcio.org>
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the  nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#  Throughput over many small images.
+#
+#  N tiles are cropped at random positions of the image (a mosaic of it when
+#  smaller than a tile) and every function is run on each of them, serially,
+#  through a thread pool or through a process pool. Reported : images/s,
+#  latency percentiles of the calls and CPU use.
+#
+#  Inputs, outputs and preparation artefacts of each tile are allocated once,
+#  before timing, and reused by all passes : numbers reflect the libraries,
+#  not allocator churn. skimage functions get their output through out= when
+#  they accept it (erode, open, tophat, gradient) ; the others still allocate
+#  the outputs they return.
+#  Process pool workers are forked once the tiles are prepared and inherit
+#  them.
+#
+#  CPU is the thread CPU time of the calls : with --threads 1 (default), it
+#  covers all the work of both libraries.
+#
+import os
+import sys
+import time
+import math
+
+from datetime import datetime
+
+import argparse as ap
+import multiprocessing as mp
+import concurrent.futures as cf
+
+import numpy as np
+
+import benchOps as bo
+
+kBackends = ['smil', 'skimage']
+kModes = ['serial', 'thread', 'process']
+
+# latency percentiles
+kPercentiles = [50, 90, 99]
+
+# prepared calls of the current (backend, function), inherited by forked
+# workers
+gCalls = []
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def getCliArgs():
+  parser = ap.ArgumentParser()
+
+  parser.add_argument('--debug', help='', action="store_true")
+  parser.add_argument('--verbose', help='', action="store_true")
+
+  parser.add_argument('--image',
+                      default='lena.png',
+                      help='Image file (in images/) or synthetic image (synth:...)',
+                      type=str)
+  parser.add_argument('--binary',
+                      default=False,
+                      help='Image is binary',
+                      action="store_true")
+  parser.add_argument('--squareSe',
+                      default=False,
+                      help='Structuring Element Square (default is Cross)',
+                      action='store_true')
+  parser.add_argument('--seSize',
+                      default=1,
+                      help='Structuring Element size (default : 1)',
+                      type=int)
+  parser.add_argument('--arg', help='Generic argument', type=float)
+
+  parser.add_argument('--funcs',
+                      default=','.join(bo.smilOps.keys()),
+                      help='comma separated list of functions (default : all)',
+                      type=str)
+  parser.add_argument('--which',
+                      default='both',
+                      help='which ? both, smil skimage (default : both)',
+                      type=str)
+  parser.add_argument('--modes',
+                      default=','.join(kModes),
+                      help='comma separated : serial, thread, process',
+                      type=str)
+
+  parser.add_argument('--nTiles',
+                      default=256,
+                      help='number of tiles (default : 256)',
+                      type=int)
+  parser.add_argument('--tile',
+                      default=256,
+                      help='tile side (default : 256)',
+                      type=int)
+  parser.add_argument('--seed',
+                      default=0,
+                      help='seed of the tile positions',
+                      type=int)
+  parser.add_argument('--mosaicDir',
+                      default=os.path.join('var', 'mosaic'),
+                      help='directory of the memory-mapped mosaics',
+                      type=str)
+
+  parser.add_argument('--workers',
+                      default=0,
+                      help='pool workers (default : CPUs)',
+                      type=int)
+  parser.add_argument('--threads',
+                      default=1,
+                      help='Smil threads (default : 1)',
+                      type=int)
+  parser.add_argument('--passes',
+                      default=3,
+                      help='timed passes over the tiles (default : 3)',
+                      type=int)
+
+  cli = parser.parse_args()
+  if cli.workers <= 0:
+    cli.workers = len(os.sched_getaffinity(0))
+  return cli
+
+
+# -----------------------------------------------------------------------------
+# N tiles of side x side, at random positions of a mosaic of the image large
+# enough to hold one tile
+#
+def getTiles(cli, fin):
+  import benchPyramid as bp
+
+  arr = bp.mosaicGet(fin, 1, 1, None, cli.mosaicDir)
+  r = int(math.ceil(cli.tile / min(arr.shape)))
+  if r > 1:
+    arr = bp.mosaicGet(fin, r, r, None, cli.mosaicDir)
+  h, w = arr.shape
+
+  rng = np.random.default_rng(cli.seed)
+  ys = rng.integers(0, h - cli.tile + 1, cli.nTiles)
+  xs = rng.integers(0, w - cli.tile + 1, cli.nTiles)
+  tiles = np.empty((cli.nTiles, cli.tile, cli.tile), dtype=arr.dtype)
+  for i in range(cli.nTiles):
+    tiles[i] = arr[ys[i]:ys[i] + cli.tile, xs[i]:xs[i] + cli.tile]
+  return tiles
+
+
+# -----------------------------------------------------------------------------
+# One call on tile i : latency (ms) and thread CPU time (s)
+#
+def runTask(i):
+  c0 = time.thread_time()
+  t0 = time.perf_counter()
+  gCalls[i]()
+  t1 = time.perf_counter()
+  return 1000. * (t1 - t0), time.thread_time() - c0
+
+
+def newPool(mode, workers):
+  if mode == 'thread':
+    return cf.ThreadPoolExecutor(workers)
+  if mode == 'process':
+    return cf.ProcessPoolExecutor(workers, mp_context=mp.get_context('fork'))
+  return None
+
+
+def runPass(pool, n, workers):
+  if pool is None:
+    return [runTask(i) for i in range(n)]
+  chunk = max(1, n // (4 * workers))
+  return list(pool.map(runTask, range(n), chunksize=chunk))
+
+
+# -----------------------------------------------------------------------------
+# Untimed pass (pool start, first touch of reused buffers) then cli.passes
+# timed ones
+#
+def runBatch(cli, mode):
+  n = len(gCalls)
+  workers = 1 if mode == 'serial' else cli.workers
+  pool = newPool(mode, workers)
+  runPass(pool, n, workers)
+
+  lat = []
+  cpu = 0.
+  wall = 0.
+  for p in range(cli.passes):
+    t0 = time.perf_counter()
+    res = runPass(pool, n, workers)
+    wall += time.perf_counter() - t0
+    lat += [x[0] for x in res]
+    cpu += sum([x[1] for x in res])
+  if not pool is None:
+    pool.shutdown()
+
+  r = {
+    'mode': mode,
+    'workers': workers,
+    'images': n * cli.passes,
+    'wall': wall,
+    'rate': n * cli.passes / wall,
+    'cpu': cpu / wall,
+    'util': cpu / wall / len(os.sched_getaffinity(0)),
+  }
+  pct = np.percentile(lat, kPercentiles)
+  for k, v in zip(kPercentiles, pct):
+    r['p{:d}'.format(k)] = v
+  return r
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def printHeader():
+  h = '  {:8s} {:14s} {:8s} {:>3s} | {:>9s} | {:>9s} {:>9s} {:>9s} | {:>5s} {:>6s}'.format(
+    'Backend', 'Function', 'Mode', 'W', 'images/s', 'p50 (ms)', 'p90', 'p99',
+    'CPU', 'util')
+  print(h)
+  print('-' * (len(h) + 3))
+
+
+def printBatch(backend, fs, r):
+  print('  {:8s} {:14s} {:8s} {:3d} | {:9.1f} | {:9.3f} {:9.3f} {:9.3f} | {:5.1f} {:5.1f}%'.format(
+    backend, fs, r['mode'], r['workers'], r['rate'], r['p50'], r['p90'],
+    r['p99'], r['cpu'], 100. * r['util']))
+
+
+def saveBatch(cli, node, results):
+  if not os.path.isdir(node):
+    os.mkdir(node)
+  b, _ = os.path.splitext(cli.image)
+  prefix = 'bin' if cli.binary else 'gray'
+  fName = '{:s}-{:s}-batch.csv'.format(prefix, b)
+
+  h = ['backend', 'function', 'se', 'tile', 'tiles', 'mode', 'workers',
+       'threads', 'images', 'wall', 'rate', 'cpu', 'util']
+  h += ['p{:d}'.format(k) for k in kPercentiles]
+  with open(os.path.join(node, fName), 'w') as fout:
+    fout.write(';'.join(h) + '\n')
+    for r in results:
+      sl = [
+        r['backend'], r['function'], '{:d}'.format(cli.seSize),
+        '{:d}'.format(cli.tile), '{:d}'.format(cli.nTiles), r['mode'],
+        '{:d}'.format(r['workers']), '{:d}'.format(cli.threads),
+        '{:d}'.format(r['images']), '{:.5f}'.format(r['wall']),
+        '{:.3f}'.format(r['rate']), '{:.3f}'.format(r['cpu']),
+        '{:.5f}'.format(r['util'])
+      ]
+      sl += ['{:.5f}'.format(r['p{:d}'.format(k)]) for k in kPercentiles]
+      fout.write(';'.join(sl) + '\n')
+
+
+# =============================================================================
+#
+#
+#
+def main(args):
+  global gCalls
+
+  cli = getCliArgs()
+
+  import benchSynth as bsy
+
+  fin = os.path.join('images', cli.image)
+  if bsy.isSynth(cli.image):
+    fin = cli.image
+    cli.binary = cli.binary or bsy.isBinary(fin)
+    cli.image = bsy.specName(fin)
+  elif not os.path.isfile(fin):
+    print("Image file {:s} not found".format(cli.image))
+    return 1
+
+  import benchPyramid as bp
+
+  funcs = [f for f in cli.funcs.split(',') if f != '']
+  modes = [m for m in cli.modes.split(',') if m in kModes]
+  backends = kBackends if cli.which == 'both' else [cli.which]
+
+  tiles = getTiles(cli, fin)
+
+  node = os.uname().nodename.split('.')[0]
+
+  dt = datetime.now()
+  print('Date     : {:s}'.format(dt.strftime("%d/%m/%Y %I:%M:%S %p")))
+  print('Image    : {:s}'.format(cli.image))
+  print('Tiles    : {:d} x {:d}x{:d} {:s} ({:.1f} MB)'.format(
+    cli.nTiles, cli.tile, cli.tile, tiles.dtype.name, tiles.nbytes / 2**20))
+  print('Workers  : {:d} - Smil threads {:d}'.format(cli.workers, cli.threads))
+  print()
+  printHeader()
+
+  results = []
+  for backend in backends:
+    if backend == 'smil':
+      bo.setThreads(cli.threads)
+      inputs = [bp.arrayToSmil(tiles[i]) for i in range(cli.nTiles)]
+    else:
+      inputs = [tiles[i] for i in range(cli.nTiles)]
+
+    for fs in funcs:
+      if bo.getOp(backend, fs) is None:
+        continue
+      gCalls = []
+      for imIn in inputs:
+        # artefacts of the previous tile are already bound to its call
+        bo.prepDrop(None)
+        gCalls.append(
+          bo.prepareOp(cli, backend, fs, imIn, cli.seSize, 1, newOut=True))
+
+      for mode in modes:
+        r = runBatch(cli, mode)
+        r.update({'backend': backend, 'function': fs})
+        results.append(r)
+        printBatch(backend, fs, r)
+
+      gCalls = []
+      bo.prepDrop(None)
+    del inputs
+
+  print()
+  saveBatch(cli, node, results)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv))
@@ -0,0 +1,157 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  benchStore.py
+#
+#  Copyright 2021 jose-marcio <martins@jose-marcio.org>
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the  nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#  Checkpoint journal of measurement points.
+#
+#  Each point (backend, function, image, scale, SE, ...) is journaled as JSON
+#  lines appended to a file and synced to disk : the samples taken so far,
+#  the number of calls per sample and, once finished, the timing info. The
+#  last record of a point wins.
+#
+#  On restart, finished points are taken from the journal and unfinished
+#  ones go on from their last samples. The first line of the journal holds
+#  the parameters of the run : a journal written with other parameters is
+#  discarded.
+#
+import os
+import json
+import time
+
+kJournalDir = os.path.join('var', 'journal')
+
+# min delay between two checkpoints of an unfinished point (s)
+kCheckpointDt = 10.
+
+
+class Journal:
+  def __init__(self, path, params=None, resume=True):
+    self.path = path
+    self.params = params
+    self.points = {}
+    self.tags = {}
+    self.lastSave = {}
+    self.fout = None
+
+    if resume and os.path.isfile(path):
+      self.load()
+    if self.fout is None:
+      self.open(truncate=True)
+
+  # ---------------------------------------------------------------------------
+  #
+  #
+  def load(self):
+    with open(self.path) as fin:
+      lines = fin.readlines()
+    recs = []
+    for line in lines:
+      try:
+        recs.append(json.loads(line))
+      except ValueError:
+        # last line cut by a crash
+        break
+    if len(recs) == 0 or recs[0].get('params') != self.params:
+      return
+    for r in recs[1:]:
+      if 'key' in r:
+        self.points[r['key']] = r
+      elif 'tag' in r:
+        self.tags[r['tag']] = r['value']
+    if len(recs) == len(lines):
+      self.open(truncate=False)
+      return
+    # write back the valid records only
+    self.open(truncate=True)
+    for r in recs[1:]:
+      self.write(r)
+
+  def open(self, truncate=False):
+    if os.path.dirname(self.path) != '':
+      os.makedirs(os.path.dirname(self.path), exist_ok=True)
+    self.fout = open(self.path, 'w' if truncate else 'a')
+    if truncate:
+      self.write({'params': self.params})
+
+  def write(self, rec):
+    self.fout.write(json.dumps(rec) + '\n')
+    self.fout.flush()
+    os.fsync(self.fout.fileno())
+
+  # ---------------------------------------------------------------------------
+  #
+  #
+  def get(self, key):
+    return self.points.get(key)
+
+  def isDone(self, key):
+    return self.points.get(key, {}).get('done', False)
+
+  # ---------------------------------------------------------------------------
+  # Unfinished points are checkpointed at most every kCheckpointDt seconds
+  #
+  def save(self, key, samples, number, info=None):
+    done = not info is None
+    now = time.time()
+    if not done and now - self.lastSave.get(key, 0) < kCheckpointDt:
+      return
+    self.lastSave[key] = now
+    rec = {
+      'key': key,
+      'samples': [float(x) for x in samples],
+      'number': int(number),
+      'done': done,
+      'info': info,
+    }
+    self.points[key] = rec
+    self.write(rec)
+
+  # ---------------------------------------------------------------------------
+  # Other durable facts of the run (e.g. sections already stored)
+  #
+  def setTag(self, tag, value=True):
+    self.tags[tag] = value
+    self.write({'tag': tag, 'value': value})
+
+  def getTag(self, tag, default=None):
+    return self.tags.get(tag, default)
+
+  # ---------------------------------------------------------------------------
+  # The run is over : nothing to resume
+  #
+  def close(self, remove=False):
+    if not self.fout is None:
+      self.fout.close()
+      self.fout = None
+    if remove and os.path.isfile(self.path):
+      os.remove(self.path)
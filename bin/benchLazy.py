@@ -0,0 +1,139 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  benchStore.py
+#
+#  Copyright 2021 jose-marcio <martins@jose-marcio.org>
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the  nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#  Lazy imports and startup cost.
+#
+#  Backend modules (smilPython, skimage, scipy) are only imported on first
+#  use : a driver run with --which smil never imports skimage, and a
+#  function only imports the modules it needs. lazyImport() returns a
+#  placeholder whose first attribute access imports the real module, then
+#  takes over its attributes, so that later accesses cost as much as those
+#  to a module. Import times are kept in loadTimes.
+#
+#  Operation registries give functions as (module, name) pairs, resolved
+#  (imported) when the operation is prepared, out of any timed region.
+#
+import os
+import sys
+import time
+import importlib
+
+# import time (s) of the modules loaded through this module
+loadTimes = {}
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def load(name):
+  if name in sys.modules and not isinstance(sys.modules[name], LazyModule):
+    return sys.modules[name]
+  t0 = time.perf_counter()
+  mod = importlib.import_module(name)
+  loadTimes[name] = time.perf_counter() - t0
+  return mod
+
+
+class LazyModule:
+  def __init__(self, name):
+    self.__dict__['_lazyName'] = name
+
+  def __getattr__(self, attr):
+    mod = load(self._lazyName)
+    self.__dict__.update(mod.__dict__)
+    return getattr(mod, attr)
+
+  def __repr__(self):
+    return "<lazy module '{:s}'>".format(self._lazyName)
+
+
+def lazyImport(name):
+  if name in sys.modules:
+    return sys.modules[name]
+  return LazyModule(name)
+
+
+# -----------------------------------------------------------------------------
+# Function of a registry : a callable or a (module, name) pair
+#
+def resolve(ref):
+  if isinstance(ref, tuple):
+    return getattr(load(ref[0]), ref[1])
+  return ref
+
+
+# -----------------------------------------------------------------------------
+# Seconds since the creation of this process (None if unknown). Called on
+# the first line of a script, this is the interpreter startup time.
+#
+def processAge():
+  try:
+    with open('/proc/self/stat') as f:
+      stat = f.read()
+    # fields after the command name, which may contain spaces
+    fields = stat[stat.rindex(')') + 2:].split()
+    start = int(fields[19]) / os.sysconf('SC_CLK_TCK')
+    return time.clock_gettime(time.CLOCK_BOOTTIME) - start
+  except (OSError, ValueError, IndexError, AttributeError):
+    return None
+
+
+# process age when this module is first imported : drivers import it first,
+# this is the interpreter startup time
+kStartAge = processAge()
+
+
+# -----------------------------------------------------------------------------
+# Interpreter startup and driver imports (up to now) times, in ms
+#
+def startupTimes():
+  age = processAge()
+  if kStartAge is None or age is None:
+    return 0., 0.
+  return 1000. * kStartAge, 1000. * (age - kStartAge)
+
+
+def startupString():
+  tStart, tImports = startupTimes()
+  return '{:.0f} ms interpreter - {:.0f} ms imports'.format(tStart, tImports)
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def loadString():
+  return ' - '.join([
+    '{:s} {:.0f} ms'.format(k, 1000. * loadTimes[k])
+    for k in sorted(loadTimes.keys())
+  ])
@@ -0,0 +1,739 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  benchOps.py
+#
+#  Copyright 2021 jose-marcio <martins@jose-marcio.org>
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the  nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#  Operation registry shared by the benchmark drivers.
+#
+#  Each operation is described, for each backend, by a dictionary with two
+#  entries :
+#    * prepare(cli, imIn, sz, px) : builds everything the call needs (output
+#      images, structuring elements, markers, ...) and returns (args, kwargs)
+#    * run(*args, **kwargs)       : the call actually measured, a function
+#      or a (module, name) pair
+#  Smil functions write into an output image : 'out' is its index in args.
+#  skimage functions return their output ; 'outKw' marks those which also
+#  accept a preallocated one (out=). 'modules' lists the modules a local run
+#  function needs.
+#
+#  Backends are imported lazily (benchLazy) : only when an operation of
+#  theirs is prepared, outside of the timed region.
+#
+#  Preparation artefacts which don't depend on the structuring element
+#  (distance maps, gradients, watershed markers, type conversions) are kept
+#  in a cache keyed by (backend, tag, image, scale, SE, dtype), so they are
+#  built once and reused across repeats and structuring element sizes.
+#
+import numpy as np
+
+import benchLazy as bl
+
+kSm = 'smilPython'
+kSkm = 'skimage.morphology'
+kRank = 'skimage.filters.rank'
+kNdi = 'scipy.ndimage'
+kSks = 'skimage.segmentation'
+kSkf = 'skimage.feature'
+
+sp = bl.lazyImport(kSm)
+
+skm = bl.lazyImport(kSkm)
+rank = bl.lazyImport(kRank)
+ndi = bl.lazyImport(kNdi)
+sks = bl.lazyImport(kSks)
+skf = bl.lazyImport(kSkf)
+
+#
+#  ####     ##     ####   #    #  ######
+# #    #   #  #   #    #  #    #  #
+# #       #    #  #       ######  #####
+# #       ######  #       #    #  #
+# #    #  #    #  #    #  #    #  #
+#  ####   #    #   ####   #    #  ######
+#
+# -----------------------------------------------------------------------------
+#
+#
+prepCache = {}
+
+
+def prepKey(cli, backend, tag, px=None, se=None, dtype=None):
+  return (backend, tag, cli.image, px, se, dtype)
+
+
+def prepGet(key, builder):
+  if not key in prepCache:
+    prepCache[key] = builder()
+  return prepCache[key]
+
+
+# -----------------------------------------------------------------------------
+# Drop cached artefacts bound to an image scale other than px. Entries not
+# bound to an image (structuring elements : px is None) are kept.
+#
+def prepDrop(px=None):
+  for k in list(prepCache.keys()):
+    if k[3] is None:
+      continue
+    if px is None or k[3] != px:
+      del prepCache[k]
+
+
+# -----------------------------------------------------------------------------
+# Smil thread count. OMP_NUM_THREADS, when set by the caller, is already taken
+# into account by Smil at startup : this is just an explicit override.
+#
+def setThreads(nt=0):
+  if nt > 0:
+    sp.Core.getInstance().setNumberOfThreads(nt)
+
+
+def getThreads():
+  return sp.Core.getInstance().getNumberOfThreads()
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def smilType(im):
+  return im.getTypeAsString()
+
+
+def skType(im):
+  return im.dtype.str
+
+
+# -----------------------------------------------------------------------------
+# Smil type of label images (label outputs, watershed markers) : cli.labelType
+# or the usual one of the function
+#
+def labelType(cli, default):
+  return getattr(cli, 'labelType', None) or default
+
+
+# -----------------------------------------------------------------------------
+# Structuring element catalogue : (Smil, skimage) definitions of each shape
+# of radius sz, with the same support unless noted
+#   cross     : CrossSE(sz)  - diamond(sz)
+#   square    : SquSE(sz)    - square(2 sz + 1)
+#   hex       : HexSE(sz)    - disk(sz) : no hexagonal grid in skimage
+#   line      : HorizSE(sz)  - 1 x (2 sz + 1) footprint
+#   rect      : footprint    - (2 (sz / 2) + 1) x (2 sz + 1) footprint
+#   disk      : footprint    - disk(sz)
+#   crossSeq  : CrossSE(sz)  - sz times diamond(1), as a footprint sequence
+#   squareSeq : SquSE(sz)    - sz times square(3), as a footprint sequence
+# Smil applies its homotheties with its own decompositions, footprints as
+# they are. Footprint sequences need skimage >= 0.20 : older versions get the
+# whole footprint.
+#
+kSeShapes = [
+  'cross', 'square', 'hex', 'line', 'rect', 'disk', 'crossSeq', 'squareSeq'
+]
+
+# shapes without the same support in both backends
+kSeUnmatched = ['hex']
+
+
+def seShape(cli):
+  shape = getattr(cli, 'seShape', None)
+  if shape is None:
+    shape = 'square' if cli.squareSe else 'cross'
+  return shape
+
+
+def seMatched(cli):
+  return not seShape(cli) in kSeUnmatched
+
+
+def diskFootprint(sz):
+  y, x = np.ogrid[-sz:sz + 1, -sz:sz + 1]
+  return (x * x + y * y <= sz * sz).astype(np.uint8)
+
+
+def lineFootprint(sz):
+  return np.ones((1, 2 * sz + 1), dtype=np.uint8)
+
+
+def rectFootprint(sz):
+  return np.ones((2 * (sz // 2) + 1, 2 * sz + 1), dtype=np.uint8)
+
+
+#
+#  ####   #    #     #    #
+# #       ##  ##     #    #
+#  ####   # ## #     #    #
+#      #  #    #     #    #
+# #    #  #    #     #    #
+#  ####   #    #     #    ######
+#
+# segmentation parameters by image (other images : those of lena.png)
+smWsData = {
+  'astronaut.png': [10, 0],
+  'bubbles_gray.png': [10, 5],
+  'hubble_EDF_gray.png': [5, 1],
+  'lena.png': [5, 0],
+  'tools.png': [10, 1],
+}
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def smilFootprint(fp):
+  se = sp.StrElt()
+  h, w = fp.shape
+  for y, x in zip(*np.nonzero(fp)):
+    se.addPoint(int(x) - w // 2, int(y) - h // 2)
+  return se
+
+
+smilShapes = {
+  'cross': lambda sz: sp.CrossSE(sz),
+  'square': lambda sz: sp.SquSE(sz),
+  'hex': lambda sz: sp.HexSE(sz),
+  'line': lambda sz: sp.HorizSE(sz),
+  'rect': lambda sz: smilFootprint(rectFootprint(sz)),
+  'disk': lambda sz: smilFootprint(diskFootprint(sz)),
+  'crossSeq': lambda sz: sp.CrossSE(sz),
+  'squareSeq': lambda sz: sp.SquSE(sz),
+}
+
+
+def smilSE(cli, sz=1):
+  shape = seShape(cli)
+  key = ('smil', 'se', shape, None, sz, None)
+  return prepGet(key, lambda: smilShapes[shape](sz))
+
+
+def smilOut(imIn, imType=None):
+  if imType is None:
+    imOut = sp.Image(imIn)
+    sp.copy(imIn, imOut)
+  else:
+    imOut = sp.Image(imIn, imType)
+  return imOut
+
+
+#
+#
+#
+def smBinSegmentation(imIn, imOut):
+  se = sp.HexSE()
+  imDist = sp.Image(imIn)
+  sp.distance(imIn, imDist)
+  sp.inv(imDist, imDist)
+  sp.watershed(imDist, imOut, se)
+  sp.inv(imOut, imOut)
+  sp.inf(imIn, imOut, imOut)
+
+
+def smGraySegmentation(imIn, imOut, h=5, sz=0):
+  se = sp.HexSE()
+  imOpen = sp.Image(imIn)
+  if sz > 0:
+    sp.open(imIn, imOpen, sp.HexSE(sz))
+  else:
+    sp.copy(imIn, imOpen)
+  imGrad = sp.Image(imIn)
+  imMin = sp.Image(imIn)
+  sp.gradient(imOpen, imGrad, se)
+  sp.hMinima(imGrad, h, imMin, se)
+  imLabel = sp.Image(imOpen, 'UINT16')
+  sp.label(imMin, imLabel)
+  sp.watershed(imGrad, imLabel, imOut, se)
+
+
+#
+#
+#
+def smPrepSE(cli, imIn, sz, px):
+  return (imIn, smilOut(imIn), smilSE(cli, sz)), {}
+
+
+def smPrepH(cli, imIn, sz, px):
+  return (imIn, 10, smilOut(imIn), smilSE(cli, sz)), {}
+
+
+def smPrepLabel(cli, imIn, sz, px):
+  imOut = smilOut(imIn, labelType(cli, 'UINT32'))
+  return (imIn, imOut, smilSE(cli, sz)), {}
+
+
+def smPrepOut(cli, imIn, sz, px):
+  return (imIn, smilOut(imIn)), {}
+
+
+def smPrepSegmentation(cli, imIn, sz, px):
+  if cli.binary:
+    return (imIn, smilOut(imIn)), {}
+  h, sz = smWsData.get(cli.image, smWsData['lena.png'])
+  return (imIn, smilOut(imIn), h, sz), {}
+
+
+def smRunSegmentation(*args):
+  if len(args) == 2:
+    smBinSegmentation(*args)
+  else:
+    smGraySegmentation(*args)
+
+
+def smPrepWatershed(cli, imIn, sz, px):
+  dtype = smilType(imIn)
+  imOut = smilOut(imIn)
+  if cli.binary:
+
+    def build():
+      imDist = sp.Image(imIn)
+      sp.distance(imIn, imDist)
+      sp.inv(imDist, imDist)
+      return imDist
+
+    key = prepKey(cli, 'smil', 'distInv', px, None, dtype)
+    imDist = prepGet(key, build)
+    return (imDist, imOut, sp.HexSE()(4)), {}
+
+  h, szo = smWsData.get(cli.image, smWsData['lena.png'])
+  lType = labelType(cli, 'UINT16')
+
+  def build():
+    se = sp.HexSE()
+    imOpen = sp.Image(imIn)
+    if szo > 0:
+      sp.open(imIn, imOpen, sp.HexSE(szo))
+    else:
+      sp.copy(imIn, imOpen)
+    imGrad = sp.Image(imIn)
+    imMin = sp.Image(imIn)
+    sp.gradient(imOpen, imGrad, se)
+    sp.hMinima(imGrad, h, imMin, se)
+    imLabel = sp.Image(imOpen, lType)
+    sp.label(imMin, imLabel)
+    return imGrad, imLabel
+
+  key = prepKey(cli, 'smil', 'gradMarkers-' + lType, px, None, dtype)
+  imGrad, imLabel = prepGet(key, build)
+  return (imGrad, imLabel, imOut, sp.HexSE()), {}
+
+
+def smPrepAreaOpen(cli, imIn, sz, px):
+  if cli.arg is None:
+    cli.arg = 500
+  area = int(cli.arg * px * px)
+  return (imIn, area, smilOut(imIn), smilSE(cli, sz)), {}
+
+
+def smPrepAreaThreshold(cli, imIn, sz, px):
+  if cli.arg is None:
+    cli.arg = 500
+  area = int(cli.arg * px * px)
+  return (imIn, area, smilOut(imIn), True), {}
+
+
+def smPrepThinning(cli, imIn, sz, px):
+  hmt = prepGet(('smil', 'hmt', 'hL', None, 6, None),
+                lambda: sp.HMT_hL(6))
+  return (imIn, hmt, smilOut(imIn)), {}
+
+
+#
+#
+#
+smilOps = {
+  'erode': {'prepare': smPrepSE, 'run': (kSm, 'erode'), 'out': -2},
+  'open': {'prepare': smPrepSE, 'run': (kSm, 'open'), 'out': -2},
+  'tophat': {'prepare': smPrepSE, 'run': (kSm, 'topHat'), 'out': -2},
+  'gradient': {'prepare': smPrepSE, 'run': (kSm, 'gradient'), 'out': -2},
+  'hMaxima': {'prepare': smPrepH, 'run': (kSm, 'hMaxima'), 'out': -2},
+  'hMinima': {'prepare': smPrepH, 'run': (kSm, 'hMinima'), 'out': -2},
+  'label': {'prepare': smPrepLabel, 'run': (kSm, 'label'), 'out': -2},
+  'fastLabel': {'prepare': smPrepLabel, 'run': (kSm, 'fastLabel'), 'out': -2},
+  'segmentation': {
+    'prepare': smPrepSegmentation,
+    'run': smRunSegmentation,
+    'modules': [kSm],
+    'out': 1
+  },
+  'watershed': {
+    'prepare': smPrepWatershed,
+    'run': (kSm, 'watershed'),
+    'out': -2
+  },
+  'areaOpen': {'prepare': smPrepAreaOpen, 'run': (kSm, 'areaOpen'), 'out': -2},
+  'areaThreshold': {
+    'prepare': smPrepAreaThreshold,
+    'run': (kSm, 'areaThreshold'),
+    'out': -2
+  },
+  'distance': {
+    'prepare': smPrepOut,
+    'run': (kSm, 'distanceEuclidean'),
+    'out': -1
+  },
+  'zhangSkeleton': {
+    'prepare': smPrepOut,
+    'run': (kSm, 'zhangSkeleton'),
+    'out': -1
+  },
+  'thinning': {'prepare': smPrepThinning, 'run': (kSm, 'fullThin'), 'out': -1},
+}
+
+#
+#  ####   #    #     #    #    #    ##     ####   ######
+# #       #   #      #    ##  ##   #  #   #    #  #
+#  ####   ####       #    # ## #  #    #  #       #####
+#      #  #  #       #    #    #  ######  #  ###  #
+# #    #  #   #      #    #    #  #    #  #    #  #
+#  ####   #    #     #    #    #  #    #   ####   ######
+#
+# segmentation parameters by image (other images : those of lena.png)
+skWsData = {
+  'astronaut.png': [2, 5],
+  'bubbles_gray.png': [1, 3],
+  'hubble_EDF_gray.png': [1, 2],
+  'lena.png': [3, 5],
+  'tools.png': [1, 3],
+}
+
+
+# -----------------------------------------------------------------------------
+# Structuring elements
+#
+def mkSquareSE(cli, sz=1, D3=False):
+  dim = 2 * sz + 1
+  if D3:
+    se = np.ndarray((dim, dim, dim), dtype='uint8')
+    se[:, :, :] = 1
+  else:
+    se = np.ndarray((dim, dim), dtype='uint8')
+    se[:, :] = 1
+    se = skm.selem.square(2 * sz + 1)
+  return se
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def mkCrossSE(cli, sz=1, D3=False):
+  if D3:
+    # homothety of the 6-neighbour cross, as Smil Cross3DSE(sz)
+    se = skm.selem.octahedron(sz)
+  else:
+    se = skm.selem.diamond(sz)
+
+  return se
+
+
+skShapes = {
+  'cross': lambda cli, sz: mkCrossSE(cli, sz),
+  'square': lambda cli, sz: mkSquareSE(cli, sz),
+  'hex': lambda cli, sz: skm.selem.disk(sz),
+  'line': lambda cli, sz: lineFootprint(sz),
+  'rect': lambda cli, sz: rectFootprint(sz),
+  'disk': lambda cli, sz: skm.selem.disk(sz),
+  'crossSeq': lambda cli, sz: mkCrossSE(cli, sz),
+  'squareSeq': lambda cli, sz: mkSquareSE(cli, sz),
+}
+
+# only used when skimage has footprint sequences, i.e. without skm.selem
+skSequences = {
+  'crossSeq': lambda sz: ((skm.diamond(1), sz), ),
+  'squareSeq': lambda sz: ((np.ones((3, 3), dtype=np.uint8), sz), ),
+}
+
+
+# -----------------------------------------------------------------------------
+# Footprint of the SE catalogue shape. seq : a footprint sequence, when the
+# shape has one and the caller (grey level morphology) accepts it.
+#
+def skSE(cli, sz=1, seq=False):
+  shape = seShape(cli)
+  seq = seq and shape in skSequences and hasattr(skm, 'footprint_from_sequence')
+  key = ('skimage', 'se', shape + ('-seq' if seq else ''), None, sz, None)
+  if seq:
+    return prepGet(key, lambda: skSequences[shape](sz))
+  return prepGet(key, lambda: skShapes[shape](cli, sz))
+
+
+# -----------------------------------------------------------------------------
+# Input type conversions, done once per image and scale
+#
+def skAsType(cli, imIn, px, dtype):
+  tag = 'astype-{:s}'.format(np.dtype(dtype).str)
+  key = prepKey(cli, 'skimage', tag, px, None, skType(imIn))
+  return prepGet(key, lambda: imIn.astype(dtype, copy=False))
+
+
+#
+#
+#
+def skBinSegmentation(imIn):
+  # https://scikit-image.org/docs/dev/auto_examples/segmentation/plot_watershed.html
+  distance = ndi.distance_transform_edt(imIn)
+  coords = skf.peak_local_max(distance,
+                              footprint=np.ones((3, 3)),
+                              labels=imIn)
+  mask = np.zeros(distance.shape, dtype=bool)
+  mask[tuple(coords.T)] = True
+  markers, _ = ndi.label(mask)
+  labels = sks.watershed(-distance, markers, mask=mask)
+  return labels
+
+
+def skGraySegmentation(imIn, szg, szo):
+  # denoise image
+  denoised = rank.median(imIn, skm.disk(szo))
+  # find continuous region (low gradient -
+  # where less than 10 for this image) --> markers
+  # disk(5) is used here to get a more smooth image
+  markers = rank.gradient(denoised, skm.disk(szg)) < 10
+  markers = ndi.label(markers)[0]
+  # local gradient (disk(2) is used to keep edges thin)
+  gradient = rank.gradient(denoised, skm.disk(2))
+  # process the watershed
+  labels = sks.watershed(gradient, markers)
+  return labels
+
+
+def skAreaThreshold(imIn, sz):
+  imb = skm.label(imIn)
+  imOut = skm.remove_small_objects(imb, sz)
+  return imOut
+
+
+#
+#
+#
+def skPrepSE(cli, imIn, sz, px):
+  return (imIn, skSE(cli, sz, seq=True)), {}
+
+
+def skPrepGradient(cli, imIn, sz, px):
+  return (skAsType(cli, imIn, px, 'uint8'), skSE(cli, sz)), {}
+
+
+def skPrepH(cli, imIn, sz, px):
+  return (imIn, 10, skSE(cli, sz)), {}
+
+
+def skPrepLabel(cli, imIn, sz, px):
+  return (imIn, ), {'connectivity': 1}
+
+
+def skPrepFastLabel(cli, imIn, sz, px):
+  return (imIn, ), {'connectivity': 2}
+
+
+def skPrepIn(cli, imIn, sz, px):
+  return (imIn, ), {}
+
+
+def skPrepBool(cli, imIn, sz, px):
+  return (skAsType(cli, imIn, px, bool), ), {}
+
+
+def skPrepSegmentation(cli, imIn, sz, px):
+  if cli.binary:
+    return (skAsType(cli, imIn, px, int), ), {}
+  szg, szo = skWsData.get(cli.image, skWsData['lena.png'])
+  return (skAsType(cli, imIn, px, 'uint8'), szg, szo), {}
+
+
+def skRunSegmentation(*args):
+  if len(args) == 1:
+    return skBinSegmentation(*args)
+  return skGraySegmentation(*args)
+
+
+def skPrepWatershed(cli, imIn, sz, px):
+  dtype = skType(imIn)
+  if cli.binary:
+    imInt = skAsType(cli, imIn, px, int)
+
+    def build():
+      dist = ndi.distance_transform_edt(imInt)
+      coords = skf.peak_local_max(dist,
+                                  footprint=skm.selem.diamond(3),
+                                  labels=imInt)
+      mask = np.zeros(dist.shape, dtype=bool)
+      mask[tuple(coords.T)] = True
+      markers, _ = ndi.label(mask)
+      return -dist, markers
+
+    key = prepKey(cli, 'skimage', 'distMarkers', px, None, dtype)
+    negDist, markers = prepGet(key, build)
+    return (negDist, markers), {'mask': imInt}
+
+  szg, szo = skWsData.get(cli.image, skWsData['lena.png'])
+  imU8 = skAsType(cli, imIn, px, 'uint8')
+
+  def build():
+    # denoise image
+    denoised = rank.median(imU8, skm.disk(szo))
+    # find continuous region (low gradient -
+    # where less than 10 for this image) --> markers
+    # disk(5) is used here to get a more smooth image
+    markers = rank.gradient(denoised, skm.disk(szg)) < 10
+    markers = ndi.label(markers)[0]
+    # local gradient (disk(2) is used to keep edges thin)
+    gradient = rank.gradient(denoised, skm.disk(2))
+    return gradient, markers
+
+  key = prepKey(cli, 'skimage', 'gradMarkers', px, None, dtype)
+  gradient, markers = prepGet(key, build)
+  return (gradient, markers), {}
+
+
+def skPrepAreaOpen(cli, imIn, sz, px):
+  if cli.arg is None:
+    cli.arg = 500
+  area = int(cli.arg * px * px)
+  return (imIn, ), {'area_threshold': area, 'connectivity': 1}
+
+
+def skPrepAreaThreshold(cli, imIn, sz, px):
+  if cli.arg is None:
+    cli.arg = 500
+  area = int(cli.arg * px * px)
+  return (imIn, ), {'sz': area}
+
+
+#
+#
+#
+skimageOps = {
+  'erode': {'prepare': skPrepSE, 'run': (kSkm, 'erosion'), 'outKw': True},
+  'open': {'prepare': skPrepSE, 'run': (kSkm, 'opening'), 'outKw': True},
+  'tophat': {
+    'prepare': skPrepSE,
+    'run': (kSkm, 'white_tophat'),
+    'outKw': True
+  },
+  'gradient': {
+    'prepare': skPrepGradient,
+    'run': (kRank, 'gradient'),
+    'outKw': True
+  },
+  'hMaxima': {'prepare': skPrepH, 'run': (kSkm, 'h_maxima')},
+  'hMinima': {'prepare': skPrepH, 'run': (kSkm, 'h_minima')},
+  'label': {'prepare': skPrepLabel, 'run': (kSkm, 'label')},
+  'fastLabel': {'prepare': skPrepFastLabel, 'run': (kSkm, 'label')},
+  'segmentation': {
+    'prepare': skPrepSegmentation,
+    'run': skRunSegmentation,
+    'modules': [kSkm, kRank, kNdi, kSks, kSkf]
+  },
+  'watershed': {'prepare': skPrepWatershed, 'run': (kSks, 'watershed')},
+  'areaOpen': {'prepare': skPrepAreaOpen, 'run': (kSkm, 'area_opening')},
+  'areaThreshold': {
+    'prepare': skPrepAreaThreshold,
+    'run': skAreaThreshold,
+    'modules': [kSkm]
+  },
+  'distance': {'prepare': skPrepIn, 'run': (kNdi, 'distance_transform_edt')},
+  'zhangSkeleton': {'prepare': skPrepBool, 'run': (kSkm, 'skeletonize')},
+  'thinning': {'prepare': skPrepBool, 'run': (kSkm, 'thin')},
+}
+
+#
+# #####   ######   ####      #     ####    #####  #####    #   #
+# #    #  #       #    #     #    #          #    #    #    # #
+# #    #  #####   #          #     ####      #    #    #     #
+# #####   #       #  ###     #         #     #    #####      #
+# #   #   #       #    #     #    #    #     #    #   #      #
+# #    #  ######   ####      #     ####      #    #    #     #
+#
+kOps = {
+  'smil': smilOps,
+  'skimage': skimageOps,
+}
+
+
+# -----------------------------------------------------------------------------
+# Returns the descriptor of function fs for backend in the registry ops, or
+# None if this backend doesn't implement it.
+#
+def getOp(backend, fs, ops=kOps):
+  return ops.get(backend, {}).get(fs, None)
+
+
+# -----------------------------------------------------------------------------
+# Imports what the call of op needs and returns its run function
+#
+def loadOp(op):
+  for m in op.get('modules', []):
+    bl.load(m)
+  return bl.resolve(op['run'])
+
+
+# -----------------------------------------------------------------------------
+# Prepares fs for backend and returns a no-argument callable doing only the
+# measured call. With newOut, functions accepting out= get an output
+# allocated here, reused by all the calls.
+#
+def prepareOp(cli, backend, fs, imIn, sz=1, px=1, ops=kOps, newOut=False):
+  io = prepareOpIO(cli, backend, fs, imIn, sz, px, ops, newOut)
+  return None if io is None else io[0]
+
+
+# -----------------------------------------------------------------------------
+# Same as prepareOp(), returning (call, input, output) : the input the call
+# reads (imIn or its conversion) and the output it writes into, None when it
+# returns its output.
+#
+def prepareOpIO(cli, backend, fs, imIn, sz=1, px=1, ops=kOps, newOut=False):
+  op = getOp(backend, fs, ops)
+  if op is None:
+    return None
+  run = loadOp(op)
+  args, kwargs = op['prepare'](cli, imIn, sz, px)
+  if newOut and op.get('outKw', False):
+    kwargs['out'] = np.empty_like(args[0])
+  out = kwargs.get('out', None)
+  if 'out' in op:
+    out = args[op['out']]
+  return (lambda: run(*args, **kwargs)), args[0], out
+
+
+# -----------------------------------------------------------------------------
+# Run fs once, outside of any measure, and return its output : a Smil image
+# or a NumPy array.
+#
+def runOp(cli, backend, fs, imIn, sz=1, px=1, ops=kOps):
+  op = getOp(backend, fs, ops)
+  if op is None:
+    return None
+  run = loadOp(op)
+  args, kwargs = op['prepare'](cli, imIn, sz, px)
+  ret = run(*args, **kwargs)
+  if 'out' in op:
+    return args[op['out']]
+  return ret
@@ -0,0 +1,255 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  benchStore.py
+#
+#  Copyright 2021 jose-marcio <martins@jose-marcio.org>
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the  nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#  Hardware performance counters (Linux perf_event_open).
+#
+#  Counters are opened through a small ctypes binding of the system call,
+#  for every thread of the process (library thread pools included), user
+#  space only, so that the default perf_event_paranoid setting allows them.
+#  Threads created later are picked up at the next count.
+#
+#  Counting is done on a separate run of the prepared call, right after its
+#  timing, so that timed samples never include counter handling. Counts are
+#  scaled by enabled / running time when the kernel multiplexes counters.
+#
+#  When counters can't be opened (container, paranoid setting, virtual
+#  machine without PMU, other OS) PerfCounters.available is False, with the
+#  reason, and counts are None : results fall back to timing only.
+#
+import os
+import ctypes
+import fcntl
+import platform
+import struct
+
+kSyscall = {
+  'x86_64': 298,
+  'aarch64': 241,
+  'ppc64le': 319,
+  'i686': 336,
+}
+
+kTypeHardware = 0
+kTypeHwCache = 3
+
+kHwCycles = 0
+kHwInstructions = 1
+kHwCacheMisses = 3
+kHwBranchMisses = 5
+
+kCacheDTLB = 3
+kCacheOpRead = 0
+kCacheResultMiss = 1
+
+# (name, type, config)
+kEvents = [
+  ('cycles', kTypeHardware, kHwCycles),
+  ('instructions', kTypeHardware, kHwInstructions),
+  ('llcMisses', kTypeHardware, kHwCacheMisses),
+  ('branchMisses', kTypeHardware, kHwBranchMisses),
+  ('dtlbMisses', kTypeHwCache,
+   kCacheDTLB | (kCacheOpRead << 8) | (kCacheResultMiss << 16)),
+]
+kNames = [e[0] for e in kEvents]
+
+kIocEnable = 0x2400
+kIocDisable = 0x2401
+kIocReset = 0x2403
+
+kFormatTotalTimes = 1 | 2
+
+# disabled, exclude_kernel, exclude_hv
+kFlags = (1 << 0) | (1 << 5) | (1 << 6)
+
+
+# -----------------------------------------------------------------------------
+# struct perf_event_attr, up to PERF_ATTR_SIZE_VER5
+#
+class PerfEventAttr(ctypes.Structure):
+  _fields_ = [
+    ('type', ctypes.c_uint32),
+    ('size', ctypes.c_uint32),
+    ('config', ctypes.c_uint64),
+    ('sample_period', ctypes.c_uint64),
+    ('sample_type', ctypes.c_uint64),
+    ('read_format', ctypes.c_uint64),
+    ('flags', ctypes.c_uint64),
+    ('wakeup_events', ctypes.c_uint32),
+    ('bp_type', ctypes.c_uint32),
+    ('config1', ctypes.c_uint64),
+    ('config2', ctypes.c_uint64),
+    ('branch_sample_type', ctypes.c_uint64),
+    ('sample_regs_user', ctypes.c_uint64),
+    ('sample_stack_user', ctypes.c_uint32),
+    ('clockid', ctypes.c_int32),
+    ('sample_regs_intr', ctypes.c_uint64),
+    ('aux_watermark', ctypes.c_uint32),
+    ('sample_max_stack', ctypes.c_uint16),
+    ('reserved', ctypes.c_uint16),
+  ]
+
+
+# -----------------------------------------------------------------------------
+#
+#
+class PerfCounters:
+  def __init__(self, events=kEvents):
+    self.events = events
+    self.fds = {}
+    self.available = False
+    self.reason = ''
+    self.libc = None
+    self.nr = kSyscall.get(platform.machine())
+    if platform.system() != 'Linux' or self.nr is None:
+      self.reason = 'not supported on {:s} {:s}'.format(
+        platform.system(), platform.machine())
+      return
+    try:
+      self.libc = ctypes.CDLL(None, use_errno=True)
+    except OSError as e:
+      self.reason = str(e)
+      return
+    self.attach()
+    self.available = len(self.fds) > 0
+
+  # ---------------------------------------------------------------------------
+  #
+  #
+  def openEvent(self, tid, etype, config):
+    attr = PerfEventAttr()
+    attr.type = etype
+    attr.size = ctypes.sizeof(PerfEventAttr)
+    attr.config = config
+    attr.read_format = kFormatTotalTimes
+    attr.flags = kFlags
+    fd = self.libc.syscall(self.nr, ctypes.byref(attr), tid, -1, -1, 0)
+    if fd < 0:
+      err = ctypes.get_errno()
+      self.reason = 'perf_event_open : {:s}'.format(os.strerror(err))
+      return None
+    return fd
+
+  # ---------------------------------------------------------------------------
+  # Open counters of the threads not yet seen. An event which can't be
+  # opened on the main thread is dropped.
+  #
+  def attach(self):
+    try:
+      tids = [int(t) for t in os.listdir('/proc/self/task')]
+    except OSError:
+      tids = [os.getpid()]
+    for tid in tids:
+      if tid in self.fds:
+        continue
+      fds = {}
+      for name, etype, config in self.events:
+        if len(self.fds) > 0 and not name in self.names():
+          continue
+        fd = self.openEvent(tid, etype, config)
+        if not fd is None:
+          fds[name] = fd
+      if len(fds) > 0:
+        self.fds[tid] = fds
+
+  def names(self):
+    names = set()
+    for fds in self.fds.values():
+      names |= set(fds.keys())
+    return names
+
+  def ioctlAll(self, req):
+    for fds in self.fds.values():
+      for fd in fds.values():
+        fcntl.ioctl(fd, req, 0)
+
+  def readAll(self):
+    res = {}
+    for fds in self.fds.values():
+      for name, fd in fds.items():
+        value, enabled, running = struct.unpack('QQQ', os.read(fd, 24))
+        if running > 0 and running < enabled:
+          value = value * enabled / running
+        res[name] = res.get(name, 0) + value
+    return res
+
+  # ---------------------------------------------------------------------------
+  # Counts per call of n calls of call(). None for events not available.
+  #
+  def count(self, call, n=1):
+    res = {name: None for name in kNames}
+    if not self.available:
+      return res
+    self.attach()
+    self.ioctlAll(kIocReset)
+    self.ioctlAll(kIocEnable)
+    for i in range(n):
+      call()
+    self.ioctlAll(kIocDisable)
+    for name, v in self.readAll().items():
+      res[name] = v / max(n, 1)
+    return res
+
+  def close(self):
+    for fds in self.fds.values():
+      for fd in fds.values():
+        os.close(fd)
+    self.fds = {}
+    self.available = False
+
+
+# -----------------------------------------------------------------------------
+# Derived figures : instructions per cycle and misses per pixel
+#
+def derived(counts, npix):
+  res = {'ipc': None}
+  if counts.get('cycles') and not counts.get('instructions') is None:
+    res['ipc'] = counts['instructions'] / counts['cycles']
+  for name in ['llcMisses', 'branchMisses', 'dtlbMisses']:
+    v = counts.get(name)
+    res[name + 'Px'] = None if v is None or npix <= 0 else v / npix
+  return res
+
+
+def perfString(counts, npix):
+  d = derived(counts, npix)
+  if d['ipc'] is None and d['llcMissesPx'] is None:
+    return ''
+  s = []
+  if not d['ipc'] is None:
+    s.append('IPC {:4.2f}'.format(d['ipc']))
+  for name, tag in [('llcMissesPx', 'LLC'), ('branchMissesPx', 'br'),
+                    ('dtlbMissesPx', 'dTLB')]:
+    if not d[name] is None:
+      s.append('{:s} {:.3g}/px'.format(tag, d[name]))
+  return ' '.join(s)
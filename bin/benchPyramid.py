@@ -0,0 +1,339 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  benchPyramid.py
+#
+#  Copyright 2021 jose-marcio <martins@jose-marcio.org>
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the  nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#  Multi-scale image pyramid cache.
+#
+#  Each rescaled image is computed once (with Smil, as in doSmil()) and kept
+#  as a raw .npy file keyed by (image, scale, interpolation, binary). Files
+#  are memory-mapped on load, so both backends read the same buffer, and the
+#  least recently used ones are removed when the cache exceeds its disk
+#  budget.
+#
+#  Mosaics (run-mosaic.py) are built the same way, out of core : each round
+#  is tiled, band of rows by band of rows, from the previous one into a
+#  .npy file, never holding a whole mosaic in memory.
+#
+#  Synthetic images (benchSynth) are generated at the size of each point
+#  instead of being rescaled or tiled.
+#
+#  getInput() is the single input pipeline of the benchmark : one Smil image
+#  per size point, in its native type (UINT8 or UINT16), kept for the whole
+#  run. skimage gets a view over the same memory (smilArray()), so both
+#  libraries time the same pixels and no second copy of the input exists.
+#
+#  With cli.dtype, the input is converted once per size point to that pixel
+#  type, values being kept as they are. Types this Smil build doesn't wrap
+#  give no Smil input : skimage then gets its own converted array
+#  (getArray()).
+#
+import os
+
+import numpy as np
+
+import benchLazy as bl
+
+sp = bl.lazyImport('smilPython')
+
+import benchSynth as bsy
+
+kPyramidDir = os.path.join('var', 'pyramid')
+kPyramidBudget = 20 * 1024
+
+kMosaicDir = os.path.join('var', 'mosaic')
+# size of the bands of rows copied at once (bytes)
+kBandBytes = 64 * 1024 * 1024
+
+# source images already loaded by this process
+srcImages = {}
+
+# input images of the current run, by (file, scale, binary, dtype)
+inputs = {}
+
+# pixel types of the dtype axis : NumPy name -> Smil type
+kDtypes = {
+  'uint8': 'UINT8',
+  'uint16': 'UINT16',
+  'uint32': 'UINT32',
+  'float32': 'F_SIMPLE',
+  'float64': 'F_DOUBLE',
+}
+
+
+# -----------------------------------------------------------------------------
+# Smil images are indexed [x, y] ([x, y, z] for volumes) : give the usual
+# [row, col] ([slice, row, col]) view over the same memory
+#
+def smilArray(im):
+  arr = im.getNumArray()
+  if arr.ndim > 1 and arr.strides[0] < arr.strides[-1]:
+    arr = arr.T
+  return arr
+
+
+# -----------------------------------------------------------------------------
+# Copy of a [row, col] (or [slice, row, col]) array into a new Smil image
+#
+def arrayToSmil(arr):
+  imType = kDtypes[arr.dtype.name]
+  if arr.ndim == 3:
+    d, h, w = arr.shape
+    im = sp.Image(w, h, d)
+  else:
+    h, w = arr.shape
+    im = sp.Image(w, h)
+  if imType != 'UINT8':
+    im = sp.Image(im, imType)
+  smilArray(im)[...] = arr
+  return im
+
+
+# -----------------------------------------------------------------------------
+# Whether this Smil build wraps images of pixel type dtype
+#
+def smilHasType(dtype):
+  imType = kDtypes.get(np.dtype(dtype).name)
+  return not imType is None and hasattr(sp, 'Image_' + imType)
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def getInterpolation(binary=False):
+  return 'closest' if binary else 'bilinear'
+
+
+def pyramidFile(fin, scale, binary=False, pDir=kPyramidDir):
+  b, _ = os.path.splitext(os.path.basename(fin))
+  fName = '{:s}-{:.6g}-{:s}-{:s}.npy'.format(b, scale,
+                                             getInterpolation(binary),
+                                             'bin' if binary else 'gray')
+  return os.path.join(pDir, fName)
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def pyramidScale(fin, scale, binary=False):
+  if not fin in srcImages:
+    srcImages[fin] = sp.Image(fin)
+  im = srcImages[fin]
+
+  imt = sp.Image(im)
+  if scale != 1.:
+    if binary:
+      sp.scale(im, scale, imt, getInterpolation(binary))
+    else:
+      sp.scale(im, scale, scale, imt, getInterpolation(binary))
+  else:
+    sp.copy(im, imt)
+  return imt
+
+
+# -----------------------------------------------------------------------------
+# Remove least recently used files until the cache fits in budget (MB). The
+# file in keep is never removed.
+#
+def pyramidEvict(pDir=kPyramidDir, budget=kPyramidBudget, keep=None):
+  files = []
+  for f in os.listdir(pDir):
+    if not f.endswith('.npy'):
+      continue
+    st = os.stat(os.path.join(pDir, f))
+    files.append((st.st_mtime, st.st_size, os.path.join(pDir, f)))
+
+  total = sum([f[1] for f in files])
+  for mtime, size, fPath in sorted(files):
+    if total <= budget * 1024 * 1024:
+      break
+    if fPath == keep:
+      continue
+    os.remove(fPath)
+    total -= size
+
+
+# -----------------------------------------------------------------------------
+# Rescaled image, as a memory-mapped [row, col] array. Pages are copy on
+# write : callers may modify the array, the file is never changed.
+#
+def pyramidGet(fin,
+               scale,
+               binary=False,
+               pDir=kPyramidDir,
+               budget=kPyramidBudget):
+  fPath = pyramidFile(fin, scale, binary, pDir)
+  if not os.path.isfile(fPath):
+    os.makedirs(pDir, exist_ok=True)
+    imt = pyramidScale(fin, scale, binary)
+    fTmp = fPath + '.tmp'
+    with open(fTmp, 'wb') as fout:
+      np.save(fout, smilArray(imt))
+    os.replace(fTmp, fPath)
+    pyramidEvict(pDir, budget, keep=fPath)
+  else:
+    # LRU : last use is the modification time
+    os.utime(fPath)
+  return np.load(fPath, mmap_mode='c')
+
+
+# -----------------------------------------------------------------------------
+# Input image of a size point. Smil can't wrap an external buffer : when
+# taken from the pyramid cache, pixels are copied once into Smil memory.
+#
+def loadInput(cli, fin, scale):
+  if bsy.isSynth(fin):
+    return arrayToSmil(bsy.synthGet(fin, scale))
+  if cli.pyramid:
+    return arrayToSmil(
+      pyramidGet(fin, scale, cli.binary, cli.pyramidDir, cli.pyramidBudget))
+  return pyramidScale(fin, scale, cli.binary)
+
+
+# -----------------------------------------------------------------------------
+# Input of a size point converted to cli.dtype, None when Smil doesn't wrap
+# this type
+#
+def getInput(cli, fin, scale):
+  dtype = getattr(cli, 'dtype', None)
+  key = (fin, scale, cli.binary, dtype)
+  if not key in inputs:
+    if not dtype is None and not smilHasType(dtype):
+      return None
+    im = loadInput(cli, fin, scale)
+    if not dtype is None and smilArray(im).dtype.name != dtype:
+      im = arrayToSmil(smilArray(im).astype(dtype))
+    inputs[key] = im
+  return inputs[key]
+
+
+# -----------------------------------------------------------------------------
+# Input of a size point as a [row, col] array : a view over the Smil input
+# or, for types Smil doesn't wrap, a converted copy of the native one
+#
+def getArray(cli, fin, scale):
+  im = getInput(cli, fin, scale)
+  if not im is None:
+    return smilArray(im)
+  key = (fin, scale, cli.binary, 'array-' + cli.dtype)
+  if not key in inputs:
+    inputs[key] = smilArray(loadInput(cli, fin, scale)).astype(cli.dtype)
+  return inputs[key]
+
+
+def dropInputs():
+  inputs.clear()
+  srcImages.clear()
+
+
+#
+# #    #   ####    ####     ##       #     ####
+# ##  ##  #    #  #        #  #      #    #    #
+# # ## #  #    #   ####   #    #     #    #
+# #    #  #    #       #  ######     #    #
+# #    #  #    #  #    #  #    #     #    #    #
+# #    #   ####    ####   #    #     #     ####
+#
+def mosaicFile(fin, nx, ny, mDir=kMosaicDir):
+  b = bsy.imageName(fin)
+  return os.path.join(mDir, '{:s}-{:d}x{:d}.npy'.format(b, nx, ny))
+
+
+# -----------------------------------------------------------------------------
+# Write, band by band, into the .npy file fPath the (height, width) image
+# whose rows are src[rows[i]][:, cols] (cols None : all the columns),
+# converted to dtype (None : the one of src, values kept as they are)
+#
+def writeBands(fPath, src, height, width, rows, cols=None, tile=1, dtype=None):
+  os.makedirs(os.path.dirname(fPath), exist_ok=True)
+  fTmp = fPath + '.tmp'
+  dtype = src.dtype if dtype is None else np.dtype(dtype)
+  out = np.lib.format.open_memmap(fTmp,
+                                  mode='w+',
+                                  dtype=dtype,
+                                  shape=(height, width))
+  itemsize = max(src.dtype.itemsize, dtype.itemsize)
+  band = max(kBandBytes // max(width * itemsize, 1), 1)
+  for y0 in range(0, height, band):
+    y1 = min(y0 + band, height)
+    b = src[rows[y0:y1]]
+    if not cols is None:
+      b = b[:, cols]
+    if tile > 1:
+      b = np.tile(b, (1, tile))
+    out[y0:y1] = b
+  out.flush()
+  del out
+  os.replace(fTmp, fPath)
+
+
+# -----------------------------------------------------------------------------
+# Mosaic of nx x ny copies of image fin, as a memory-mapped [row, col] array
+# (copy on write). Built by tiling the previous round (prev, a mosaic of
+# nx/2 x ny/2 copies) when given, else from the image itself. Synthetic
+# images are generated at the mosaic size.
+#
+def mosaicGet(fin, nx, ny, prev=None, mDir=kMosaicDir):
+  if bsy.isSynth(fin):
+    return bsy.synthGet(fin, nx, ny)
+  fPath = mosaicFile(fin, nx, ny, mDir)
+  if not os.path.isfile(fPath):
+    src = prev
+    tx, ty = 2, 2
+    if src is None or 2 * (nx // 2) != nx or 2 * (ny // 2) != ny:
+      src = smilArray(sp.Image(fin))
+      tx, ty = nx, ny
+    h, w = src.shape
+    rows = np.arange(h * ty) % h
+    writeBands(fPath, src, h * ty, w * tx, rows, tile=tx)
+    del src
+  return np.load(fPath, mmap_mode='c')
+
+
+# -----------------------------------------------------------------------------
+# Nearest neighbour resizing of a (memory-mapped) array to a new .npy file
+#
+def mosaicResize(arr, width, height, fPath):
+  h, w = arr.shape
+  rows = np.arange(height) * h // height
+  cols = np.arange(width) * w // width
+  writeBands(fPath, arr, height, width, rows, cols)
+  return np.load(fPath, mmap_mode='c')
+
+
+# -----------------------------------------------------------------------------
+# Conversion of a (memory-mapped) array to dtype, into a new .npy file
+#
+def mosaicAsType(arr, dtype, fPath):
+  h, w = arr.shape
+  writeBands(fPath, arr, h, w, np.arange(h), dtype=dtype)
+  return np.load(fPath, mmap_mode='c')
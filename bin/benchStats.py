@@ -0,0 +1,265 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  benchStore.py
+#
+#  Copyright 2021 jose-marcio <martins@jose-marcio.org>
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the  nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#  Statistics on timing samples : non parametric two sample comparison.
+#
+#  Timings are skewed and have outliers : tests and effect sizes are rank
+#  based (Mann-Whitney U, Hodges-Lehmann shift with its Moses confidence
+#  interval), all with the normal approximation.
+#
+import math
+
+import numpy as np
+
+kZ95 = 1.96
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def normSf(z):
+  return 0.5 * math.erfc(z / math.sqrt(2.))
+
+
+# -----------------------------------------------------------------------------
+# Ranks, ties getting their average rank
+#
+def rankData(x):
+  x = np.asarray(x)
+  order = np.argsort(x, kind='mergesort')
+  xs = x[order]
+  ranks = np.empty(len(x), dtype=np.float64)
+  i = 0
+  while i < len(xs):
+    j = i
+    while j + 1 < len(xs) and xs[j + 1] == xs[i]:
+      j += 1
+    ranks[order[i:j + 1]] = 0.5 * (i + j) + 1.
+    i = j + 1
+  return ranks
+
+
+# -----------------------------------------------------------------------------
+# One sided Mann-Whitney U test : are values of y greater than those of x ?
+# Returns U (of y) and the p-value (tie and continuity corrected).
+#
+def mannWhitney(x, y):
+  x = np.asarray(x, dtype=np.float64)
+  y = np.asarray(y, dtype=np.float64)
+  n1 = len(x)
+  n2 = len(y)
+  if n1 == 0 or n2 == 0:
+    return 0., 1.
+
+  r = rankData(np.concatenate((x, y)))
+  u = r[n1:].sum() - n2 * (n2 + 1) / 2.
+
+  _, t = np.unique(r, return_counts=True)
+  n = n1 + n2
+  tie = (t**3 - t).sum() / (n * (n - 1)) if n > 1 else 0.
+  var = n1 * n2 / 12. * ((n + 1) - tie)
+  if var <= 0:
+    return u, 1.
+  z = (u - n1 * n2 / 2. - 0.5) / math.sqrt(var)
+  return u, normSf(z)
+
+
+# -----------------------------------------------------------------------------
+# Hodges-Lehmann estimate of the shift y - x, and its confidence interval
+# (order statistics of the pairwise differences)
+#
+def shiftCI(x, y, z=kZ95):
+  x = np.asarray(x, dtype=np.float64)
+  y = np.asarray(y, dtype=np.float64)
+  n1 = len(x)
+  n2 = len(y)
+  if n1 == 0 or n2 == 0:
+    return 0., 0., 0.
+  d = np.sort((y[:, None] - x[None, :]).ravel())
+  hl = float(np.median(d))
+  k = int(math.floor(n1 * n2 / 2. - z * math.sqrt(n1 * n2 * (n1 + n2 + 1) / 12.)))
+  k = min(max(k, 0), len(d) - 1)
+  return hl, float(d[k]), float(d[len(d) - 1 - k])
+
+
+# -----------------------------------------------------------------------------
+# Holm-Bonferroni adjusted p-values
+#
+def holm(pvals):
+  p = np.asarray(pvals, dtype=np.float64)
+  m = len(p)
+  adj = np.empty(m)
+  prev = 0.
+  for i, j in enumerate(np.argsort(p)):
+    prev = max(prev, min(1., (m - i) * p[j]))
+    adj[j] = prev
+  return adj
+
+
+#
+#   ####    ####   #    #  #####   #       ######  #    #     #     #####  #   #
+#  #    #  #    #  ##  ##  #    #  #       #        #  #      #       #     # #
+#  #       #    #  # ## #  #    #  #       #####     ##       #       #      #
+#  #       #    #  #    #  #####   #       #         ##       #       #      #
+#  #    #  #    #  #    #  #       #       #        #  #      #       #      #
+#   ####    ####   #    #  #       ######  ######  #    #     #       #      #
+#
+# T(N) = a.N^b is fitted in log-log space with the Theil-Sen estimator (median
+# of pairwise slopes), robust to outlier points. The confidence interval of b
+# is Sen's one, from the variance of Kendall's statistic.
+#
+def theilSen(x, y, z=kZ95):
+  x = np.asarray(x, dtype=np.float64)
+  y = np.asarray(y, dtype=np.float64)
+  n = len(x)
+  i, j = np.triu_indices(n, 1)
+  ok = x[j] != x[i]
+  slopes = np.sort((y[j][ok] - y[i][ok]) / (x[j][ok] - x[i][ok]))
+  if len(slopes) == 0:
+    return 0., float(np.median(y)), 0., 0.
+  b = float(np.median(slopes))
+  a = float(np.median(y - b * x))
+
+  m = len(slopes)
+  c = z * math.sqrt(n * (n - 1) * (2 * n + 5) / 18.)
+  lo = int(math.floor((m - c) / 2.))
+  hi = int(math.ceil((m + c) / 2.))
+  lo = min(max(lo, 0), m - 1)
+  hi = min(max(hi, 0), m - 1)
+  return b, a, float(slopes[lo]), float(slopes[hi])
+
+
+def sse(x, y):
+  if len(x) < 3:
+    return 0.
+  p = np.polyfit(x, y, 1)
+  return float(((np.polyval(p, x) - y)**2).sum())
+
+
+# -----------------------------------------------------------------------------
+# Breakpoints by binary segmentation : a segment is split at the point
+# (shared by both halves) that lowers the BIC the most, as long as it does
+# and both halves keep minPts points.
+#
+def segments(x, y, i0=0, i1=None, minPts=3):
+  if i1 is None:
+    i1 = len(x) - 1
+  n = i1 - i0 + 1
+  if n < 2 * minPts - 1:
+    return [(i0, i1)]
+
+  eps = 1e-12
+  bic = n * math.log(max(sse(x[i0:i1 + 1], y[i0:i1 + 1]) / n, eps))
+  best = None
+  for k in range(i0 + minPts - 1, i1 - minPts + 2):
+    s = sse(x[i0:k + 1], y[i0:k + 1]) + sse(x[k:i1 + 1], y[k:i1 + 1])
+    # a break adds a slope, an intercept and its position
+    b = n * math.log(max(s / n, eps)) + 3 * math.log(n)
+    if b < bic:
+      bic = b
+      best = k
+  if best is None:
+    return [(i0, i1)]
+  return segments(x, y, i0, best, minPts) + segments(x, y, best, i1, minPts)
+
+
+# -----------------------------------------------------------------------------
+# n : pixel counts - t : times. Returns the global fit, the fit of each
+# segment between breakpoints, and the breakpoints (pixel counts).
+#
+def fitComplexity(n, t, minPts=3):
+  n = np.asarray(n, dtype=np.float64)
+  t = np.asarray(t, dtype=np.float64)
+  ok = (n > 0) & (t > 0)
+  order = np.argsort(n[ok])
+  x = np.log(n[ok][order])
+  y = np.log(t[ok][order])
+
+  res = {'points': len(x), 'segments': [], 'breaks': []}
+  if len(x) < 2:
+    return None
+  b, a, lo, hi = theilSen(x, y)
+  res.update({'a': math.exp(a), 'b': b, 'bLow': lo, 'bHigh': hi})
+
+  for i0, i1 in segments(x, y, minPts=minPts):
+    sb, sa, slo, shi = theilSen(x[i0:i1 + 1], y[i0:i1 + 1])
+    res['segments'].append({
+      'nFrom': math.exp(x[i0]),
+      'nTo': math.exp(x[i1]),
+      'a': math.exp(sa),
+      'b': sb,
+      'bLow': slo,
+      'bHigh': shi,
+      # pivot of the segment, for predictions
+      'xc': float(np.median(x[i0:i1 + 1])),
+      'yc': float(np.median(y[i0:i1 + 1])),
+    })
+    if i0 > 0:
+      res['breaks'].append(math.exp(x[i0]))
+  return res
+
+
+# -----------------------------------------------------------------------------
+# Predicted time at n pixels, from the last segment, and its range when the
+# exponent goes over its confidence interval
+#
+def predictTime(fit, n):
+  s = fit['segments'][-1]
+  x = math.log(n)
+  t = s['a'] * n**s['b']
+  tl = math.exp(s['yc'] + s['bLow'] * (x - s['xc']))
+  th = math.exp(s['yc'] + s['bHigh'] * (x - s['xc']))
+  return t, min(tl, th), max(tl, th)
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def printFit(name, fit, sides=[]):
+  if fit is None:
+    print('  {:8s} : not enough points'.format(name))
+    return
+  print('  {:8s} : b = {:5.3f} [{:5.3f}, {:5.3f}] - {:d} points'.format(
+    name, fit['b'], fit['bLow'], fit['bHigh'], fit['points']))
+  if len(fit['breaks']) > 0:
+    print('  {:8s}   breaks at side {:s}'.format(
+      '', ' '.join(['{:.0f}'.format(math.sqrt(n)) for n in fit['breaks']])))
+    for s in fit['segments']:
+      print('  {:8s}   {:6.0f} - {:6.0f} : b = {:5.3f} [{:5.3f}, {:5.3f}]'.format(
+        '', math.sqrt(s['nFrom']), math.sqrt(s['nTo']), s['b'], s['bLow'],
+        s['bHigh']))
+  for side in sides:
+    t, lo, hi = predictTime(fit, float(side)**2)
+    print('  {:8s}   {:6d}^2 : {:11.3f} s [{:.3f}, {:.3f}]'.format(
+      '', side, t / 1000., lo / 1000., hi / 1000.))
@@ -0,0 +1,628 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  benchStore.py
+#
+#  Copyright 2021 jose-marcio <martins@jose-marcio.org>
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the  nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#  Results store.
+#
+#  One row per measured point : raw samples (ms per call), summary
+#  statistics, the full parameter set of the run and an environment
+#  fingerprint. Rows are only ever appended.
+#
+#  Two formats :
+#    * SQLite  : a single file (default var/results.sqlite), indexed by
+#                function, size, SE, backend, host and date
+#    * Parquet : a directory of part files (a path ending with .parquet),
+#                when pyarrow is available. Queries filter on the same
+#                columns.
+#
+#  The legacy CSV layout (<host>/<bin|gray>-<image>-<function>-<axis>.csv)
+#  can be generated from the store with exportCsv().
+#
+import os
+import json
+import uuid
+import sqlite3
+import hashlib
+import platform
+from datetime import datetime, timezone
+
+import numpy as np
+
+try:
+  import pyarrow as pa
+  import pyarrow.parquet as pq
+  import pyarrow.dataset as pds
+except ImportError:
+  pa = None
+
+kStoreFile = os.path.join('var', 'results.sqlite')
+
+# (name, SQLite type), in row order
+kColumns = [
+  ('run', 'TEXT'),
+  ('date', 'TEXT'),
+  ('host', 'TEXT'),
+  ('env', 'TEXT'),
+  ('backend', 'TEXT'),
+  ('function', 'TEXT'),
+  ('image', 'TEXT'),
+  ('imType', 'TEXT'),
+  ('axis', 'TEXT'),
+  ('size', 'INTEGER'),
+  ('scale', 'REAL'),
+  ('se', 'INTEGER'),
+  ('dtype', 'TEXT'),
+  ('threads', 'INTEGER'),
+  ('number', 'INTEGER'),
+  ('nSamples', 'INTEGER'),
+  ('mean', 'REAL'),
+  ('stdev', 'REAL'),
+  ('min', 'REAL'),
+  ('max', 'REAL'),
+  ('median', 'REAL'),
+  ('precision', 'REAL'),
+  ('status', 'TEXT'),
+  ('cycles', 'REAL'),
+  ('instructions', 'REAL'),
+  ('llcMisses', 'REAL'),
+  ('branchMisses', 'REAL'),
+  ('dtlbMisses', 'REAL'),
+  ('bytes', 'REAL'),
+  ('bandwidth', 'REAL'),
+  ('seShape', 'TEXT'),
+  ('samples', 'BLOB'),
+  ('params', 'TEXT'),
+]
+kNames = [c[0] for c in kColumns]
+
+kIndexed = ['function', 'size', 'se', 'backend', 'host', 'date']
+
+# statistics of the legacy CSV files, per backend : (column, CSV name)
+kCsvStats = [('mean', 'mean'), ('stdev', 'stdev'), ('min', 'min'),
+             ('max', 'max'), ('median', 'median'), ('nSamples', 'samples'),
+             ('precision', 'precision')]
+
+# pixel types and SE shapes, in legacy CSV file names
+kCsvDtypes = ['uint8', 'uint16', 'uint32', 'float32', 'float64']
+kCsvSeShapes = [
+  'cross', 'square', 'hex', 'line', 'rect', 'disk', 'crossSeq', 'squareSeq'
+]
+
+
+# -----------------------------------------------------------------------------
+# Image part of legacy CSV file names : <image>[-<dtype>][-<seShape>], the
+# pixel type and SE shape being given only when not the default ones
+#
+def csvBase(image, dtype=None, seShape=None):
+  for t in [dtype, seShape]:
+    if not t is None:
+      image += '-' + t
+  return image
+
+
+def csvSplit(base):
+  parts = base.split('-')
+  dtype = None
+  seShape = None
+  if len(parts) > 1 and parts[-1] in kCsvSeShapes:
+    seShape = parts.pop()
+  if len(parts) > 1 and parts[-1] in kCsvDtypes:
+    dtype = parts.pop()
+  return '-'.join(parts), dtype, seShape
+
+
+# -----------------------------------------------------------------------------
+# Pixel type and SE shape a row was run with (None : default ones), from the
+# run parameters, or from the columns for imported rows
+#
+def csvTags(r):
+  if r.get('params') is None:
+    return r.get('dtype'), r.get('seShape')
+  params = json.loads(r['params'])
+  return params.get('dtype'), params.get('seShape')
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def isParquet(path):
+  return path.rstrip('/').endswith('.parquet')
+
+
+def getHost():
+  return platform.node().split('.')[0]
+
+
+def getDate():
+  return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def newRunId():
+  return '{:s}-{:s}-{:s}'.format(
+    getHost(),
+    datetime.now().strftime('%Y%m%d%H%M%S'),
+    uuid.uuid4().hex[:8])
+
+
+# -----------------------------------------------------------------------------
+# Environment fingerprint : software versions and machine. Backend versions
+# are taken from imported modules or else from the installed distributions,
+# without importing them (backends are loaded lazily).
+#
+kBackendDists = {
+  'smilPython': 'smilPython',
+  'skimage': 'scikit-image',
+  'scipy': 'scipy',
+}
+
+
+def getEnv():
+  import sys
+  import importlib.metadata as im
+
+  env = {
+    'host': getHost(),
+    'machine': platform.machine(),
+    'system': platform.platform(),
+    'python': platform.python_version(),
+    'numpy': np.__version__,
+    'cpus': os.cpu_count(),
+  }
+  if hasattr(os, 'sched_getaffinity'):
+    env['affinity'] = len(os.sched_getaffinity(0))
+  try:
+    with open('/proc/cpuinfo') as f:
+      for line in f:
+        if line.startswith('model name'):
+          env['cpu'] = line.split(':', 1)[1].strip()
+          break
+  except OSError:
+    pass
+  for mod, dist in kBackendDists.items():
+    if mod in sys.modules:
+      env[mod] = str(getattr(sys.modules[mod], '__version__', ''))
+      continue
+    try:
+      env[mod] = im.version(dist)
+    except im.PackageNotFoundError:
+      pass
+  for v in ['OMP_NUM_THREADS']:
+    if v in os.environ:
+      env[v] = os.environ[v]
+  return env
+
+
+def envFingerprint(env):
+  s = json.dumps(env, sort_keys=True)
+  return hashlib.blake2b(s.encode(), digest_size=8).hexdigest()
+
+
+# -----------------------------------------------------------------------------
+# Parameter set of a run, as JSON
+#
+def paramsJson(cli):
+  params = {}
+  for k, v in sorted(vars(cli).items()):
+    if isinstance(v, (str, int, float, bool)) or v is None:
+      params[k] = v
+    else:
+      params[k] = str(v)
+  return json.dumps(params, sort_keys=True)
+
+
+#
+#  ####    ####   #          #     #####  ######
+# #       #    #  #          #       #    #
+#  ####   #    #  #          #       #    #####
+#      #  #  # #  #          #       #    #
+# #    #  #   #   #          #       #    #
+#  ####    ### #  ######     #       #    ######
+#
+def sqlOpen(path):
+  if os.path.dirname(path) != '':
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+  db = sqlite3.connect(path)
+  db.execute('PRAGMA journal_mode=WAL')
+  cols = ', '.join(['{:s} {:s}'.format(c, t) for c, t in kColumns])
+  db.execute('CREATE TABLE IF NOT EXISTS points ({:s})'.format(cols))
+  # columns added after the store was created
+  have = [t[1] for t in db.execute('PRAGMA table_info(points)')]
+  for c, t in kColumns:
+    if not c in have:
+      db.execute('ALTER TABLE points ADD COLUMN {:s} {:s}'.format(c, t))
+  db.execute('CREATE TABLE IF NOT EXISTS envs (env TEXT PRIMARY KEY, info TEXT)')
+  for c in kIndexed:
+    db.execute('CREATE INDEX IF NOT EXISTS points_{:s} ON points ({:s})'.format(
+      c, c))
+  db.execute('CREATE INDEX IF NOT EXISTS points_key ON points ' +
+             '(function, image, size, se, backend)')
+  db.commit()
+  return db
+
+
+def sqlWrite(db, rows, envs):
+  with db:
+    db.executemany('INSERT OR IGNORE INTO envs VALUES (?, ?)',
+                   [(k, json.dumps(v, sort_keys=True)) for k, v in envs.items()])
+    sql = 'INSERT INTO points ({:s}) VALUES ({:s})'.format(
+      ', '.join(kNames), ', '.join(['?'] * len(kNames)))
+    db.executemany(sql, [
+      tuple([r.get(c) for c in kNames[:-2]]) +
+      (np.asarray(r['samples'], dtype=np.float64).tobytes(), r.get('params'))
+      for r in rows
+    ])
+
+
+def sqlQuery(path, since=None, until=None, **where):
+  db = sqlOpen(path)
+  cond = []
+  vals = []
+  for k, v in where.items():
+    if v is None:
+      continue
+    if not k in kNames:
+      raise ValueError('unknown column : {:s}'.format(k))
+    cond.append('{:s} = ?'.format(k))
+    vals.append(v)
+  if not since is None:
+    cond.append('date >= ?')
+    vals.append(since)
+  if not until is None:
+    cond.append('date <= ?')
+    vals.append(until)
+
+  sql = 'SELECT {:s} FROM points'.format(', '.join(kNames))
+  if len(cond) > 0:
+    sql += ' WHERE ' + ' AND '.join(cond)
+  sql += ' ORDER BY date, rowid'
+
+  rows = []
+  for t in db.execute(sql, vals):
+    r = dict(zip(kNames, t))
+    r['samples'] = np.frombuffer(r['samples'] or b'', dtype=np.float64)
+    rows.append(r)
+  db.close()
+  return rows
+
+
+#
+# #####     ##    #####    ####   #    #  ######   #####
+# #    #   #  #   #    #  #    #  #    #  #          #
+# #    #  #    #  #    #  #    #  #    #  #####      #
+# #####   ######  #####   #  # #  #    #  #          #
+# #       #    #  #   #   #   #   #    #  #          #
+# #       #    #  #    #   ### #   ####   ######     #
+#
+def pqSchema():
+  kTypes = {
+    'TEXT': pa.string(),
+    'INTEGER': pa.int64(),
+    'REAL': pa.float64(),
+    'BLOB': pa.list_(pa.float64()),
+  }
+  return pa.schema([(c, kTypes[t]) for c, t in kColumns])
+
+
+def pqWrite(path, rows, part):
+  os.makedirs(path, exist_ok=True)
+  cols = {}
+  for c in kNames:
+    if c == 'samples':
+      cols[c] = [[float(x) for x in r['samples']] for r in rows]
+    else:
+      cols[c] = [r.get(c) for r in rows]
+  table = pa.table(cols, schema=pqSchema())
+  fName = '{:s}-{:04d}.parquet'.format(rows[0]['run'], part)
+  fTmp = os.path.join(path, '.' + fName)
+  pq.write_table(table, fTmp)
+  os.replace(fTmp, os.path.join(path, fName))
+
+
+# -----------------------------------------------------------------------------
+# Environments of a Parquet store are kept beside the part files, one JSON
+# line per environment hash
+#
+def pqWriteEnvs(path, envs):
+  fEnvs = os.path.join(path, 'envs.json')
+  known = set()
+  if os.path.isfile(fEnvs):
+    with open(fEnvs) as fin:
+      for line in fin:
+        try:
+          known.add(json.loads(line)['env'])
+        except (ValueError, KeyError):
+          continue
+  with open(fEnvs, 'a') as fout:
+    for k, v in envs.items():
+      if k in known:
+        continue
+      fout.write(json.dumps({'env': k, 'info': v}, sort_keys=True) + '\n')
+
+
+def pqQuery(path, since=None, until=None, **where):
+  if not os.path.isdir(path):
+    return []
+  expr = None
+  for k, v in where.items():
+    if v is None:
+      continue
+    if not k in kNames:
+      raise ValueError('unknown column : {:s}'.format(k))
+    e = pds.field(k) == v
+    expr = e if expr is None else expr & e
+  if not since is None:
+    e = pds.field('date') >= since
+    expr = e if expr is None else expr & e
+  if not until is None:
+    e = pds.field('date') <= until
+    expr = e if expr is None else expr & e
+
+  dset = pds.dataset(path, schema=pqSchema(), format='parquet')
+  rows = dset.to_table(filter=expr).to_pylist()
+  for r in rows:
+    r['samples'] = np.array(r['samples'] or [], dtype=np.float64)
+  rows.sort(key=lambda r: r['date'])
+  return rows
+
+
+#
+#  #    #  #####      #     #####  ######  #####
+#  #    #  #    #     #       #    #       #    #
+#  #    #  #    #     #       #    #####   #    #
+#  # ## #  #####      #       #    #       #####
+#  ##  ##  #   #      #       #    #       #   #
+#  #    #  #    #     #       #    ######  #    #
+#
+class StoreWriter:
+  def __init__(self, path=kStoreFile, cli=None, bufSize=256):
+    if isParquet(path) and pa is None:
+      raise ImportError('pyarrow is needed for Parquet stores')
+    self.path = path
+    self.bufSize = bufSize
+    self.rows = []
+    self.part = 0
+    self.db = None
+
+    self.run = newRunId()
+    self.date = getDate()
+    self.host = getHost()
+    self.params = None if cli is None else paramsJson(cli)
+    self.envs = {}
+    self.setEnv()
+
+  # ---------------------------------------------------------------------------
+  # Computed again by the caller once backends are loaded : versions of
+  # backends built from source are only known from their modules
+  #
+  def setEnv(self):
+    env = getEnv()
+    self.env = envFingerprint(env)
+    self.envs[self.env] = env
+
+  # ---------------------------------------------------------------------------
+  #
+  #
+  def add(self, **row):
+    r = {
+      'run': self.run,
+      'date': self.date,
+      'host': self.host,
+      'env': self.env,
+      'params': self.params,
+    }
+    r.update(row)
+    if not 'status' in r:
+      r['status'] = 'ok'
+    if not 'samples' in r:
+      r['samples'] = []
+    self.rows.append(r)
+    if len(self.rows) >= self.bufSize:
+      self.flush()
+
+  def flush(self):
+    if len(self.rows) == 0:
+      return
+    if isParquet(self.path):
+      pqWrite(self.path, self.rows, self.part)
+      pqWriteEnvs(self.path, self.envs)
+    else:
+      if self.db is None:
+        self.db = sqlOpen(self.path)
+      sqlWrite(self.db, self.rows, self.envs)
+    self.part += 1
+    self.rows = []
+
+  def close(self):
+    self.flush()
+    if not self.db is None:
+      self.db.close()
+      self.db = None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+
+# -----------------------------------------------------------------------------
+# Rows matching all given column values (and date range), oldest first.
+# samples is a NumPy array.
+#
+def query(path=kStoreFile, since=None, until=None, **where):
+  if isParquet(path):
+    if pa is None:
+      raise ImportError('pyarrow is needed for Parquet stores')
+    return pqQuery(path, since, until, **where)
+  if not os.path.isfile(path):
+    return []
+  return sqlQuery(path, since, until, **where)
+
+
+# -----------------------------------------------------------------------------
+# Add one point from its samples and the info dictionary of timeAdaptive()
+#
+def pointRow(dt, info=None, **row):
+  dt = np.asarray(dt, dtype=np.float64)
+  row['samples'] = dt
+  row['nSamples'] = len(dt)
+  if len(dt) > 0:
+    row['mean'] = float(dt.mean())
+    row['stdev'] = float(dt.std())
+    row['min'] = float(dt.min())
+    row['max'] = float(dt.max())
+    row['median'] = float(np.median(dt))
+  if not info is None:
+    row['number'] = info['number']
+    row['median'] = info['median']
+    row['precision'] = info['precision']
+    # compulsory traffic per call (benchStream)
+    if 'bytes' in info:
+      row['bytes'] = info['bytes']
+    # hardware counters per call (benchPerf), when measured
+    for k, v in info.get('perf', {}).items():
+      row[k] = v
+  return row
+
+
+#
+#   ####    ####   #    #
+#  #    #  #       #    #
+#  #        ####   #    #
+#  #            #  #    #
+#  #    #  #    #   #  #
+#   ####    ####     ##
+#
+# -----------------------------------------------------------------------------
+# Legacy CSV files : for each (host, type, image, function, axis), the last
+# run, one line per size
+#
+def exportCsv(path=kStoreFile, outDir='.', since=None, until=None, **where):
+  groups = {}
+  for r in query(path, since, until, **where):
+    dtype, seShape = csvTags(r)
+    k = (r['host'], r['imType'], csvBase(r['image'], dtype, seShape),
+         r['function'], r['axis'])
+    g = groups.setdefault(k, {})
+    # rows are sorted by date : keep the last run
+    if g.get('run') != r['run']:
+      g.clear()
+      g['run'] = r['run']
+    x = r['size'] if r['axis'] == 'szim' else r['se']
+    g.setdefault(x, {})[r['backend']] = r
+
+  files = []
+  for k, g in sorted(groups.items()):
+    host, imType, image, function, axis = k
+    dOut = os.path.join(outDir, host)
+    os.makedirs(dOut, exist_ok=True)
+    fPath = os.path.join(
+      dOut, '{:s}-{:s}-{:s}-{:s}.csv'.format(imType, image, function, axis))
+
+    with open(fPath, 'w') as fout:
+      h = [axis]
+      h += ['Smil-{:s}'.format(c[1]) for c in kCsvStats]
+      h += ['skImage-{:s}'.format(c[1]) for c in kCsvStats]
+      fout.write(';'.join(h) + '\n')
+      for x in sorted([x for x in g.keys() if x != 'run']):
+        sl = ['{:d}'.format(int(x))]
+        for backend in ['smil', 'skimage']:
+          r = g[x].get(backend, {})
+          for c, _ in kCsvStats:
+            v = r.get(c)
+            sl.append('{:.5f}'.format(float(v if not v is None else 0.)))
+        fout.write(';'.join(sl) + '\n')
+    files.append(fPath)
+  return files
+
+
+# -----------------------------------------------------------------------------
+# Import legacy CSV files of a host directory. There are no raw samples :
+# only statistics are kept. The date is the file modification time.
+#
+def importCsv(writer, hostDir):
+  kBackends = {'Smil': 'smil', 'skImage': 'skimage'}
+
+  host = os.path.basename(os.path.normpath(hostDir))
+  nb = 0
+  for f in sorted(os.listdir(hostDir)):
+    b, x = os.path.splitext(f)
+    if x != '.csv' or b.endswith('-verify'):
+      continue
+    parts = b.split('-')
+    if len(parts) < 4 or not parts[0] in ['bin', 'gray']:
+      continue
+    if not parts[-1] in ['szim', 'szse']:
+      continue
+    imType, function, axis = parts[0], parts[-2], parts[-1]
+    image, dtype, seShape = csvSplit('-'.join(parts[1:-2]))
+
+    fPath = os.path.join(hostDir, f)
+    mtime = datetime.fromtimestamp(os.stat(fPath).st_mtime, timezone.utc)
+    with open(fPath) as fin:
+      h = fin.readline().strip().split(';')
+      for line in fin:
+        v = line.strip().split(';')
+        if len(v) != len(h):
+          continue
+        for backend in kBackends.keys():
+          row = {
+            'run': 'csv-{:s}'.format(host),
+            'date': mtime.strftime('%Y-%m-%dT%H:%M:%S'),
+            'host': host,
+            'env': None,
+            'params': None,
+            'status': 'ok',
+            'backend': kBackends[backend],
+            'function': function,
+            'image': image,
+            'imType': imType,
+            'axis': axis,
+            'size': int(float(v[0])) if axis == 'szim' else None,
+            'se': int(float(v[0])) if axis == 'szse' else 1,
+            'dtype': dtype,
+            'seShape': seShape,
+          }
+          for j in range(1, len(h)):
+            pfx, _, c = h[j].partition('-')
+            if pfx != backend:
+              continue
+            c = 'nSamples' if c == 'samples' else c
+            row[c] = float(v[j])
+          if 'nSamples' in row:
+            row['nSamples'] = int(row['nSamples'])
+          row['samples'] = []
+          writer.rows.append(row)
+          nb += 1
+  writer.flush()
+  return nb
@@ -0,0 +1,139 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  benchStore.py
+#
+#  Copyright 2021 jose-marcio <martins@jose-marcio.org>
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the  nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#  Memory bandwidth baseline and normalised figures.
+#
+#  The sustainable bandwidth of the machine is measured once per run with
+#  STREAM-like NumPy kernels on arrays much larger than the last level
+#  cache :
+#    * copy  : b = a
+#    * scale : b = s * a
+#  counting, as STREAM does, the bytes read plus the bytes written. The best
+#  of repeated runs is kept. With several threads, each one handles its own
+#  slice of the arrays (NumPy releases the GIL), as concurrent jobs do.
+#
+#  Each point is then reported as Mpixel/s and as effective GB/s : its
+#  compulsory traffic (one read of the input, one write of the output) over
+#  its time, and as a fraction of the measured bandwidth. Operations close to
+#  1 are memory bound ; far below it, a faster implementation has headroom.
+#
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# bytes of each STREAM array
+kStreamBytes = 256 * 1024 * 1024
+kStreamRepeat = 10
+
+# item size of the output, when not the one of the input
+kOutItemsize = {
+  'smil': {
+    'label': 4,
+    'fastLabel': 4,
+  },
+  'skimage': {
+    'label': 8,
+    'fastLabel': 8,
+    'distance': 8,
+    'watershed': 4,
+    'segmentation': 4,
+    'zhangSkeleton': 1,
+    'thinning': 1,
+  },
+}
+
+
+# -----------------------------------------------------------------------------
+# Best copy and scale bandwidths, in GB/s
+#
+def streamBandwidth(nBytes=kStreamBytes, repeat=kStreamRepeat, threads=1):
+  n = max(nBytes // 8, 1)
+  a = np.ones(n, dtype=np.float64)
+  b = np.zeros(n, dtype=np.float64)
+
+  threads = max(min(threads, n), 1)
+  bounds = [(i * n // threads, (i + 1) * n // threads) for i in range(threads)]
+  pool = ThreadPoolExecutor(threads) if threads > 1 else None
+
+  def onSlices(fn):
+    if pool is None:
+      return lambda: fn(0, n)
+    return lambda: list(pool.map(lambda s: fn(*s), bounds))
+
+  kernels = {
+    'copy': onSlices(lambda i, j: np.copyto(b[i:j], a[i:j])),
+    'scale': onSlices(lambda i, j: np.multiply(a[i:j], 3., out=b[i:j])),
+  }
+  res = {}
+  for k, fn in kernels.items():
+    # first run : page faults of b
+    fn()
+    best = float('inf')
+    for i in range(repeat):
+      t0 = time.perf_counter()
+      fn()
+      best = min(best, time.perf_counter() - t0)
+    res[k] = 2. * n * 8 / best / 1e9
+  res['best'] = max(res['copy'], res['scale'])
+  if not pool is None:
+    pool.shutdown()
+  return res
+
+
+def streamString(bw):
+  return 'copy {:.1f} GB/s - scale {:.1f} GB/s'.format(bw['copy'], bw['scale'])
+
+
+# -----------------------------------------------------------------------------
+# Compulsory traffic (bytes) of one call of fs on npix pixels of itemsize
+# bytes
+#
+def pointBytes(backend, fs, npix, itemsize=1):
+  out = kOutItemsize.get(backend, {}).get(fs, itemsize)
+  return float(npix) * (itemsize + out)
+
+
+# -----------------------------------------------------------------------------
+# Mpixel/s, effective GB/s and fraction of the bandwidth bw (GB/s) of a call
+# of ms milliseconds
+#
+def throughput(npix, nBytes, ms, bw=None):
+  if ms <= 0:
+    return 0., 0., 0.
+  mpix = npix / ms / 1000.
+  gbps = nBytes / ms / 1e6
+  frac = gbps / bw if bw else 0.
+  return mpix, gbps, frac
@@ -0,0 +1,242 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  benchStore.py
+#
+#  Copyright 2021 jose-marcio <martins@jose-marcio.org>
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the  nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#  Parametric synthetic images.
+#
+#  A synthetic image is given, wherever an image file name is expected, by
+#  a specification string :
+#
+#    synth:type=gray:size=1024:density=500:radius=8:spread=0.5:noise=4
+#
+#  with parameters (defaults in kDefaults) :
+#    * type    : bin or gray
+#    * size    : side of the image at scale 1
+#    * density : objects (disks) per Mpixel, at any scale
+#    * radius  : median object radius (pixels)
+#    * spread  : log-normal shape of the radius distribution (0 : same radius)
+#    * noise   : gray images - gaussian noise sigma (gray levels)
+#                binary images - percentage of flipped pixels
+#    * levels  : gray levels kept (plateaus : fewer levels, larger flat zones)
+#    * cell    : distance between nodes of the smooth background (regional
+#                minima of gray images)
+#    * seed    : random seed
+#
+#  Objects keep their density and size distribution at every scale : the
+#  number of components grows with the image area, unlike when upscaling an
+#  image file. Images are written band by band to memory-mapped .npy files,
+#  so that any size may be generated out of core. The content depends only
+#  on the parameters and the scale.
+#
+import os
+import hashlib
+
+import numpy as np
+
+kSynthDir = os.path.join('var', 'synth')
+kSynthPrefix = 'synth:'
+# rows per generated band : part of the random streams, never change it
+kSynthRows = 256
+
+kDefaults = {
+  'type': 'gray',
+  'size': 1024,
+  'density': 1000.,
+  'radius': 8.,
+  'spread': 0.5,
+  'noise': 0.,
+  'levels': 256,
+  'cell': 64,
+  'seed': 0,
+}
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def isSynth(fin):
+  return os.path.basename(fin).startswith(kSynthPrefix)
+
+
+def parseSpec(spec):
+  params = dict(kDefaults)
+  for kv in os.path.basename(spec)[len(kSynthPrefix):].split(':'):
+    if kv == '':
+      continue
+    k, v = kv.split('=', 1)
+    if not k in kDefaults:
+      raise ValueError('unknown synthetic image parameter : ' + k)
+    params[k] = type(kDefaults[k])(v)
+  if not params['type'] in ['bin', 'gray']:
+    raise ValueError('synthetic image type : bin or gray')
+  return params
+
+
+# -----------------------------------------------------------------------------
+# Name of a synthetic image, usable in file names (no extension)
+#
+def specName(spec):
+  params = parseSpec(spec)
+  s = ';'.join(['{:s}={:s}'.format(k, str(params[k])) for k in sorted(params)])
+  h = hashlib.blake2b(s.encode(), digest_size=4).hexdigest()
+  return 'synth-{:s}-{:d}-{:s}'.format(params['type'], params['size'], h)
+
+
+def imageName(fin):
+  if isSynth(fin):
+    return specName(fin)
+  b, _ = os.path.splitext(os.path.basename(fin))
+  return b
+
+
+def isBinary(spec):
+  return parseSpec(spec)['type'] == 'bin'
+
+
+def getSize(spec, scale=1.):
+  side = int(round(parseSpec(spec)['size'] * scale))
+  return side, side
+
+
+# -----------------------------------------------------------------------------
+# Objects of the whole image : centres, radius and gray level
+#
+def mkObjects(params, width, height):
+  rng = np.random.default_rng([params['seed'], width, height])
+  n = rng.poisson(params['density'] * width * height / 1e6)
+  cy = rng.integers(0, height, n)
+  cx = rng.integers(0, width, n)
+  r = params['radius'] * np.exp(params['spread'] * rng.standard_normal(n))
+  r = np.clip(np.rint(r), 1, 8 * params['radius']).astype(int)
+  val = rng.integers(128, 256, n)
+  return cy, cx, r, val
+
+
+def diskOffsets(r):
+  dy, dx = np.mgrid[-r:r + 1, -r:r + 1]
+  inside = dy * dy + dx * dx <= r * r
+  return dy[inside], dx[inside]
+
+
+# -----------------------------------------------------------------------------
+# Linear interpolation, along axis 0 of grid, at positions pos (in cells)
+#
+def interpAxis(grid, pos):
+  i0 = np.floor(pos).astype(int)
+  f = (pos - i0).astype(np.float32)
+  shape = (-1, ) + (1, ) * (grid.ndim - 1)
+  return grid[i0] * (1. - f.reshape(shape)) + grid[i0 + 1] * f.reshape(shape)
+
+
+# -----------------------------------------------------------------------------
+# Rows y0 to y1 of the image
+#
+def mkBand(params, width, y0, y1, objects, background):
+  band = np.zeros((y1 - y0, width), dtype=np.float32)
+  binary = params['type'] == 'bin'
+  rng = np.random.default_rng([params['seed'], width, y0])
+
+  if not binary:
+    cell = params['cell']
+    rows = interpAxis(background, (np.arange(y0, y1) + 0.5) / cell)
+    band[:] = 100. * interpAxis(rows.T, (np.arange(width) + 0.5) / cell).T
+
+  cy, cx, r, val = objects
+  sel = (cy + r >= y0) & (cy - r < y1)
+  for ri in np.unique(r[sel]):
+    k = sel & (r == ri)
+    dy, dx = diskOffsets(ri)
+    Y = cy[k, None] + dy[None, :]
+    X = cx[k, None] + dx[None, :]
+    V = np.broadcast_to(val[k, None], Y.shape)
+    ok = (Y >= y0) & (Y < y1) & (X >= 0) & (X < width)
+    np.maximum.at(band, (Y[ok] - y0, X[ok]), V[ok])
+
+  if binary:
+    band = band > 0
+    if params['noise'] > 0:
+      band ^= rng.random(band.shape) < params['noise'] / 100.
+    return np.where(band, 255, 0).astype(np.uint8)
+
+  if params['noise'] > 0:
+    band += params['noise'] * rng.standard_normal(band.shape,
+                                                  dtype=np.float32)
+  if params['levels'] < 256:
+    q = 256. / params['levels']
+    band = (np.floor(band / q) + 0.5) * q
+  return np.clip(np.rint(band), 0, 255).astype(np.uint8)
+
+
+def mkSynth(fPath, params, width, height):
+  objects = mkObjects(params, width, height)
+  rng = np.random.default_rng([params['seed'], width, height, 1])
+  cell = params['cell']
+  background = rng.random((height // cell + 2, width // cell + 2),
+                          dtype=np.float32)
+
+  os.makedirs(os.path.dirname(fPath) or '.', exist_ok=True)
+  fTmp = fPath + '.tmp'
+  out = np.lib.format.open_memmap(fTmp,
+                                  mode='w+',
+                                  dtype=np.uint8,
+                                  shape=(height, width))
+  for y0 in range(0, height, kSynthRows):
+    y1 = min(y0 + kSynthRows, height)
+    out[y0:y1] = mkBand(params, width, y0, y1, objects, background)
+  out.flush()
+  del out
+  os.replace(fTmp, fPath)
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def synthFile(spec, width, height, sDir=kSynthDir):
+  fName = '{:s}-{:d}x{:d}.npy'.format(specName(spec), width, height)
+  return os.path.join(sDir, fName)
+
+
+# -----------------------------------------------------------------------------
+# Synthetic image of spec at scale (scaleY : another scale for the height),
+# as a memory-mapped [row, col] array. Pages are copy on write.
+#
+def synthGet(spec, scale=1., scaleY=None, sDir=kSynthDir):
+  params = parseSpec(spec)
+  if scaleY is None:
+    scaleY = scale
+  width = int(round(params['size'] * scale))
+  height = int(round(params['size'] * scaleY))
+  fPath = synthFile(spec, width, height, sDir)
+  if not os.path.isfile(fPath):
+    mkSynth(fPath, params, width, height)
+  return np.load(fPath, mmap_mode='c')
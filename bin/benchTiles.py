@@ -0,0 +1,200 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  benchStore.py
+#
+#  Copyright 2021 jose-marcio <martins@jose-marcio.org>
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the  nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#  Tiled execution with halo overlap.
+#
+#  The image is split into tiles, each one read with a halo as wide as the
+#  reach of the operator : the SE radius (CrossSE(sz), SquSE(sz), diamond(sz)
+#  and square(2 sz + 1) all have radius sz) times the number of elementary
+#  erosions/dilations chained by the operator. Tiles run through a thread
+#  pool, with either backend, and the center of each result is copied into a
+#  preallocated output : the stitched result is the whole image one.
+#
+#  As for the whole image baseline, inputs, outputs and structuring elements
+#  are prepared before timing : one slot per worker and tile geometry, into
+#  which a worker copies its tile. Worker threads never touch the prepare
+#  cache.
+#
+import queue
+import concurrent.futures as cf
+
+import numpy as np
+
+import benchOps as bo
+import benchPyramid as bp
+import benchVerify as bv
+
+# elementary erosions/dilations chained, per operator
+kReach = {
+  'erode': 1,
+  'gradient': 1,
+  'open': 2,
+  'tophat': 2,
+}
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def getHalo(fs, sz):
+  return kReach[fs] * sz
+
+
+def tileGrid(height, width, tile):
+  tiles = []
+  for y0 in range(0, height, tile):
+    for x0 in range(0, width, tile):
+      tiles.append((y0, min(y0 + tile, height), x0, min(x0 + tile, width)))
+  return tiles
+
+
+# -----------------------------------------------------------------------------
+# Tile t of the grid with its halo, clipped to the image
+#
+def haloBox(t, halo, height, width):
+  y0, y1, x0, x1 = t
+  return (max(y0 - halo, 0), min(y1 + halo, height), max(x0 - halo, 0),
+          min(x1 + halo, width))
+
+
+# -----------------------------------------------------------------------------
+# Reusable buffers of one tile geometry : (call, input, output) prepared on a
+# (rows, cols) input of dtype. The prepare cache is keyed by key, so that
+# nothing bound to another slot is used.
+#
+def newSlot(cli, backend, fs, dtype, shape, sz, key):
+  buf = np.zeros(shape, dtype=dtype)
+  imIn = bp.arrayToSmil(buf) if backend == 'smil' else buf
+  return bo.prepareOpIO(cli, backend, fs, imIn, sz, key, newOut=True)
+
+
+# -----------------------------------------------------------------------------
+# Slots of each tile geometry of the grid, one per worker, prepared outside
+# of any timing and of the worker threads. Freed by bo.prepDrop(None).
+#
+def prepareTiles(cli, backend, fs, arr, sz, tile):
+  h, w = arr.shape
+  halo = getHalo(fs, sz)
+  slots = {}
+  for t in tileGrid(h, w, tile):
+    y0, y1, x0, x1 = haloBox(t, halo, h, w)
+    shape = (y1 - y0, x1 - x0)
+    if shape in slots:
+      continue
+    slots[shape] = queue.Queue()
+    for i in range(max(cli.threads, 1)):
+      key = ('tile', i) + shape
+      slots[shape].put(newSlot(cli, backend, fs, arr.dtype, shape, sz, key))
+  return slots
+
+
+# -----------------------------------------------------------------------------
+# Output array of fs for backend (type taken from a small tile)
+#
+def allocOutput(cli, backend, fs, arr, sz):
+  h, w = arr.shape
+  shape = (min(h, 16), min(w, 16))
+  call, _, res = newSlot(cli, backend, fs, arr.dtype, shape, sz, ('tile', ))
+  ret = call()
+  res = bv.toArray(ret if res is None else res)
+  bo.prepDrop(None)
+  return np.empty(arr.shape, dtype=res.dtype)
+
+
+# -----------------------------------------------------------------------------
+# Apply fs to arr tile by tile, results stitched into out. Each worker copies
+# its tile, halo included, into a free slot of that geometry (prepareTiles())
+# and runs the prepared call on it.
+#
+def runTiled(cli, backend, fs, arr, sz, tile, pool, out, slots):
+  h, w = arr.shape
+  halo = getHalo(fs, sz)
+
+  def work(t):
+    y0, y1, x0, x1 = t
+    box = haloBox(t, halo, h, w)
+    free = slots[(box[1] - box[0], box[3] - box[2])]
+    slot = free.get()
+    call, tIn, tOut = slot
+    src = arr[box[0]:box[1], box[2]:box[3]]
+    if backend == 'smil':
+      bp.smilArray(tIn)[...] = src
+    else:
+      tIn[...] = src
+    ret = call()
+    res = bv.toArray(ret if tOut is None else tOut)
+    dy = y0 - box[0]
+    dx = x0 - box[2]
+    out[y0:y1, x0:x1] = res[dy:dy + y1 - y0, dx:dx + x1 - x0]
+    free.put(slot)
+
+  for f in [pool.submit(work, t) for t in tileGrid(h, w, tile)]:
+    f.result()
+  return out
+
+
+def newPool(workers):
+  return cf.ThreadPoolExecutor(max_workers=max(workers, 1))
+
+
+# -----------------------------------------------------------------------------
+# Tile sizes to try : powers of 2, from minTile, while smaller than the image
+# and larger than the halo
+#
+def tileSizes(fs, sz, height, width, minTile=64):
+  sizes = []
+  t = minTile
+  while t < max(height, width):
+    if t > 2 * getHalo(fs, sz):
+      sizes.append(t)
+    t *= 2
+  return sizes
+
+
+# -----------------------------------------------------------------------------
+# Pick the tile size maximising throughput. timeIt(call) returns the median
+# time (ms) of call(). Returns the best tile and (tile, ms) of all sizes.
+#
+def autoTune(cli, backend, fs, arr, sz, pool, out, sizes, timeIt):
+  res = []
+  for t in sizes:
+    slots = prepareTiles(cli, backend, fs, arr, sz, t)
+    ms = timeIt(lambda: runTiled(cli, backend, fs, arr, sz, t, pool, out, slots))
+    del slots
+    bo.prepDrop(None)
+    res.append((t, ms))
+  if len(res) == 0:
+    return None, res
+  best = min(res, key=lambda x: x[1])
+  return best[0], res
@@ -0,0 +1,215 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  benchTiming.py
+#
+#  Copyright 2021 jose-marcio <martins@jose-marcio.org>
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the  nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#  Adaptive timing engine.
+#
+#  The number of calls per sample is chosen so that a sample lasts at least
+#  kMinSampleTime. Samples are then taken until the 95 % confidence interval
+#  of the median is narrow enough (relative half width below a target) or
+#  until the time budget of the point is spent.
+#
+#  The confidence interval of the median is distribution free : its bounds
+#  are the order statistics of ranks n/2 -/+ z * sqrt(n) / 2.
+#
+#  A single call can't be interrupted in-process : measurements which must
+#  be stopped after some time run in a forked child (callKillable()).
+#
+import sys
+import math
+import time
+import timeit as tit
+import multiprocessing as mp
+
+kMinSampleTime = 0.05
+kPrecision = 0.02
+kBudget = 20.
+kMinSamples = 5
+kMaxSamples = 200
+kZ95 = 1.96
+
+
+# -----------------------------------------------------------------------------
+# Calls per sample : grow until one sample lasts kMinSampleTime. Slow calls
+# are done once per sample.
+#
+def getNumber(ct, minTime=kMinSampleTime):
+  n = 1
+  while True:
+    t = ct.timeit(n)
+    if t >= minTime:
+      return n
+    if t <= 0:
+      n *= 10
+      continue
+    n = max(n + 1, int(math.ceil(1.2 * n * minTime / t)))
+
+
+# -----------------------------------------------------------------------------
+# Returns (median, low, high) of the samples, the bounds being those of the
+# confidence interval of the median
+#
+def medianCI(samples, z=kZ95):
+  x = sorted(samples)
+  n = len(x)
+  if n == 0:
+    return 0., 0., 0.
+  if n % 2 == 1:
+    med = x[n // 2]
+  else:
+    med = 0.5 * (x[n // 2 - 1] + x[n // 2])
+  d = z * math.sqrt(n) / 2.
+  j = max(int(math.floor(n / 2. - d)), 0)
+  k = min(int(math.ceil(n / 2. + d)), n - 1)
+  return med, x[j], x[k]
+
+
+def relPrecision(samples, z=kZ95):
+  med, lo, hi = medianCI(samples, z)
+  if med <= 0:
+    return float('inf')
+  return 0.5 * (hi - lo) / med
+
+
+# -----------------------------------------------------------------------------
+# Times call() and returns the samples, in ms per call, and a dictionary
+# with the number of calls per sample, the median and its confidence
+# interval, the precision reached and whether the target was reached.
+#
+# onSample(i), if given, is called before sample i (outside of the timing)
+# and checkpoint(samples, number) after each sample.
+#
+# A measurement resumes from earlier samples when given with their number of
+# calls per sample : the calibration is then skipped.
+#
+def timeAdaptive(call,
+                 precision=kPrecision,
+                 budget=kBudget,
+                 minSamples=kMinSamples,
+                 maxSamples=kMaxSamples,
+                 onSample=None,
+                 samples=None,
+                 number=None,
+                 checkpoint=None):
+  ct = tit.Timer(call)
+  ti = time.time()
+  n = number
+  if n is None or samples is None:
+    n = getNumber(ct)
+    samples = []
+  samples = list(samples)
+
+  minSamples = max(minSamples, 1)
+  while len(samples) < maxSamples:
+    if len(samples) >= minSamples:
+      if relPrecision(samples) <= precision:
+        break
+      if time.time() - ti >= budget:
+        break
+    if not onSample is None:
+      onSample(len(samples))
+    samples.append(1000. * ct.timeit(n) / n)
+    if not checkpoint is None:
+      checkpoint(samples, n)
+
+  med, lo, hi = medianCI(samples)
+  info = {
+    'number': n,
+    'samples': len(samples),
+    'median': med,
+    'ciLow': lo,
+    'ciHigh': hi,
+    'precision': relPrecision(samples),
+    'converged': relPrecision(samples) <= precision,
+  }
+  return samples, info
+
+
+# -----------------------------------------------------------------------------
+# fn() run in a forked child, which inherits everything already prepared.
+# Returns its result, or None when it didn't end within timeout seconds (it's
+# then killed) or died.
+#
+def callKillable(fn, timeout):
+  ctx = mp.get_context('fork')
+  rd, wr = ctx.Pipe(duplex=False)
+
+  def child():
+    rd.close()
+    try:
+      wr.send((True, fn()))
+    except BaseException as e:
+      wr.send((False, repr(e)))
+    wr.close()
+
+  # nothing buffered is written twice
+  sys.stdout.flush()
+  sys.stderr.flush()
+  proc = ctx.Process(target=child)
+  proc.start()
+  wr.close()
+  res = None
+  try:
+    if rd.poll(timeout):
+      res = rd.recv()
+  except EOFError:
+    pass
+  if proc.is_alive():
+    proc.kill()
+  proc.join()
+  rd.close()
+
+  if res is None:
+    return None
+  ok, ret = res
+  if not ok:
+    raise RuntimeError('killable call failed : ' + ret)
+  return ret
+
+
+# -----------------------------------------------------------------------------
+# Least wall clock time (s) timeAdaptive() takes for a call of tCall seconds :
+# calibration, then minSamples samples
+#
+def estimateCost(tCall, minSamples=kMinSamples, minTime=kMinSampleTime):
+  ts = max(tCall, minTime)
+  return 2 * ts + max(minSamples, 1) * ts
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def infoString(info):
+  mark = '' if info['converged'] else '*'
+  return 'n {:3d} +/- {:5.1f} %{:s}'.format(info['samples'],
+                                          100. * info['precision'], mark)
@@ -0,0 +1,206 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  benchVerify.py
+#
+#  Copyright 2021 jose-marcio <martins@jose-marcio.org>
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the  nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#  Output equivalence of Smil and skimage.
+#
+#  The output of the first backend is saved as a .npy reference file, then
+#  memory-mapped and compared, band of rows by band of rows, to the output
+#  of the second one, so that verification never holds more than one full
+#  size output in memory. Comparison modes :
+#    * exact    : same values
+#    * binary   : same support (non zero pixels) - 0/1, 0/255 and bool images
+#    * label    : same partition, whatever the label values
+#    * tolerance : |a - b| <= tol, tol being at least 1 when one output is
+#      of an integer type (Smil distances)
+#  Functions which aren't the same algorithm in both backends (mode None)
+#  aren't compared and are reported n/a : watershed and segmentation markers
+#  (hMinima for Smil, median and rank gradient for skimage, no markers at all
+#  for Smil binary watershed) and skeletons (HMT_hL thinning for Smil).
+#
+import os
+import hashlib
+
+import numpy as np
+
+kVerifyDir = os.path.join('var', 'verify')
+
+kVerifyMode = {
+  'erode': 'exact',
+  'open': 'exact',
+  'tophat': 'exact',
+  'gradient': 'exact',
+  'hMaxima': 'binary',
+  'hMinima': 'binary',
+  'label': 'label',
+  'fastLabel': 'label',
+  'segmentation': None,
+  'watershed': None,
+  'areaOpen': 'exact',
+  'areaThreshold': 'binary',
+  'distance': 'tolerance',
+  'zhangSkeleton': None,
+  'thinning': None,
+}
+
+# rows per band
+kChunkRows = 256
+
+
+# -----------------------------------------------------------------------------
+# Comparison mode of function fs, None when it can't be compared
+#
+def verifyMode(fs):
+  return kVerifyMode.get(fs, 'exact')
+
+
+# -----------------------------------------------------------------------------
+# [row, col] ([slice, row, col]) NumPy array of an output, Smil image or array
+#
+def toArray(out):
+  if isinstance(out, np.ndarray):
+    return out
+  arr = out.getNumArray()
+  if arr.ndim > 1 and arr.strides[0] < arr.strides[-1]:
+    arr = arr.T
+  return arr
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def contentHash(arr, rows=kChunkRows):
+  h = hashlib.blake2b(digest_size=16)
+  h.update(str(arr.dtype).encode())
+  h.update(str(arr.shape).encode())
+  for i in range(0, arr.shape[0], rows):
+    h.update(np.ascontiguousarray(arr[i:i + rows]).data)
+  return h.hexdigest()
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def refFile(name, vDir=kVerifyDir):
+  return os.path.join(vDir, name + '.npy')
+
+
+def saveReference(name, out, vDir=kVerifyDir):
+  os.makedirs(vDir, exist_ok=True)
+  arr = toArray(out)
+  fPath = refFile(name, vDir)
+  with open(fPath, 'wb') as fout:
+    np.save(fout, arr)
+  return contentHash(arr)
+
+
+def loadReference(name, vDir=kVerifyDir):
+  fPath = refFile(name, vDir)
+  if not os.path.isfile(fPath):
+    return None
+  return np.load(fPath, mmap_mode='r')
+
+
+def dropReference(name, vDir=kVerifyDir):
+  fPath = refFile(name, vDir)
+  if os.path.isfile(fPath):
+    os.remove(fPath)
+
+
+# -----------------------------------------------------------------------------
+# Label equivalence : the pairs (a, b) seen at the same pixel must define a
+# one to one mapping. Mappings are kept across bands.
+#
+def checkLabels(a, b, fwd, bwd):
+  a = a.astype(np.int64).ravel()
+  b = b.astype(np.int64).ravel()
+  pairs = np.unique(np.stack((a, b)), axis=1)
+  nBad = 0
+  for la, lb in zip(pairs[0], pairs[1]):
+    la = int(la)
+    lb = int(lb)
+    if fwd.setdefault(la, lb) != lb or bwd.setdefault(lb, la) != la:
+      nBad += 1
+  return nBad
+
+
+# -----------------------------------------------------------------------------
+# Returns a dictionary : verdict (True/False), mode, number of differing
+# pixels (or inconsistent label pairs) and max absolute difference.
+#
+def compareOutputs(ref, out, mode='exact', tol=1e-3, rows=kChunkRows):
+  arr = toArray(out)
+  res = {'mode': mode, 'equal': False, 'nDiff': 0, 'maxDiff': 0.}
+  if ref.shape != arr.shape:
+    res['nDiff'] = -1
+    return res
+
+  if mode == 'tolerance':
+    isInt = [np.issubdtype(x.dtype, np.integer) for x in [ref, arr]]
+    if any(isInt):
+      tol = max(tol, 1.)
+
+  fwd = {}
+  bwd = {}
+  for i in range(0, ref.shape[0], rows):
+    a = np.asarray(ref[i:i + rows])
+    b = np.asarray(arr[i:i + rows])
+    if mode == 'label':
+      res['nDiff'] += checkLabels(a, b, fwd, bwd)
+      continue
+    if mode == 'binary':
+      d = (a != 0) != (b != 0)
+      res['nDiff'] += int(np.count_nonzero(d))
+      continue
+    d = np.abs(a.astype(np.float64) - b.astype(np.float64))
+    res['maxDiff'] = max(res['maxDiff'], float(d.max()))
+    if mode == 'tolerance':
+      res['nDiff'] += int(np.count_nonzero(d > tol))
+    else:
+      res['nDiff'] += int(np.count_nonzero(d))
+
+  res['equal'] = res['nDiff'] == 0
+  return res
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def verdictString(res):
+  if res is None:
+    return 'n/a'
+  if res['nDiff'] < 0:
+    return 'SHAPE'
+  if res['equal']:
+    return 'OK'
+  return 'DIFF({:d})'.format(res['nDiff'])
@@ -0,0 +1,312 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  benchStore.py
+#
+#  Copyright 2021 jose-marcio <martins@jose-marcio.org>
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the  nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#  Volumes (3D images) and 3D operations.
+#
+#  Volumes are arrays indexed [slice, row, col], either loaded (.npy files or
+#  any format Smil reads) or generated : smooth random noise, trilinear
+#  interpolation of a coarse random grid, written slice by slice to a
+#  memory-mapped .npy file, so that 1024^3 volumes are built out of core.
+#  Thresholding it at kLevel gives binary volumes of separate blobs
+#  (about 18 % of the voxels).
+#
+#  3D structuring elements are the D3 footprints of benchOps for skimage and
+#  their Smil counterparts : CubeSE(sz) and Cross3DSE(sz).
+#
+import os
+
+import numpy as np
+
+import benchOps as bo
+import benchPyramid as bp
+from benchOps import kSm, kSkm, kNdi, kSks
+from benchOps import sp, ndi, skf
+
+kVolumeDir = os.path.join('var', 'volume')
+kCell = 16
+kLevel = 0.65
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def volumeFile(side, seed=0, binary=False, cell=kCell, vDir=kVolumeDir):
+  prefix = 'bin' if binary else 'gray'
+  fName = 'vol-{:s}-{:d}-{:d}-{:d}.npy'.format(prefix, side, cell, seed)
+  return os.path.join(vDir, fName)
+
+
+# -----------------------------------------------------------------------------
+# Linear interpolation matrix from nc grid nodes, cell voxels apart, to n
+# voxels
+#
+def interpMatrix(n, nc, cell):
+  pos = (np.arange(n) + 0.5) / cell
+  i0 = np.floor(pos).astype(int)
+  f = (pos - i0).astype(np.float32)
+  W = np.zeros((n, nc), dtype=np.float32)
+  W[np.arange(n), i0] = 1. - f
+  W[np.arange(n), i0 + 1] = f
+  return W
+
+
+def mkVolume(fPath, side, seed=0, binary=False, cell=kCell):
+  rng = np.random.default_rng(seed)
+  nc = side // cell + 2
+  grid = rng.random((nc, nc, nc), dtype=np.float32)
+  W = interpMatrix(side, nc, cell)
+
+  os.makedirs(os.path.dirname(fPath) or '.', exist_ok=True)
+  tmp = fPath + '.tmp'
+  out = np.lib.format.open_memmap(tmp,
+                                  mode='w+',
+                                  dtype=np.uint8,
+                                  shape=(side, side, side))
+  for z in range(side):
+    layer = np.tensordot(W[z], grid, axes=1)
+    v = W @ layer @ W.T
+    if binary:
+      out[z] = np.where(v >= kLevel, 255, 0)
+    else:
+      out[z] = np.clip(255. * v, 0, 255)
+  out.flush()
+  del out
+  os.replace(tmp, fPath)
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def loadVolume(fin):
+  if fin.endswith('.npy'):
+    return np.load(fin, mmap_mode='r')
+  im = sp.Image(fin)
+  return np.array(bp.smilArray(im))
+
+
+# -----------------------------------------------------------------------------
+# In memory volume of side^3 voxels : a crop of the file fin if given, a
+# generated one otherwise. Returns None if fin is smaller than that.
+#
+def volumeGet(side,
+              fin=None,
+              seed=0,
+              binary=False,
+              cell=kCell,
+              vDir=kVolumeDir):
+  if fin is None:
+    fPath = volumeFile(side, seed, binary, cell, vDir)
+    if not os.path.isfile(fPath):
+      mkVolume(fPath, side, seed, binary, cell)
+    return np.load(fPath)
+
+  vol = loadVolume(fin)
+  if vol.ndim != 3 or min(vol.shape) < side:
+    return None
+  vol = np.array(vol[:side, :side, :side])
+  if binary:
+    vol = np.where(vol > 0, 255, 0).astype(np.uint8)
+  return vol
+
+
+def toBinary(vol):
+  return np.where(vol >= int(255 * kLevel), 255, 0).astype(np.uint8)
+
+
+#
+#  ####   #    #     #    #
+# #       ##  ##     #    #
+#  ####   # ## #     #    #
+#      #  #    #     #    #
+# #    #  #    #     #    #
+#  ####   #    #     #    ######
+#
+def smilSE3D(cli, sz=1):
+  key = ('smil', 'se3d', cli.squareSe, None, sz, None)
+
+  def build():
+    if cli.squareSe:
+      return sp.CubeSE(sz)
+    return sp.Cross3DSE(sz)
+
+  return bo.prepGet(key, build)
+
+
+# -----------------------------------------------------------------------------
+# Binary input of label, distance and watershed : the volume itself if
+# binary, its threshold at kLevel otherwise
+#
+def smBinary(cli, imIn, px):
+  if cli.binary:
+    return imIn
+  key = bo.prepKey(cli, 'smil', 'binary3d', px, None, bo.smilType(imIn))
+  return bo.prepGet(key, lambda: bp.arrayToSmil(toBinary(bp.smilArray(imIn))))
+
+
+def smPrepSE(cli, imIn, sz, px):
+  return (imIn, bo.smilOut(imIn), smilSE3D(cli, sz)), {}
+
+
+def smPrepLabel(cli, imIn, sz, px):
+  imBin = smBinary(cli, imIn, px)
+  return (imBin, bo.smilOut(imBin, 'UINT32'), sp.Cross3DSE()), {}
+
+
+def smPrepDistance(cli, imIn, sz, px):
+  imBin = smBinary(cli, imIn, px)
+  return (imBin, bo.smilOut(imBin)), {}
+
+
+def smPrepWatershed(cli, imIn, sz, px):
+  imBin = smBinary(cli, imIn, px)
+
+  def build():
+    imDist = sp.Image(imBin)
+    sp.distance(imBin, imDist, sp.Cross3DSE())
+    sp.inv(imDist, imDist)
+    return imDist
+
+  key = bo.prepKey(cli, 'smil', 'distInv3d', px, None, bo.smilType(imIn))
+  imDist = bo.prepGet(key, build)
+  return (imDist, bo.smilOut(imBin), sp.Cross3DSE()), {}
+
+
+smilOps = {
+  'erode': {'prepare': smPrepSE, 'run': (kSm, 'erode'), 'out': -2},
+  'open': {'prepare': smPrepSE, 'run': (kSm, 'open'), 'out': -2},
+  'label': {'prepare': smPrepLabel, 'run': (kSm, 'label'), 'out': -2},
+  'distance': {
+    'prepare': smPrepDistance,
+    'run': (kSm, 'distanceEuclidean'),
+    'out': -1
+  },
+  'watershed': {
+    'prepare': smPrepWatershed,
+    'run': (kSm, 'watershed'),
+    'out': -2
+  },
+}
+
+#
+#  ####   #    #     #    #    #    ##     ####   ######
+# #       #   #      #    ##  ##   #  #   #    #  #
+#  ####   ####       #    # ## #  #    #  #       #####
+#      #  #  #       #    #    #  ######  #  ###  #
+# #    #  #   #      #    #    #  #    #  #    #  #
+#  ####   #    #     #    #    #  #    #   ####   ######
+#
+def skSE3D(cli, sz=1):
+  key = ('skimage', 'se3d', cli.squareSe, None, sz, None)
+
+  def build():
+    if cli.squareSe:
+      return bo.mkSquareSE(cli, sz, D3=True)
+    return bo.mkCrossSE(cli, sz, D3=True)
+
+  return bo.prepGet(key, build)
+
+
+def skBinary(cli, imIn, px):
+  if cli.binary:
+    return imIn
+  key = bo.prepKey(cli, 'skimage', 'binary3d', px, None, bo.skType(imIn))
+  return bo.prepGet(key, lambda: toBinary(imIn))
+
+
+def skPrepSE(cli, imIn, sz, px):
+  return (imIn, skSE3D(cli, sz)), {}
+
+
+def skPrepLabel(cli, imIn, sz, px):
+  return (skBinary(cli, imIn, px), ), {'connectivity': 1}
+
+
+def skPrepDistance(cli, imIn, sz, px):
+  return (skBinary(cli, imIn, px), ), {}
+
+
+def skPrepWatershed(cli, imIn, sz, px):
+  imBin = skBinary(cli, imIn, px)
+
+  def build():
+    imInt = imBin.astype(int)
+    dist = ndi.distance_transform_edt(imInt)
+    coords = skf.peak_local_max(dist,
+                                footprint=bo.mkCrossSE(cli, 3, D3=True),
+                                labels=imInt)
+    mask = np.zeros(dist.shape, dtype=bool)
+    mask[tuple(coords.T)] = True
+    markers, _ = ndi.label(mask)
+    return -dist, markers, imInt
+
+  key = bo.prepKey(cli, 'skimage', 'distMarkers3d', px, None,
+                   bo.skType(imIn))
+  negDist, markers, imInt = bo.prepGet(key, build)
+  return (negDist, markers), {'mask': imInt}
+
+
+skimageOps = {
+  'erode': {'prepare': skPrepSE, 'run': (kSkm, 'erosion')},
+  'open': {'prepare': skPrepSE, 'run': (kSkm, 'opening')},
+  'label': {'prepare': skPrepLabel, 'run': (kSkm, 'label')},
+  'distance': {
+    'prepare': skPrepDistance,
+    'run': (kNdi, 'distance_transform_edt')
+  },
+  'watershed': {'prepare': skPrepWatershed, 'run': (kSks, 'watershed')},
+}
+
+#
+# #####   ######   ####      #     ####    #####  #####    #   #
+# #    #  #       #    #     #    #          #    #    #    # #
+# #    #  #####   #          #     ####      #    #    #     #
+# #####   #       #  ###     #         #     #    #####      #
+# #   #   #       #    #     #    #    #     #    #   #      #
+# #    #  ######   ####      #     ####      #    #    #     #
+#
+# 3D registry, used through benchOps getOp(), prepareOp() and runOp()
+kOps = {
+  'smil': smilOps,
+  'skimage': skimageOps,
+}
+
+# rough peak memory of a call, in volumes of the input size (skimage is the
+# worst : int64 labels, float64 distances, watershed markers and mask)
+kMemFactor = {
+  'erode': 2,
+  'open': 3,
+  'label': 10,
+  'distance': 10,
+  'watershed': 30,
+}
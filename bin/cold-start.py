@@ -0,0 +1,421 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  benchStore.py
+#
+#  Copyright 2021 jose-marcio <martins@jose-marcio.org>
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the  nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#  Cold start latency of Smil and skimage functions.
+#
+#  Each point (backend, function) runs several times, each time in a fresh
+#  process, which times separately :
+#    * startup : from process creation to the first line of this script
+#    * imports : the backend modules (import smilPython, skimage.morphology,
+#                ...), then the remaining ones of the benchmark
+#    * prepare : input conversions and output allocations
+#    * first   : the first call of the function
+#    * second  : the second call
+#    * steady  : median of the following calls (adaptive timing)
+#  along with the minor page faults of the first, second and steady calls.
+#  The first / steady ratio tells whether workers need to be pre-warmed.
+#
+#  Files stay in the page cache between runs : this is the cold start of a
+#  process, not of the machine.
+#
+import time
+
+# first thing done by a worker
+kWallStart = time.time()
+
+import os
+import sys
+import json
+import importlib
+import resource
+import statistics as st
+import subprocess
+
+from datetime import datetime
+
+import argparse as ap
+
+import benchTiming as bt
+
+kBackends = ['smil', 'skimage']
+
+# same as smil-vs-skimage.py
+kFuncs = [
+  'erode', 'open', 'tophat', 'gradient', 'hMaxima', 'hMinima', 'label',
+  'fastLabel', 'areaOpen', 'distance', 'areaThreshold', 'segmentation',
+  'watershed', 'zhangSkeleton', 'thinning'
+]
+
+# modules whose import is timed, by backend
+kImports = {
+  'smil': ['numpy', 'smilPython'],
+  'skimage': [
+    'numpy', 'scipy.ndimage', 'skimage.morphology', 'skimage.filters.rank',
+    'skimage.segmentation', 'skimage.feature'
+  ],
+}
+
+kColumns = [
+  'startup', 'imports', 'others', 'load', 'prepare', 'first', 'second',
+  'steady'
+]
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def getCliArgs():
+  parser = ap.ArgumentParser()
+
+  parser.add_argument('--debug', help='', action="store_true")
+  parser.add_argument('--verbose', help='', action="store_true")
+
+  parser.add_argument('--image',
+                      default='lena.png',
+                      help='Image file (in images/) or synthetic image (synth:...)',
+                      type=str)
+  parser.add_argument('--binary',
+                      default=False,
+                      help='Image is binary',
+                      action="store_true")
+  parser.add_argument('--squareSe',
+                      default=False,
+                      help='Structuring Element Square (default is Cross)',
+                      action='store_true')
+  parser.add_argument('--seSize',
+                      default=1,
+                      help='Structuring Element size',
+                      type=int)
+  parser.add_argument('--arg', help='Generic argument', type=float)
+
+  parser.add_argument('--funcs',
+                      default=None,
+                      help='comma separated list of functions (default : all)',
+                      type=str)
+  parser.add_argument('--which',
+                      default='both',
+                      help='which ? both, smil skimage (default : both)',
+                      type=str)
+  parser.add_argument('--runs',
+                      default=5,
+                      help='fresh processes per point (default : 5)',
+                      type=int)
+  parser.add_argument('--threads',
+                      default=0,
+                      help='OMP_NUM_THREADS of workers (default : unchanged)',
+                      type=int)
+
+  parser.add_argument('--repeat',
+                      default=bt.kMinSamples,
+                      help='min nb rounds of the steady state',
+                      type=int)
+  parser.add_argument('--precision',
+                      default=bt.kPrecision,
+                      help='target precision : 95%% CI half width / median',
+                      type=float)
+  parser.add_argument('--budget',
+                      default=5.,
+                      help='time budget of the steady state (s)',
+                      type=float)
+
+  # internal : measure a single run
+  parser.add_argument('--worker', help=ap.SUPPRESS, action='store_true')
+  parser.add_argument('--backend', default='smil', help=ap.SUPPRESS)
+  parser.add_argument('--function', default='erode', help=ap.SUPPRESS)
+  parser.add_argument('--spawnTime', default=0., help=ap.SUPPRESS, type=float)
+
+  cli = parser.parse_args()
+
+  if not cli.which in ['smil', 'skimage', 'both']:
+    print('which must be "smil", "skimage" or "both"')
+    exit(1)
+
+  return cli
+
+
+#
+# #    #   ####   #####   #    #  ######  #####
+# #    #  #    #  #    #  #   #   #       #    #
+# #    #  #    #  #    #  ####    #####   #    #
+# # ## #  #    #  #####   #  #    #       #####
+# ##  ##  #    #  #   #   #   #   #       #   #
+# #    #   ####   #    #  #    #  ######  #    #
+#
+# -----------------------------------------------------------------------------
+# Time (ms) and minor page faults of call()
+#
+def timeOnce(call):
+  f0 = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+  t0 = time.perf_counter()
+  call()
+  t1 = time.perf_counter()
+  f1 = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+  return 1000. * (t1 - t0), f1 - f0
+
+
+# -----------------------------------------------------------------------------
+# Measure a single cold run and print it, as JSON, on the last line of stdout
+#
+def runWorker(cli):
+  res = {
+    'backend': cli.backend,
+    'function': cli.function,
+    'startup': 1000. * (kWallStart - cli.spawnTime),
+    'modules': {},
+  }
+
+  ti = time.perf_counter()
+  for m in kImports[cli.backend]:
+    t0 = time.perf_counter()
+    importlib.import_module(m)
+    res['modules'][m] = 1000. * (time.perf_counter() - t0)
+  res['imports'] = 1000. * (time.perf_counter() - ti)
+
+  t0 = time.perf_counter()
+  import smilPython as sp
+  import benchOps as bo
+  import benchPyramid as bp
+  import benchSynth as bsy
+  res['others'] = 1000. * (time.perf_counter() - t0)
+
+  t0 = time.perf_counter()
+  fin = os.path.join('images', cli.image)
+  if bsy.isSynth(fin):
+    imSm = bp.arrayToSmil(bsy.synthGet(fin))
+  else:
+    imSm = sp.Image(fin)
+  if sp.isBinary(imSm):
+    cli.binary = True
+  imIn = imSm
+  if cli.backend == 'skimage':
+    imIn = bp.smilArray(imSm)
+  res['load'] = 1000. * (time.perf_counter() - t0)
+
+  t0 = time.perf_counter()
+  call = bo.prepareOp(cli, cli.backend, cli.function, imIn, cli.seSize, 1)
+  res['prepare'] = 1000. * (time.perf_counter() - t0)
+  if call is None:
+    print(json.dumps({'error': 'not implemented'}))
+    return 1
+
+  res['first'], res['faultsFirst'] = timeOnce(call)
+  res['second'], res['faultsSecond'] = timeOnce(call)
+
+  dt, info = bt.timeAdaptive(call,
+                             precision=cli.precision,
+                             budget=cli.budget,
+                             minSamples=cli.repeat)
+  res['steady'] = info['median']
+  res['precision'] = info['precision']
+  res['faultsSteady'] = timeOnce(call)[1]
+  res['smilThreads'] = bo.getThreads()
+
+  print(json.dumps(res))
+  return 0
+
+
+#
+#  ####   #    #  ######  ######  #####
+# #       #    #  #       #       #    #
+#  ####   #    #  #####   #####   #    #
+#      #  # ## #  #       #       #####
+# #    #  ##  ##  #       #       #
+#  ####   #    #  ######  ######  #
+#
+# -----------------------------------------------------------------------------
+#
+#
+def runPoint(cli, backend, fs):
+  env = dict(os.environ)
+  if cli.threads > 0:
+    env['OMP_NUM_THREADS'] = str(cli.threads)
+
+  runs = []
+  for i in range(cli.runs):
+    cmd = [
+      sys.executable,
+      os.path.abspath(__file__), '--worker', '--backend', backend,
+      '--function', fs, '--image', cli.image, '--seSize',
+      str(cli.seSize), '--repeat',
+      str(cli.repeat), '--precision',
+      str(cli.precision), '--budget',
+      str(cli.budget)
+    ]
+    if cli.binary:
+      cmd.append('--binary')
+    if cli.squareSe:
+      cmd.append('--squareSe')
+    if not cli.arg is None:
+      cmd += ['--arg', str(cli.arg)]
+    # last, as close as possible to the process creation
+    cmd += ['--spawnTime', repr(time.time())]
+
+    r = subprocess.run(cmd,
+                       stdout=subprocess.PIPE,
+                       env=env,
+                       universal_newlines=True)
+    lines = r.stdout.strip().split('\n')
+    if r.returncode != 0 or len(lines) == 0:
+      return None
+    try:
+      res = json.loads(lines[-1])
+    except ValueError:
+      return None
+    if 'error' in res:
+      return None
+    runs.append(res)
+  return runs
+
+
+# -----------------------------------------------------------------------------
+# Median, over the runs, of each column
+#
+def medianRun(runs):
+  p = {}
+  for k in kColumns + ['faultsFirst', 'faultsSecond', 'faultsSteady']:
+    p[k] = st.median([r[k] for r in runs])
+  p['modules'] = {}
+  for m in runs[0]['modules'].keys():
+    p['modules'][m] = st.median([r['modules'][m] for r in runs])
+  return p
+
+
+def printHeader():
+  h = '  {:8s} {:14s} | {:>8s} {:>8s} {:>8s} | {:>8s} {:>9s} {:>9s} {:>9s} | {:>8s} | {:>15s}'.format(
+    'Backend', 'Function', 'Startup', 'Imports', 'Others', 'Prepare',
+    'First', 'Second', 'Steady', 'F / S', 'Faults F / S')
+  print(h)
+  print('-' * (len(h) + 3))
+
+
+def printPoint(backend, fs, p):
+  ratio = p['first'] / p['steady'] if p['steady'] > 0 else 0.
+  print(
+    '  {:8s} {:14s} | {:8.1f} {:8.1f} {:8.1f} | {:8.2f} {:9.3f} {:9.3f} {:9.3f} | {:8.2f} | {:7d} {:7d}'
+    .format(backend, fs, p['startup'], p['imports'], p['others'],
+            p['prepare'], p['first'], p['second'], p['steady'], ratio,
+            int(p['faultsFirst']), int(p['faultsSteady'])))
+
+
+def printImports(results):
+  print('* Import time (ms), median over all runs')
+  print()
+  for backend in results.keys():
+    mods = {}
+    for fs in results[backend].keys():
+      for m, t in results[backend][fs]['modules'].items():
+        mods.setdefault(m, []).append(t)
+    for m in mods.keys():
+      print('  {:8s} {:24s} : {:8.1f}'.format(backend, m, st.median(mods[m])))
+  print()
+
+
+def saveCold(cli, node, b, results):
+  if not os.path.isdir(node):
+    os.mkdir(node)
+  prefix = 'bin' if cli.binary else 'gray'
+  fName = '{:s}-{:s}-cold.csv'.format(prefix, b)
+
+  h = ['backend', 'function', 'runs'] + kColumns + [
+    'firstOverSteady', 'faultsFirst', 'faultsSecond', 'faultsSteady'
+  ]
+  with open(os.path.join(node, fName), 'w') as fout:
+    fout.write(';'.join(h) + '\n')
+    for backend in results.keys():
+      for fs, p in results[backend].items():
+        ratio = p['first'] / p['steady'] if p['steady'] > 0 else 0.
+        sl = [backend, fs, '{:d}'.format(cli.runs)]
+        sl += ['{:.5f}'.format(p[k]) for k in kColumns]
+        sl += ['{:.5f}'.format(ratio)]
+        sl += [
+          '{:d}'.format(int(p[k]))
+          for k in ['faultsFirst', 'faultsSecond', 'faultsSteady']
+        ]
+        fout.write(';'.join(sl) + '\n')
+
+
+# =============================================================================
+#
+#
+#
+def main(args):
+  cli = getCliArgs()
+
+  if cli.worker:
+    return runWorker(cli)
+
+  # imports numpy : kept out of module level, workers time its import
+  import benchSynth as bsy
+
+  fin = os.path.join('images', cli.image)
+  if not bsy.isSynth(fin) and not os.path.isfile(fin):
+    print("Image file {:s} not found".format(cli.image))
+    return 1
+  if bsy.isSynth(fin) and bsy.isBinary(fin):
+    cli.binary = True
+
+  funcs = kFuncs
+  if not cli.funcs is None:
+    funcs = cli.funcs.split(',')
+  backends = kBackends if cli.which == 'both' else [cli.which]
+
+  node = os.uname().nodename.split('.')[0]
+
+  dt = datetime.now()
+  print('Date     : {:s}'.format(dt.strftime("%d/%m/%Y %I:%M:%S %p")))
+  print('Image    : {:s}'.format(cli.image))
+  print('Runs     : {:d} fresh processes per point'.format(cli.runs))
+  print()
+  print('* Times in ms')
+  print()
+  printHeader()
+
+  results = {}
+  for fs in funcs:
+    for backend in backends:
+      runs = runPoint(cli, backend, fs)
+      if runs is None or len(runs) == 0:
+        continue
+      p = medianRun(runs)
+      results.setdefault(backend, {})[fs] = p
+      printPoint(backend, fs, p)
+  print()
+
+  printImports(results)
+  saveCold(cli, node, bsy.imageName(cli.image), results)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv))
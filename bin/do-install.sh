@@ -5,6 +5,9 @@ Dir=/export/vhosts/smil.cmm/htdocs/benchmark
 
 ResDir=$(echo $(hostname) | awk -F. '{print $1}')
 
+# legacy CSV files are generated from the results store
+[ -f var/results.sqlite ] && bin/results.py export --host $ResDir --outDir .
+
 rsync -av --delete $ResDir ${Srv}:${Dir}/
 #rsync -av --delete images  ${Srv}:${Dir}/
 
@@ -0,0 +1,269 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  memSampler.py
+#
+#  Copyright 2021 jose-marcio <martins@jose-marcio.org>
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the  nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#  Memory sampler of the benchmark process itself.
+#
+#  Sampling is done by a helper child process, so that it goes on even when
+#  the measured call holds the GIL. The benchmark tags samples by declaring
+#  phases (backend, function, size, repeat) : the current phase index is
+#  shared with the sampler through a multiprocessing.Value.
+#
+#  Besides sampled RSS, the kernel high water mark (VmHWM) is reset at the
+#  beginning of each phase and read at its end, which gives the exact peak
+#  RSS of the phase whatever the sampling rate.
+#
+import os
+import time
+import array
+import contextlib
+
+import multiprocessing as mp
+
+import psutil
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def sampleLoop(pid, dt, phaseId, stop, conn):
+  proc = psutil.Process(pid)
+
+  tm = array.array('d')
+  ph = array.array('l')
+  rss = array.array('q')
+  nth = array.array('l')
+  cpu = array.array('d')
+
+  t0 = time.perf_counter()
+  ct = proc.cpu_times()
+  tPrev = t0
+  cPrev = ct.user + ct.system
+  tNext = t0
+  while not stop.is_set():
+    try:
+      with proc.oneshot():
+        mem = proc.memory_info()
+        n = proc.num_threads()
+        ct = proc.cpu_times()
+    except psutil.Error:
+      break
+    now = time.perf_counter()
+    c = ct.user + ct.system
+    tm.append(now - t0)
+    ph.append(phaseId.value)
+    rss.append(mem.rss)
+    nth.append(n)
+    cpu.append(100. * (c - cPrev) / max(now - tPrev, 1e-9))
+    tPrev, cPrev = now, c
+
+    tNext += dt
+    delay = tNext - time.perf_counter()
+    if delay > 0:
+      time.sleep(delay)
+    else:
+      tNext = time.perf_counter()
+
+  conn.send((tm, ph, rss, nth, cpu))
+  conn.close()
+
+
+# -----------------------------------------------------------------------------
+# Kernel peak RSS of this process : reset and read (Linux only)
+#
+def resetPeakRSS():
+  try:
+    with open('/proc/self/clear_refs', 'w') as f:
+      f.write('5')
+    return True
+  except OSError:
+    return False
+
+
+def getPeakRSS():
+  try:
+    with open('/proc/self/status') as f:
+      for line in f:
+        if line.startswith('VmHWM:'):
+          return int(line.split()[1]) * 1024
+  except OSError:
+    pass
+  return 0
+
+
+#
+#  ####     ##    #    #  #####   #       ######  #####
+# #        #  #   ##  ##  #    #  #       #       #    #
+#  ####   #    #  # ## #  #    #  #       #####   #    #
+#      #  ######  #    #  #####   #       #       #####
+# #    #  #    #  #    #  #       #       #       #   #
+#  ####   #    #  #    #  #       ######  ######  #    #
+#
+class MemSampler:
+  def __init__(self, dt=0.01):
+    self.dt = dt
+    self.phases = []
+    self.samples = None
+    self.proc = None
+    self.phaseId = mp.Value('l', -1, lock=False)
+    self.stopEvent = mp.Event()
+    self.conn = None
+
+  # ---------------------------------------------------------------------------
+  #
+  #
+  def start(self):
+    rConn, wConn = mp.Pipe(duplex=False)
+    self.conn = rConn
+    self.proc = mp.Process(target=sampleLoop,
+                           args=(os.getpid(), self.dt, self.phaseId,
+                                 self.stopEvent, wConn),
+                           daemon=True)
+    self.proc.start()
+    wConn.close()
+
+  def stop(self):
+    if self.proc is None:
+      return None
+    self.stopEvent.set()
+    self.samples = self.conn.recv()
+    self.proc.join()
+    self.proc = None
+    return self.samples
+
+  # ---------------------------------------------------------------------------
+  #
+  #
+  def beginPhase(self, **tags):
+    tags['repeat'] = tags.get('repeat', -1)
+    tags['hwmReset'] = resetPeakRSS()
+    tags['ti'] = time.perf_counter()
+    self.phases.append(tags)
+    self.phaseId.value = len(self.phases) - 1
+
+  def endPhase(self):
+    i = self.phaseId.value
+    if i < 0:
+      return
+    self.phases[i]['tf'] = time.perf_counter()
+    self.phases[i]['hwm'] = getPeakRSS()
+    self.phaseId.value = -1
+
+  @contextlib.contextmanager
+  def phase(self, **tags):
+    self.beginPhase(**tags)
+    try:
+      yield self
+    finally:
+      self.endPhase()
+
+  # ---------------------------------------------------------------------------
+  # Start a new sub-phase with the same tags and another repeat index
+  #
+  def setRepeat(self, i):
+    j = self.phaseId.value
+    if j < 0:
+      return
+    tags = dict(self.phases[j])
+    self.endPhase()
+    for k in ['ti', 'tf', 'hwm', 'hwmReset']:
+      tags.pop(k, None)
+    tags['repeat'] = i
+    self.beginPhase(**tags)
+
+  # ---------------------------------------------------------------------------
+  # Per phase summary : samples, max sampled RSS, kernel peak RSS, max
+  # threads and mean CPU %
+  #
+  def summary(self):
+    res = [dict(tags) for tags in self.phases]
+    for s in res:
+      s['nSamples'] = 0
+      s['rssMax'] = 0
+      s['threadsMax'] = 0
+      s['cpuMean'] = 0.
+    if self.samples is None:
+      return res
+
+    tm, ph, rss, nth, cpu = self.samples
+    for j in range(len(tm)):
+      if ph[j] < 0 or ph[j] >= len(res):
+        continue
+      s = res[ph[j]]
+      s['nSamples'] += 1
+      s['rssMax'] = max(s['rssMax'], rss[j])
+      s['threadsMax'] = max(s['threadsMax'], nth[j])
+      s['cpuMean'] += cpu[j]
+    for s in res:
+      if s['nSamples'] > 0:
+        s['cpuMean'] /= s['nSamples']
+      # without kernel peak, fall back to sampled maximum
+      if not s.get('hwmReset', False):
+        s['hwm'] = s['rssMax']
+    return res
+
+  # ---------------------------------------------------------------------------
+  #
+  #
+  def saveSamples(self, fName):
+    if self.samples is None:
+      return
+    tm, ph, rss, nth, cpu = self.samples
+    with open(fName, 'w') as fout:
+      fout.write('time;phase;rss;threads;cpu\n')
+      for j in range(len(tm)):
+        fout.write('{:.6f};{:d};{:d};{:d};{:.2f}\n'.format(
+          tm[j], ph[j], rss[j] // 1024, nth[j], cpu[j]))
+
+  def saveSummary(self, fName):
+    h = [
+      'phase', 'backend', 'function', 'size', 'repeat', 'duration',
+      'samples', 'rssMax', 'peakRSS', 'threadsMax', 'cpuMean'
+    ]
+    with open(fName, 'w') as fout:
+      fout.write(';'.join(h) + '\n')
+      for i, s in enumerate(self.summary()):
+        sl = [
+          '{:d}'.format(i),
+          str(s.get('backend', '')),
+          str(s.get('function', '')),
+          str(s.get('size', '')),
+          '{:d}'.format(s['repeat']),
+          '{:.6f}'.format(s.get('tf', s['ti']) - s['ti']),
+          '{:d}'.format(s['nSamples']),
+          '{:d}'.format(s['rssMax'] // 1024),
+          '{:d}'.format(s.get('hwm', 0) // 1024),
+          '{:d}'.format(s['threadsMax']),
+          '{:.2f}'.format(s['cpuMean'])
+        ]
+        fout.write(';'.join(sl) + '\n')
@@ -4,6 +4,8 @@ import sys
 import os
 import smilPython as sp
 
+import benchPyramid as bp
+
 
 def resizeImage(fIm, kmax):
   if not os.path.isfile(fIm):
@@ -25,8 +27,36 @@ def resizeImage(fIm, kmax):
     sp.write(imOut, fOut)
     k *= 2
 
+
+#
+# Same scales, but put into the pyramid cache used by smil-vs-skimage.py
+# (--pyramid) instead of PNG files
+#
+def fillPyramid(fIm, kmax):
+  if not os.path.isfile(fIm):
+    print("File not found : ", fIm)
+    return
+
+  print("* Doing for ", fIm)
+  im = sp.Image(fIm)
+  isBin = sp.isBinary(im)
+  w = im.getWidth()
+  k = 0.5
+  for i in range(0, kmax):
+    szIm = int(k * w)
+    fOut = bp.pyramidFile(fIm, k, isBin)
+    print("  {:4.1f} {:5d} {:s}".format(k, szIm, fOut))
+
+    bp.pyramidGet(fIm, k, isBin)
+    k *= 2
+
+
 files = sys.argv[1:]
 
-for f in files:
-  resizeImage(f, 7)
+doIt = resizeImage
+if len(files) > 0 and files[0] == '--pyramid':
+  doIt = fillPyramid
+  files = files[1:]
 
+for f in files:
+  doIt(f, 7)
@@ -25,6 +25,8 @@
 
 import os
 import sys
+import time
+import json
 import psutil
 
 import fnmatch as fn
@@ -52,6 +54,29 @@ import configparser as cp
 #from skimage.feature import peak_local_max
 #from skimage.filters import rank
 
+#
+# Record written to the binary output file. Process level rows have tid = 0,
+# thread level rows (--threads) have tid set and only the CPU times filled.
+#
+kRecord = np.dtype([
+  ('time', '<f8'),
+  ('pid', '<i4'),
+  ('tid', '<i4'),
+  ('user', '<f8'),
+  ('system', '<f8'),
+  ('rss', '<i8'),
+  ('vms', '<i8'),
+  ('threads', '<i4'),
+  ('ctxVol', '<i8'),
+  ('ctxInvol', '<i8'),
+  ('minFlt', '<i8'),
+  ('majFlt', '<i8'),
+  ('readBytes', '<i8'),
+  ('writeBytes', '<i8'),
+  ('readCount', '<i8'),
+  ('writeCount', '<i8'),
+])
+
 
 # -----------------------------------------------------------------------------
 #
@@ -63,48 +88,257 @@ def getCliArgs():
   parser.add_argument('--verbose', help='', action="store_true")
 
   parser.add_argument('--pid', default=None, help='PID to monitor', type=int)
-  parser.add_argument('--dt', default=1, help='time interval', type=int)
+  parser.add_argument('--dt',
+                      default=1,
+                      help='time interval in seconds (may be < 1)',
+                      type=float)
   parser.add_argument('--csv', help='output CSV format', action='store_true')
 
+  parser.add_argument('--tree',
+                      help='follow the whole process tree',
+                      action='store_true')
+  parser.add_argument('--threads',
+                      help='record per thread CPU times',
+                      action='store_true')
+  parser.add_argument('--out',
+                      default=None,
+                      help='binary output file (no per sample printing)',
+                      type=str)
+  parser.add_argument('--bufsize',
+                      default=65536,
+                      help='ring buffer size, in records (default : 65536)',
+                      type=int)
+  parser.add_argument('--read',
+                      default=None,
+                      help='dump a binary output file as CSV and exit',
+                      type=str)
+
   cli = parser.parse_args()
   return cli
 
-# =============================================================================
+
+# -----------------------------------------------------------------------------
+# Page faults are not available from psutil on all versions : read them from
+# /proc/<pid>/stat (fields 10 and 12, after the command name)
 #
+def getFaults(pid):
+  try:
+    with open('/proc/{:d}/stat'.format(pid)) as f:
+      s = f.read()
+  except OSError:
+    return 0, 0
+  fields = s[s.rindex(')') + 2:].split()
+  return int(fields[7]), int(fields[9])
+
+
+# -----------------------------------------------------------------------------
 #
 #
-def main(args):
-  cli = getCliArgs()
+def getProcesses(root, tree=False):
+  procs = [root]
+  if tree:
+    try:
+      procs += root.children(recursive=True)
+    except psutil.Error:
+      pass
+  return procs
+
+
+#
+# #####   #    #  ######  ######  ######  #####
+# #    #  #    #  #       #       #       #    #
+# #####   #    #  #####   #####   #####   #    #
+# #    #  #    #  #       #       #       #####
+# #    #  #    #  #       #       #       #   #
+# #####    ####   #       #       ######  #    #
+#
+class RingBuffer:
+  def __init__(self, fName, size=65536):
+    self.buf = np.zeros(size, dtype=kRecord)
+    self.n = 0
+    self.fout = open(fName, 'wb')
+
+  def append(self, rec):
+    if self.n >= len(self.buf):
+      self.flush()
+    self.buf[self.n] = rec
+    self.n += 1
+
+  def flush(self):
+    self.buf[:self.n].tofile(self.fout)
+    self.fout.flush()
+    self.n = 0
+
+  def close(self):
+    self.flush()
+    self.fout.close()
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def writeHeader(cli, fName, t0):
+  hdr = {
+    'pid': cli.pid,
+    'dt': cli.dt,
+    'tree': cli.tree,
+    'threads': cli.threads,
+    'start': t0,
+    'dtype': kRecord.descr,
+  }
+  with open(fName + '.json', 'w') as f:
+    json.dump(hdr, f)
+
+
+def readRecords(fName):
+  with open(fName + '.json') as f:
+    hdr = json.load(f)
+  dtype = np.dtype([tuple(d) for d in hdr['dtype']])
+  return hdr, np.fromfile(fName, dtype=dtype)
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def sampleProcess(proc, t, cli, ring):
+  with proc.oneshot():
+    ct = proc.cpu_times()
+    mem = proc.memory_info()
+    nth = proc.num_threads()
+    ctx = proc.num_ctx_switches()
+    try:
+      ic = proc.io_counters()
+      ioc = (ic.read_bytes, ic.write_bytes, ic.read_count, ic.write_count)
+    except (psutil.AccessDenied, AttributeError):
+      ioc = (0, 0, 0, 0)
+    ths = proc.threads() if cli.threads else []
+  minFlt, majFlt = getFaults(proc.pid)
+
+  ring.append((t, proc.pid, 0, ct.user, ct.system, mem.rss, mem.vms, nth,
+               ctx.voluntary, ctx.involuntary, minFlt, majFlt) + ioc)
+  for th in ths:
+    ring.append((t, proc.pid, th.id, th.user_time, th.system_time, 0, 0, 0, 0,
+                 0, 0, 0, 0, 0, 0, 0))
 
-  if cli.pid is None:
-    return 1
 
+# -----------------------------------------------------------------------------
+# High rate mode : samples go to the ring buffer, which is flushed in bulk to
+# the output file, nothing is printed while sampling.
+#
+def monitorToFile(cli, root):
+  t0 = time.time()
+  writeHeader(cli, cli.out, t0)
+  ring = RingBuffer(cli.out, cli.bufsize)
+
+  tc0 = time.perf_counter()
+  tNext = tc0
   try:
-    process = psutil.Process(cli.pid)
-    _ = process.cpu_percent(1.)
-  except:
-    return 1
+    while root.is_running():
+      t = time.perf_counter() - tc0
+      for proc in getProcesses(root, cli.tree):
+        try:
+          sampleProcess(proc, t, cli, ring)
+        except psutil.Error:
+          continue
+
+      tNext += cli.dt
+      delay = tNext - time.perf_counter()
+      if delay > 0:
+        time.sleep(delay)
+      else:
+        tNext = time.perf_counter()
+  except KeyboardInterrupt:
+    pass
+  ring.close()
+  return 0
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def dumpRecords(fName):
+  hdr, recs = readRecords(fName)
+  names = recs.dtype.names
+  print(';'.join(names))
+  for r in recs:
+    sl = []
+    for k in names:
+      if recs.dtype[k].kind == 'f':
+        sl.append('{:.6f}'.format(r[k]))
+      else:
+        sl.append('{:d}'.format(r[k]))
+    print(';'.join(sl))
+  return 0
 
-  t = cli.dt
+
+# -----------------------------------------------------------------------------
+# Legacy text mode : one line per sample (CPU, VMS, RSS in KB)
+#
+def monitorToText(cli, root):
+  t = 0.
   if cli.csv:
-    print('{:s};{:s};{:s};{:s}'.format('date','cpu','virt','res'))
+    print('{:s};{:s};{:s};{:s}'.format('date', 'cpu', 'virt', 'res'))
+
+  prev = {}
+  tPrev = time.perf_counter()
   while True:
-    try:
-      cpu = process.cpu_percent(cli.dt)
-    except:
+    time.sleep(cli.dt)
+    if not root.is_running():
       break
-    mem = process.memory_info()
-    rss = mem.rss // 1024
-    vms = mem.vms // 1024
+    cpu = 0.
+    rss = 0
+    vms = 0
+    now = time.perf_counter()
+    cur = {}
+    for proc in getProcesses(root, cli.tree):
+      try:
+        with proc.oneshot():
+          ct = proc.cpu_times()
+          mem = proc.memory_info()
+      except psutil.Error:
+        continue
+      cur[proc.pid] = ct.user + ct.system
+      cpu += cur[proc.pid] - prev.get(proc.pid, cur[proc.pid])
+      rss += mem.rss // 1024
+      vms += mem.vms // 1024
+    cpu = 100. * cpu / (now - tPrev)
+    prev, tPrev = cur, now
+
+    t += cli.dt
     if not cli.csv:
-      print("{:6d} : {:7.2f} % - {:10d} {:10d}".format(t, cpu, vms, rss))
+      print("{:8.3f} : {:7.2f} % - {:10d} {:10d}".format(t, cpu, vms, rss))
     else:
-      print("{:d};{:.2f};{:d};{:d}".format(t, cpu, vms, rss))
-    t += cli.dt
+      print("{:.3f};{:.2f};{:d};{:d}".format(t, cpu, vms, rss))
+    sys.stdout.flush()
 
   return 0
 
 
+# =============================================================================
+#
+#
+#
+def main(args):
+  cli = getCliArgs()
+
+  if not cli.read is None:
+    return dumpRecords(cli.read)
+
+  if cli.pid is None:
+    return 1
+
+  try:
+    root = psutil.Process(cli.pid)
+    for proc in getProcesses(root, cli.tree):
+      _ = proc.cpu_times()
+  except psutil.Error:
+    return 1
+
+  if not cli.out is None:
+    return monitorToFile(cli, root)
+  return monitorToText(cli, root)
+
+
 if __name__ == '__main__':
   import sys
   sys.exit(main(sys.argv))
@@ -0,0 +1,318 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  results.py
+#
+#  Copyright 2021 jose-marcio <martins@jose-marcio.org>
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the  nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#  Results store tool (see benchStore.py)
+#
+#    results.py import jose-desktop nestor taurus
+#    results.py query --function erode --backend smil --host taurus
+#    results.py export --host taurus --outDir www
+#    results.py fit --function erode --host taurus
+#    results.py compare --base until=2021-06-30 --cand since=2021-07-01
+#
+#  compare matches the points of a baseline and a candidate selection by
+#  (backend, function, image, size, SE, SE shape, dtype, threads) and tests, on the raw
+#  samples, whether the candidate is slower (one sided Mann-Whitney U,
+#  Holm adjusted). It exits with status 1 when some point is significantly
+#  slower by more than the threshold.
+#
+import os
+import sys
+
+import argparse as ap
+
+import numpy as np
+
+import benchStore as bs
+import benchStats as bst
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def getCliArgs():
+  parser = ap.ArgumentParser()
+  parser.add_argument('--store',
+                      default=bs.kStoreFile,
+                      help='results store : SQLite file or .parquet directory',
+                      type=str)
+
+  sub = parser.add_subparsers(dest='command')
+
+  p = sub.add_parser('import', help='import legacy CSV host directories')
+  p.add_argument('dirs', metavar='dir', type=str, nargs='+',
+                 help='host directories')
+
+  for cmd, hlp in [('query', 'print matching points'),
+                   ('export', 'write the legacy CSV files')]:
+    p = sub.add_parser(cmd, help=hlp)
+    p.add_argument('--function', type=str)
+    p.add_argument('--image', type=str)
+    p.add_argument('--backend', type=str)
+    p.add_argument('--host', type=str)
+    p.add_argument('--axis', type=str, help='szim | szse')
+    p.add_argument('--size', type=int)
+    p.add_argument('--se', type=int)
+    p.add_argument('--dtype', type=str)
+    p.add_argument('--seShape', type=str)
+    p.add_argument('--threads', type=int)
+    p.add_argument('--since', type=str, help='date (ISO format)')
+    p.add_argument('--until', type=str, help='date (ISO format)')
+    if cmd == 'export':
+      p.add_argument('--outDir', default='.', help='output directory')
+
+  p = sub.add_parser('fit', help='complexity exponent of the size sweeps')
+  p.add_argument('--function', type=str)
+  p.add_argument('--image', type=str)
+  p.add_argument('--backend', type=str)
+  p.add_argument('--host', type=str)
+  p.add_argument('--dtype', type=str)
+  p.add_argument('--seShape', type=str)
+  p.add_argument('--threads', type=int)
+  p.add_argument('--since', type=str, help='date (ISO format)')
+  p.add_argument('--until', type=str, help='date (ISO format)')
+  p.add_argument('--predict',
+                 default='32768,65536',
+                 help='image sides to predict the time of',
+                 type=str)
+
+  p = sub.add_parser('compare', help='regressions between two runs')
+  p.add_argument('--base',
+                 required=True,
+                 help='baseline : key=value,... (columns, since, until, store)')
+  p.add_argument('--cand',
+                 required=True,
+                 help='candidate : key=value,... (columns, since, until, store)')
+  p.add_argument('--function', type=str)
+  p.add_argument('--image', type=str)
+  p.add_argument('--backend', type=str)
+  p.add_argument('--threshold',
+                 default=0.05,
+                 help='relative slowdown threshold (default : 0.05)',
+                 type=float)
+  p.add_argument('--alpha',
+                 default=0.01,
+                 help='significance level (default : 0.01)',
+                 type=float)
+  p.add_argument('--all', help='list all points', action='store_true')
+
+  cli = parser.parse_args()
+  if cli.command is None:
+    parser.print_help()
+    sys.exit(1)
+  return cli
+
+
+def getWhere(cli):
+  keys = ['function', 'image', 'backend', 'host', 'axis', 'size', 'se',
+          'dtype', 'seShape', 'threads']
+  return {k: getattr(cli, k) for k in keys if hasattr(cli, k)}
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def doQuery(cli):
+  rows = bs.query(cli.store, cli.since, cli.until, **getWhere(cli))
+  fmt = '{:19s} {:10s} {:8s} {:14s} {:12s} {:4s} {:6d} {:2d} {:3d} | {:11.3f} {:11.3f} {:4d} {:5.1f}'
+  h = '{:19s} {:10s} {:8s} {:14s} {:12s} {:4s} {:>6s} {:2s} {:>3s} | {:>11s} {:>11s} {:>4s} {:>5s}'.format(
+    'Date', 'Host', 'Backend', 'Function', 'Image', 'Axis', 'Size', 'SE',
+    'Thr', 'Median', 'Min', 'N', 'Prec')
+  print(h)
+  print('-' * len(h))
+  for r in rows:
+    print(fmt.format(r['date'], r['host'], r['backend'], r['function'],
+                     r['image'], r['axis'], r['size'] or 0, r['se'] or 0,
+                     r['threads'] or 0, r['median'] or 0., r['min'] or 0.,
+                     r['nSamples'] or 0, 100. * (r['precision'] or 0.)))
+  print()
+  print('  {:d} points'.format(len(rows)))
+  return 0
+
+
+def doExport(cli):
+  files = bs.exportCsv(cli.store, cli.outDir, cli.since, cli.until,
+                       **getWhere(cli))
+  for f in files:
+    print('  {:s}'.format(f))
+  print()
+  print('  {:d} files'.format(len(files)))
+  return 0
+
+
+def doImport(cli):
+  for d in cli.dirs:
+    if not os.path.isdir(d):
+      print('Not a directory : {:s}'.format(d))
+      continue
+    with bs.StoreWriter(cli.store) as writer:
+      nb = bs.importCsv(writer, d)
+    print('  {:s} : {:d} points'.format(d, nb))
+  return 0
+
+
+# -----------------------------------------------------------------------------
+# Image size sweeps : last median of each size, by (host, image, function,
+# backend). Images are taken as square : N = size^2. Imported CSV points
+# have no median : their mean is used.
+#
+def doFit(cli):
+  where = getWhere(cli)
+  where['axis'] = 'szim'
+  sweeps = {}
+  for r in bs.query(cli.store, cli.since, cli.until, **where):
+    t = r['median'] if not r['median'] is None else r['mean']
+    if t is None or r['size'] is None:
+      continue
+    k = (r['host'], r['imType'], r['image'], r['function'], r['dtype'],
+         r['threads'], r['backend'], r['seShape'])
+    sweeps.setdefault(k, {})[r['size']] = t
+
+  sides = [int(x) for x in cli.predict.split(',') if x.strip() != '']
+  for k in sorted(sweeps.keys(), key=str):
+    sw = sweeps[k]
+    print('* {:s} {:s}-{:s} {:s} - {:s} - {:s} - {:d} threads'.format(
+      k[0], k[1], k[2], k[3], str(k[4]), str(k[7]), k[5] or 0))
+    n = [float(x)**2 for x in sw.keys()]
+    bst.printFit(k[6], bst.fitComplexity(n, list(sw.values())), sides)
+    print()
+  return 0
+
+
+# -----------------------------------------------------------------------------
+# key=value,key=value selector : returns (store, since, until, where)
+#
+def parseSelector(cli, sel):
+  kInt = ['size', 'se', 'threads', 'number', 'nSamples']
+  opts = {'store': cli.store, 'since': None, 'until': None}
+  where = {k: getattr(cli, k) for k in ['function', 'image', 'backend']}
+  for kv in sel.split(','):
+    if kv.strip() == '':
+      continue
+    k, _, v = kv.partition('=')
+    k = k.strip()
+    v = v.strip()
+    if k in opts:
+      opts[k] = v
+    elif k in bs.kNames:
+      where[k] = int(v) if k in kInt else v
+    else:
+      print('Unknown selector key : {:s}'.format(k))
+      sys.exit(2)
+  return opts['store'], opts['since'], opts['until'], where
+
+
+# -----------------------------------------------------------------------------
+# Points of a selection, by key : the last one of each key, with samples
+#
+def getPoints(cli, sel):
+  store, since, until, where = parseSelector(cli, sel)
+  points = {}
+  for r in bs.query(store, since, until, **where):
+    if len(r['samples']) < 2:
+      continue
+    k = (r['backend'], r['function'], r['image'], r['size'], r['se'],
+         r['dtype'], r['threads'], r['seShape'])
+    points[k] = r
+  return points
+
+
+def doCompare(cli):
+  base = getPoints(cli, cli.base)
+  cand = getPoints(cli, cli.cand)
+  keys = [k for k in base.keys() if k in cand]
+  if len(keys) == 0:
+    print('No matching points')
+    return 2
+
+  res = []
+  for k in keys:
+    x = base[k]['samples']
+    y = cand[k]['samples']
+    mx = float(np.median(x))
+    u, p = bst.mannWhitney(x, y)
+    hl, lo, hi = bst.shiftCI(x, y)
+    res.append({
+      'key': k,
+      'base': mx,
+      'cand': float(np.median(y)),
+      'shift': hl / mx,
+      'low': lo / mx,
+      'high': hi / mx,
+      'a12': u / (len(x) * len(y)),
+      'p': p,
+    })
+  for r, pa in zip(res, bst.holm([r['p'] for r in res])):
+    r['pAdj'] = pa
+    r['slower'] = pa < cli.alpha and r['shift'] > cli.threshold
+  res.sort(key=lambda r: -r['shift'])
+
+  nSlower = len([r for r in res if r['slower']])
+  h = '  {:8s} {:14s} {:12s} {:>6s} {:>2s} {:9s} {:6s} {:>3s} | {:>10s} {:>10s} | {:>7s} {:>17s} {:>5s} {:>8s}'.format(
+    'Backend', 'Function', 'Image', 'Size', 'SE', 'Shape', 'Dtype', 'Thr',
+    'Base', 'Cand', 'Shift', '95% CI', 'A12', 'p (adj)')
+  print(h)
+  print('-' * (len(h) + 3))
+  fmt = '  {:8s} {:14s} {:12s} {:6d} {:2d} {:9s} {:6s} {:3d} | {:10.3f} {:10.3f} | {:+6.1f}% [{:+6.1f}%,{:+6.1f}%] {:5.2f} {:8.2g} {:s}'
+  for r in res:
+    if not (cli.all or r['slower']):
+      continue
+    k = r['key']
+    print(fmt.format(k[0], k[1], k[2], k[3] or 0, k[4] or 0, k[7] or '',
+                     k[5] or '', k[6] or 0, r['base'], r['cand'], 100. * r['shift'],
+                     100. * r['low'], 100. * r['high'], r['a12'], r['pAdj'],
+                     'SLOWER' if r['slower'] else ''))
+  print()
+  print('  {:d} points compared - {:d} slower by more than {:.1f} %'.format(
+    len(res), nSlower, 100. * cli.threshold))
+  return 1 if nSlower > 0 else 0
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def main(args):
+  cli = getCliArgs()
+
+  kCommands = {
+    'query': doQuery,
+    'export': doExport,
+    'import': doImport,
+    'compare': doCompare,
+    'fit': doFit,
+  }
+  return kCommands[cli.command](cli)
+
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv))
@@ -0,0 +1,656 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  run-campaign.py
+#
+#  Copyright 2021 jose-marcio <martins@jose-marcio.org>
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the  nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#  Parallel replacement of big-batch.sh / do-all.sh : the image x function
+#  matrix is expanded into jobs, each one being a run of smil-vs-skimage.py.
+#  Jobs run concurrently, each worker slot pinned to its own set of CPUs,
+#  and are admitted only if their estimated peak memory fits in what's left.
+#
+#  The cost of each job is estimated from the results store : the points
+#  measured by an earlier run of the same job, or else the scaling law fitted
+#  on the other images of the same function. Jobs run cheapest first. With a
+#  global budget, jobs get a deadline (and a per point timeout) : points that
+#  wouldn't end in time are recorded as "exceeded budget" and the size sweep
+#  of that backend stops there.
+#
+import os
+import sys
+import time
+import struct
+import subprocess
+
+from datetime import datetime
+
+import argparse as ap
+import configparser as cp
+
+import benchStore as bs
+import benchStats as bst
+import benchTiming as bt
+import benchSynth as bsy
+import benchStream as bsm
+
+kBinFiles = [
+  'alumine.png', 'balls.png', 'bubbles_bin.png', 'cells.png', 'coffee.png',
+  'eutectic.png', 'gruyere.png', 'hubble_EDF_bin.png', 'metal.png'
+]
+
+kGrayFiles = [
+  'astronaut.png', 'bubbles_gray.png', 'hubble_EDF_gray.png', 'lena.png',
+  'tools.png'
+]
+
+# same order as big-batch.sh : slow functions at the end
+kBinFuncs = [
+  'erode', 'open', 'label', 'distance', 'areaThreshold', 'zhangSkeleton',
+  'segmentation', 'thinning'
+]
+
+kGrayFuncs = [
+  'erode', 'open', 'tophat', 'gradient', 'watershed', 'segmentation',
+  'hMinima', 'areaOpen'
+]
+
+#
+# Number of full size image buffers alive at peak, per function, on the
+# skimage side (the input and its outputs and temporaries), which is always
+# the most memory hungry.
+#
+kMemBuffers = {
+  'erode': 3,
+  'open': 4,
+  'tophat': 5,
+  'gradient': 4,
+  'hMaxima': 8,
+  'hMinima': 8,
+  'label': 4,
+  'fastLabel': 4,
+  'areaOpen': 8,
+  'distance': 4,
+  'areaThreshold': 6,
+  'segmentation': 10,
+  'watershed': 8,
+  'zhangSkeleton': 3,
+  'thinning': 3,
+}
+
+# bytes per pixel of the dtype axis
+kItemsize = {
+  'uint8': 1,
+  'uint16': 2,
+  'uint32': 4,
+  'float32': 4,
+  'float64': 8,
+}
+
+# bytes per pixel of skimage temporaries, when wider than the output
+# (watershed markers, max-tree parents and indices)
+kTmpItemsize = {
+  'watershed': 8,
+  'segmentation': 8,
+  'areaOpen': 8,
+  'areaThreshold': 8,
+}
+
+# interpreter, smilPython, skimage, scipy...
+kBaseRSS = 300 * 1024 * 1024
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def getCliArgs():
+  parser = ap.ArgumentParser()
+
+  parser.add_argument('--debug', help='', action="store_true")
+  parser.add_argument('--verbose', help='', action="store_true")
+
+  parser.add_argument('--config',
+                      default=None,
+                      help='campaign configuration, overriding the image and function lists (e.g. etc/bench.ini)',
+                      type=str)
+  parser.add_argument('--type',
+                      default='both',
+                      help='image types : bin, gray or both (default : both)',
+                      type=str)
+  parser.add_argument('--funcs',
+                      default=None,
+                      help='comma separated list of functions',
+                      type=str)
+  parser.add_argument('--images',
+                      default=None,
+                      help='comma separated list of images (or synth:... specs)',
+                      type=str)
+
+  parser.add_argument('--dtypes',
+                      default=None,
+                      help='comma separated pixel types (default : native)',
+                      type=str)
+  parser.add_argument('--seShapes',
+                      default=None,
+                      help='comma separated SE shapes (default : cross)',
+                      type=str)
+
+  parser.add_argument('--threads',
+                      default=1,
+                      help='CPUs (and Smil threads) per job (default : 1)',
+                      type=int)
+  parser.add_argument('--workers',
+                      default=0,
+                      help='concurrent jobs (default : CPUs / threads)',
+                      type=int)
+  parser.add_argument('--memLimit',
+                      default=0,
+                      help='memory budget in MB (default : available RAM)',
+                      type=int)
+  parser.add_argument('--memFactor',
+                      default=1.5,
+                      help='safety factor on memory estimates (default : 1.5)',
+                      type=float)
+  parser.add_argument('--streamMB',
+                      default=bsm.kStreamBytes // (1024 * 1024),
+                      help='STREAM array size (MB), measured once for all jobs - 0 : no bandwidth baseline',
+                      type=int)
+
+  parser.add_argument('--repeat', default=7, help='nb rounds', type=int)
+  parser.add_argument('--minImSize',
+                      default=256,
+                      help='Min image size',
+                      type=int)
+  parser.add_argument('--maxImSize',
+                      default=8192,
+                      help='Max image size',
+                      type=int)
+  parser.add_argument('--maxSeSize',
+                      default=8,
+                      help='Max Structuring Element size',
+                      type=int)
+  parser.add_argument('--seGrow',
+                      default='a',
+                      help='SE growing : a arithmetic - l log-spaced',
+                      type=str)
+
+  parser.add_argument('--budget',
+                      default=0,
+                      help='wall clock budget in hours (default : 0 - none)',
+                      type=float)
+  parser.add_argument('--pointTimeout',
+                      default=0,
+                      help='per point timeout in s (default : 0 - none)',
+                      type=float)
+  parser.add_argument('--store',
+                      default=bs.kStoreFile,
+                      help='results store used to estimate job costs',
+                      type=str)
+
+  parser.add_argument('--doit',
+                      help='really run jobs (default : only list them)',
+                      action='store_true')
+  parser.add_argument('--force',
+                      help='ignore witness files of already done jobs',
+                      action='store_true')
+
+  cli = parser.parse_args()
+
+  if not cli.type in ['bin', 'gray', 'both']:
+    print('type must be "bin", "gray" or "both"')
+    exit(1)
+
+  if cli.threads < 1:
+    print('threads must be at least 1')
+    exit(1)
+
+  return cli
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def appLoadFileConfig(fconfig=None):
+  if fconfig is None:
+    return None
+
+  if not os.path.isfile(fconfig):
+    return None
+
+  config = cp.ConfigParser(interpolation=cp.ExtendedInterpolation(),
+                           default_section="default")
+
+  config.BOOLEAN_STATES['Vrai'] = True
+  config.BOOLEAN_STATES['Faux'] = False
+
+  config.read(fconfig)
+
+  return config
+
+
+#
+#  #  ####   #####    ####
+#  # #    #  #    #  #
+#  # #    #  #####    ####
+#  # #    #  #    #       #
+#  # #    #  #    #  #    #
+#  #  ####   #####    ####
+#
+# -----------------------------------------------------------------------------
+# Expand the image x function matrix. Command line lists override the
+# configuration file, which overrides the built-in lists.
+#
+def getJobs(cli, config=None):
+  jobs = []
+  types = ['bin', 'gray'] if cli.type == 'both' else [cli.type]
+  for t in types:
+    if t == 'bin':
+      files, funcs = kBinFiles, kBinFuncs
+    else:
+      files, funcs = kGrayFiles, kGrayFuncs
+    if not config is None and config.has_section(t):
+      if config.has_option(t, 'images'):
+        files = config.get(t, 'images').split()
+      if config.has_option(t, 'funcs'):
+        funcs = config.get(t, 'funcs').split()
+    if not cli.images is None:
+      files = cli.images.split(',')
+    if not cli.funcs is None:
+      funcs = cli.funcs.split(',')
+
+    dtypes = [None]
+    if not cli.dtypes is None:
+      dtypes = cli.dtypes.split(',')
+    shapes = [None]
+    if not cli.seShapes is None:
+      shapes = cli.seShapes.split(',')
+
+    for f in funcs:
+      for im in files:
+        for d in dtypes:
+          for se in shapes:
+            jobs.append({
+              'type': t,
+              'image': im,
+              'function': f,
+              'dtype': d,
+              'seShape': se
+            })
+  return jobs
+
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def jobName(job):
+  # pixel type and SE shape as in the file names of smil-vs-skimage.py
+  b = bs.csvBase(bsy.imageName(job['image']), job['dtype'], job['seShape'])
+  return '{:s}-{:s}-{:s}'.format(job['type'], b, job['function'])
+
+
+# same name as the one used by big-batch.sh
+def jobWitness(job):
+  im = bs.csvBase(job['image'], job['dtype'], job['seShape'])
+  fw = '{:s}-{:s}-{:s}.witness'.format(job['type'], im, job['function'])
+  return os.path.join('var', fw)
+
+
+# -----------------------------------------------------------------------------
+# Peak RSS estimate, in bytes, for the largest image of the job (images are
+# handled as squares of side maxImSize).
+#
+def estimatePeakRSS(cli, job):
+  fs = job['function']
+  npix = cli.maxImSize * cli.maxImSize
+  nbuf = kMemBuffers.get(fs, 6)
+  # input : the native 8 bits image or the converted one
+  isz = kItemsize.get(job['dtype'], 1)
+  # Smil : input and output (UINT32 labels)
+  smil = npix * (isz + bsm.kOutItemsize['smil'].get(fs, isz))
+  # skimage : input, then outputs and temporaries of the output type (int64
+  # labels, float64 distances, ...)
+  osz = bsm.kOutItemsize['skimage'].get(fs, isz)
+  osz = max(osz, kTmpItemsize.get(fs, 0))
+  skimage = npix * (isz + (nbuf - 1) * osz)
+  return int(kBaseRSS + cli.memFactor * max(smil, skimage))
+
+
+# -----------------------------------------------------------------------------
+# Width and height of a PNG image, from its header
+#
+def getImageSize(fPath):
+  try:
+    with open(fPath, 'rb') as f:
+      h = f.read(24)
+  except OSError:
+    return None
+  if len(h) < 24 or h[:8] != b'\x89PNG\r\n\x1a\n':
+    return None
+  return struct.unpack('>II', h[16:24])
+
+
+# -----------------------------------------------------------------------------
+# Points of this host in the results store : last median (ms) and samples
+# of each point, by job, and per function scaling law for jobs never run
+#
+def getHistory(cli):
+  host = os.uname().nodename.split('.')[0]
+  hist = {}
+  sweeps = {}
+  for r in bs.query(cli.store, host=host, status='ok'):
+    if r['median'] is None:
+      continue
+    # rows stored before the SE catalogue have no shape : cross
+    k = (r['imType'], r['image'], r['function'], r['seShape'] or 'cross')
+    pk = (r['backend'], r['axis'], r['size'], r['se'])
+    hist.setdefault(k, {})[pk] = r
+    if r['axis'] == 'szim':
+      sk = (r['imType'], r['function'], r['backend'])
+      sweeps.setdefault(sk, {})[(r['image'], r['size'])] = r['median']
+
+  fits = {}
+  for sk, sw in sweeps.items():
+    n = [float(x[1])**2 for x in sw.keys()]
+    fit = bst.fitComplexity(n, list(sw.values()))
+    if not fit is None:
+      fits[sk] = fit
+  return hist, fits
+
+
+# -----------------------------------------------------------------------------
+# Estimated wall clock time (s) of a job, None when unknown
+#
+def estimateJobCost(cli, job, hist, fits):
+  b = bsy.imageName(job['image'])
+  k = (job['type'], b, job['function'], job['seShape'] or 'cross')
+  if k in hist:
+    cost = 0.
+    for r in hist[k].values():
+      nb = (r['nSamples'] or 0) * (r['number'] or 1)
+      cost += r['median'] / 1000. * nb
+      cost += bt.estimateCost(r['median'] / 1000., 0)
+    return cost
+
+  if bsy.isSynth(job['image']):
+    wh = bsy.getSize(job['image'])
+  else:
+    wh = getImageSize(os.path.join('images', job['image']))
+  cost = 0.
+  for backend in ['smil', 'skimage']:
+    fit = fits.get((job['type'], job['function'], backend))
+    if fit is None:
+      return None
+    side = cli.minImSize
+    while side <= cli.maxImSize:
+      t = bst.predictTime(fit, float(side)**2)[0]
+      cost += bt.estimateCost(t / 1000., cli.repeat)
+      side *= 2
+    if not wh is None:
+      # SE sweep, at the native size, growing with the SE size
+      t = bst.predictTime(fit, float(wh[0] * wh[1]))[0]
+      for se in range(1, cli.maxSeSize + 1):
+        cost += bt.estimateCost(se * t / 1000., cli.repeat)
+  return cost
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def getMemAvailable():
+  try:
+    import psutil
+    return psutil.virtual_memory().available
+  except ImportError:
+    pass
+  return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_AVPHYS_PAGES')
+
+
+# -----------------------------------------------------------------------------
+# Disjoint CPU sets, one per worker slot
+#
+def getCpuSets(cli):
+  cpus = sorted(os.sched_getaffinity(0))
+  nw = len(cpus) // cli.threads
+  if cli.workers > 0:
+    nw = min(nw, cli.workers)
+  nw = max(nw, 1)
+  return [cpus[i * cli.threads:(i + 1) * cli.threads] for i in range(nw)]
+
+
+#
+# #####   #    #  #    #
+# #    #  #    #  ##   #
+# #    #  #    #  # #  #
+# #####   #    #  #  # #
+# #   #   #    #  #   ##
+# #    #   ####   #    #
+#
+# -----------------------------------------------------------------------------
+#
+#
+def startJob(cli, job, cpuSet):
+  cmd = [
+    sys.executable, 'bin/smil-vs-skimage.py', '--image', job['image'],
+    '--function', job['function'], '--minImSize={:d}'.format(cli.minImSize),
+    '--maxImSize={:d}'.format(cli.maxImSize),
+    '--maxSeSize={:d}'.format(cli.maxSeSize), '--repeat',
+    str(cli.repeat), '--threads',
+    str(len(cpuSet))
+  ]
+  if job['type'] == 'bin':
+    cmd.append('--binary')
+  if not job['dtype'] is None:
+    cmd += ['--dtype', job['dtype']]
+  if not job['seShape'] is None:
+    cmd += ['--seShape', job['seShape']]
+  if cli.seGrow != 'a':
+    cmd += ['--seGrow', cli.seGrow]
+  if cli.deadline > 0:
+    cmd += ['--deadline', '{:.0f}'.format(cli.deadline)]
+  if cli.pointTimeout > 0:
+    cmd += ['--pointTimeout', str(cli.pointTimeout)]
+  if cli.store != bs.kStoreFile:
+    cmd += ['--store', cli.store]
+  # measured once for the campaign, share of the CPUs of the job
+  cmd += ['--streamMB', '0']
+  if cli.bandwidth > 0:
+    bw = cli.bandwidth * len(cpuSet) / cli.nCpus
+    cmd += ['--bandwidth', '{:.3f}'.format(bw)]
+
+  env = dict(os.environ)
+  env['OMP_NUM_THREADS'] = str(len(cpuSet))
+
+  fout = open(job['fout'], 'w')
+  proc = subprocess.Popen(cmd,
+                          stdout=fout,
+                          stderr=subprocess.STDOUT,
+                          env=env,
+                          preexec_fn=lambda: os.sched_setaffinity(0, cpuSet))
+  job['proc'] = proc
+  job['file'] = fout
+  job['cpus'] = cpuSet
+  job['ti'] = time.time()
+  job['hi'] = datetime.now().strftime("%H:%M:%S")
+  if cli.verbose:
+    print('  {:<40s} pid {:d} cpus {:s}'.format(
+      jobName(job), proc.pid, ','.join([str(c) for c in cpuSet])))
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def endJob(cli, job):
+  rc = job['proc'].returncode
+  xdt = time.time() - job['ti']
+  fout = job['file']
+  fout.write("=> Elapsed time : {:d} secs\n".format(int(xdt)))
+  fout.write("   Begin        : {:s}\n".format(job['hi']))
+  fout.write("   End          : {:s}\n".format(
+    datetime.now().strftime("%H:%M:%S")))
+  fout.close()
+  if rc == 0:
+    open(jobWitness(job), 'w').close()
+  print('  {:<40s} {:s} ({:d} s)'.format(jobName(job),
+                                         'done' if rc == 0 else 'failed',
+                                         int(xdt)))
+  return rc
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def runJobs(cli, jobs):
+  cpuSets = getCpuSets(cli)
+  freeSets = list(cpuSets)
+
+  memBudget = getMemAvailable()
+  if cli.memLimit > 0:
+    memBudget = cli.memLimit * 1024 * 1024
+
+  print('* Workers : {:d} x {:d} CPUs - memory budget {:.0f} MB'.format(
+    len(cpuSets), cli.threads, memBudget / 2**20))
+  print()
+
+  pending = list(jobs)
+  running = []
+  nFailed = 0
+  while len(pending) > 0 or len(running) > 0:
+    for job in list(running):
+      if job['proc'].poll() is None:
+        continue
+      if endJob(cli, job) != 0:
+        nFailed += 1
+      running.remove(job)
+      freeSets.append(job['cpus'])
+
+    if os.path.isfile('stopnow'):
+      pending = []
+
+    # nothing can be started after the deadline
+    if cli.deadline > 0 and time.time() >= cli.deadline:
+      for job in pending:
+        print('  {:<40s} exceeded budget'.format(jobName(job)))
+      pending = []
+
+    memUsed = sum([job['rss'] for job in running])
+    for job in list(pending):
+      if len(freeSets) == 0:
+        break
+      # a job bigger than the whole budget can only run alone
+      fits = memUsed + job['rss'] <= memBudget
+      if not fits and len(running) > 0:
+        continue
+      if not fits:
+        print('  {:<40s} exceeds memory budget ({:.0f} MB) : run alone'.format(
+          jobName(job), job['rss'] / 2**20))
+      startJob(cli, job, freeSets.pop(0))
+      pending.remove(job)
+      running.append(job)
+      memUsed += job['rss']
+
+    time.sleep(0.5)
+  return nFailed
+
+
+# =============================================================================
+#
+#
+#
+def main(args):
+  cli = getCliArgs()
+
+  config = appLoadFileConfig(cli.config)
+  jobs = getJobs(cli, config)
+
+  resDir = os.uname().nodename.split('.')[0]
+
+  hist, fits = getHistory(cli)
+
+  todo = []
+  for job in jobs:
+    job['rss'] = estimatePeakRSS(cli, job)
+    job['cost'] = estimateJobCost(cli, job, hist, fits)
+    job['fout'] = os.path.join(resDir, jobName(job) + '.txt')
+    done = os.path.isfile(jobWitness(job)) and not cli.force
+    if not done:
+      todo.append(job)
+
+  # cheapest first, unknown costs last
+  kUnknown = float('inf')
+  todo.sort(key=lambda j: kUnknown if j['cost'] is None else j['cost'])
+
+  nw = len(getCpuSets(cli))
+  tEnd = 0.
+  for job in jobs:
+    sCost = '       ?' if job['cost'] is None else '{:8.0f}'.format(job['cost'])
+    status = 'to do' if job in todo else 'done'
+    if job in todo and not job['cost'] is None:
+      tEnd += job['cost'] / nw
+      if cli.budget > 0 and tEnd > cli.budget * 3600:
+        status = 'to do (over budget)'
+    print('  {:<40s} {:8.0f} MB {:s} s  {:s}'.format(jobName(job),
+                                                    job['rss'] / 2**20, sCost,
+                                                    status))
+  print()
+  print('  Estimated time : {:.0f} s on {:d} workers (known costs only)'.format(
+    tEnd, nw))
+  print()
+
+  cli.deadline = 0
+  if cli.budget > 0:
+    cli.deadline = time.time() + cli.budget * 3600
+
+  if not cli.doit:
+    return 0
+
+  os.makedirs('var', exist_ok=True)
+  os.makedirs(resDir, exist_ok=True)
+
+  # bandwidth baseline of this host, all worker CPUs loaded
+  cli.bandwidth = 0.
+  cli.nCpus = sum([len(c) for c in getCpuSets(cli)])
+  if cli.streamMB > 0:
+    bw = bsm.streamBandwidth(cli.streamMB * 1024 * 1024, threads=cli.nCpus)
+    cli.bandwidth = bw['best']
+    print('* Memory  : {:s} on {:d} CPUs'.format(bsm.streamString(bw),
+                                                cli.nCpus))
+
+  ti = time.time()
+  nFailed = runJobs(cli, todo)
+  print()
+  print('=> Elapsed time : {:d} secs'.format(int(time.time() - ti)))
+  print('   Jobs         : {:d} run - {:d} failed'.format(len(todo), nFailed))
+
+  return 0 if nFailed == 0 else 1
+
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv))
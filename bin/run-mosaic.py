@@ -1,24 +1,43 @@
 #! /usr/bin/env python3
 
+# first : interpreter startup time
+import benchLazy as bl
+
 import sys
 import os
 import platform
 import gc
 import time
 
-import smilPython as sp
-import skimage.morphology as skm
-from skimage.filters import rank
-from scipy import ndimage as ndi
-from skimage.segmentation import watershed
-import skimage.segmentation as sks
-
 import numpy as np
-import timeit as tit
+
+import benchOps as bo
+import benchVerify as bv
+import benchTiming as bt
+import benchPyramid as bp
+import benchSynth as bsy
 
 import argparse as ap
 import configparser as cp
 
+# backends are imported on demand
+sp = bl.lazyImport('smilPython')
+skm = bl.lazyImport('skimage.morphology')
+rank = bl.lazyImport('skimage.filters.rank')
+ndi = bl.lazyImport('scipy.ndimage')
+sks = bl.lazyImport('skimage.segmentation')
+
+# skimage modules of each function, imported before any timing
+kSkModules = {
+  'label': ['skimage.morphology'],
+  'open': ['skimage.morphology'],
+  'hMinima': ['skimage.morphology'],
+  'watershed': [
+    'skimage.morphology', 'skimage.filters.rank', 'scipy.ndimage',
+    'skimage.segmentation'
+  ],
+}
+
 nx = 4
 ny = 4
 
@@ -35,6 +54,10 @@ def getCliArgs():
   parser.add_argument('--showpid',
                       help='break to show pid',
                       action='store_true')
+  parser.add_argument('--memdt',
+                      default=0,
+                      help='memory sampling period in ms (default : 0 - off)',
+                      type=float)
 
   parser.add_argument('--function',
                       default='label',
@@ -46,7 +69,22 @@ def getCliArgs():
                       type=str)
   parser.add_argument('--csv', help='output CSV format', action='store_true')
 
-  parser.add_argument('--repeat', default=7, help='', type=int)
+  parser.add_argument('--repeat',
+                      default=bt.kMinSamples,
+                      help='min nb rounds',
+                      type=int)
+  parser.add_argument('--precision',
+                      default=bt.kPrecision,
+                      help='target precision : 95%% CI half width / median',
+                      type=float)
+  parser.add_argument('--budget',
+                      default=bt.kBudget,
+                      help='time budget per point (s)',
+                      type=float)
+  parser.add_argument('--threads',
+                      default=0,
+                      help='Smil threads (default : 0 - library default)',
+                      type=int)
   parser.add_argument('--imsize',
                       default=8192,
                       help='work image size (default : 8192)',
@@ -55,6 +93,17 @@ def getCliArgs():
                       help='resize image to imsize',
                       action="store_true")
 
+  parser.add_argument('--dtype',
+                      default=None,
+                      choices=list(bp.kDtypes.keys()),
+                      help='pixel type of the mosaics (default : native)',
+                      type=str)
+  parser.add_argument('--labelType',
+                      default='UINT32',
+                      choices=['UINT8', 'UINT16', 'UINT32'],
+                      help='Smil label and marker images type',
+                      type=str)
+
   parser.add_argument('--ri',
                       default=1,
                       help='initial image size multiplier (default : 1)',
@@ -68,55 +117,109 @@ def getCliArgs():
                       metavar='file',
                       type=str,
                       nargs='+',
-                      help='image files')
+                      help='image files or synthetic images (synth:key=value:...)')
+
+  parser.add_argument('--mosaicDir',
+                      default=bp.kMosaicDir,
+                      help='directory of the memory-mapped mosaics',
+                      type=str)
+  parser.add_argument('--keep',
+                      help='keep mosaic files when done',
+                      action='store_true')
 
   parser.add_argument('--save',
                       help='save result to file',
                       action='store_true')
+  parser.add_argument('--verify',
+                      help='check Smil and skimage outputs are equivalent',
+                      action='store_true')
 
   cli = parser.parse_args()
   return cli
 
 
-def mkMosaic(fin=None, nx=2, ny=2):
-  imIn = sp.Image(fin)
-
-  w = imIn.getWidth()
-  h = imIn.getHeight()
-
-  imOut = sp.Image(imIn)
-  imOut.setSize(w * nx, h * ny)
-
-  sp.copyPattern(imIn, 0, 0, w, h, imOut, nx, ny)
-  return imOut, w * nx, h * ny
+# -----------------------------------------------------------------------------
+# Peak memory per (backend, function, size), over all repeats
+#
+def printMemSummary(sampler):
+  peaks = {}
+  for s in sampler.summary():
+    k = (s['backend'], s['function'], s['size'])
+    p = peaks.get(k, [0, 0, 0])
+    peaks[k] = [max(p[0], s['hwm']), max(p[1], s['rssMax']),
+                max(p[2], s['threadsMax'])]
+
+  print()
+  print('* Memory usage')
+  print()
+  h = '  {:8s} {:10s} {:>6s} | {:>12s} {:>12s} {:>7s}'.format(
+    'Backend', 'Function', 'Size', 'Peak (MB)', 'Sampled (MB)', 'Threads')
+  print(h)
+  print('-' * (len(h) + 3))
+  for k in peaks.keys():
+    p = peaks[k]
+    print('  {:8s} {:10s} {:6d} | {:12.1f} {:12.1f} {:7d}'.format(
+      k[0], k[1], k[2], p[0] / 2**20, p[1] / 2**20, p[2]))
+  print()
 
 
 def main(cli, args):
 
   #
+  # adaptive timing, in ms per call, tagging memory samples with the
+  # repeat index
+  #
+  def timeIt(call):
+    onSample = None if sampler is None else sampler.setRepeat
+    dt, info = bt.timeAdaptive(call,
+                               precision=cli.precision,
+                               budget=cli.budget,
+                               minSamples=nr,
+                               onSample=onSample)
+    if cli.verbose:
+      print("   {:s}".format(bt.infoString(info)))
+    return np.array(dt)
+
+  #
+  # run one function inside its own memory sampling phase
+  #
+  def runSampled(backend, func, imTst):
+    if sampler is None:
+      return func(imTst)
+    with sampler.phase(backend=backend, function=cli.function, size=w):
+      return func(imTst)
+
   #
+  # output equivalence : skimage, which runs first, gives the reference and
+  # Smil output is compared to it (outside of the timed region)
   #
-  def getNumber(ct):
-    n, t = ct.autorange()
-    if t < 2:
-      n = int(2 * n / t)
-    return n
+  def keepOutput(backend, out):
+    if not cli.verify or cli.which != 'both':
+      return
+    mode = bv.verifyMode(cli.function)
+    if mode is None:
+      return
+    name = '{:s}-{:02d}'.format(bOut, verify['round'])
+    if backend == 'skimage':
+      bv.saveReference(name, out)
+      return
+    ref = bv.loadReference(name)
+    if ref is None:
+      return
+    verify['res'] = bv.compareOutputs(ref, out, mode)
+    del ref
+    bv.dropReference(name)
 
   #
   # L A B E L
   #
-  def skLabel(imTst):
+  def skLabel(imArr):
     if cli.verbose:
       print("*  Running skImage ({:d}x{:d})".format(w, h))
 
-    imArr = imTst.getNumArray().copy()
-
-    ct = tit.Timer(lambda: skm.label(imArr, connectivity=1))
-    n = getNumber(ct)
-    dtsk = ct.repeat(nr, n)
-
-    dtsk = np.array(dtsk) * 1000. / n
+    dtsk = timeIt(lambda: skm.label(imArr, connectivity=1))
     skLabel = skm.label(imArr, connectivity=1)
+    keepOutput('skimage', skLabel)
 
     skMax = skLabel.max()
     tsk = dtsk.min()
@@ -126,15 +229,12 @@ def main(cli, args):
     if cli.verbose:
       print("*  Running Smil ({:d}x{:d})".format(w, h))
 
-    imLabel = sp.Image(imTst, 'UINT32')
-
-    ct = tit.Timer(lambda: sp.label(imTst, imLabel, sp.CrossSE()))
-    n = getNumber(ct)
-    dtsm = ct.repeat(nr, n)
+    imLabel = sp.Image(imTst, cli.labelType)
 
-    dtsm = np.array(dtsm) * 1000. / n
+    dtsm = timeIt(lambda: sp.label(imTst, imLabel, sp.CrossSE()))
 
     smMax = sp.label(imTst, imLabel, sp.CrossSE())
+    keepOutput('smil', imLabel)
     tsm = dtsm.min()
 
     return tsm, smMax
@@ -142,18 +242,14 @@ def main(cli, args):
   #
   # O P E N
   #
-  def skOpen(imTst):
+  def skOpen(imArr):
     if cli.verbose:
       print("*  Running skImage ({:d}x{:d})".format(w, h))
 
-    imArr = imTst.getNumArray().copy()
-
     se = skm.selem.diamond(1)
-    ct = tit.Timer(lambda: skm.opening(imArr, se))
-    n = getNumber(ct)
-    dtsk = ct.repeat(nr, n)
-
-    dtsk = np.array(dtsk) * 1000. / n
+    dtsk = timeIt(lambda: skm.opening(imArr, se))
+    if cli.verify:
+      keepOutput('skimage', skm.opening(imArr, se))
 
     skMax = 0
     tsk = dtsk.min()
@@ -166,11 +262,8 @@ def main(cli, args):
     se = sp.CrossSE()
     imOut = sp.Image(imTst)
 
-    ct = tit.Timer(lambda: sp.open(imTst, imOut, se))
-    n = getNumber(ct)
-    dtsm = ct.repeat(nr, n)
-
-    dtsm = np.array(dtsm) * 1000. / n
+    dtsm = timeIt(lambda: sp.open(imTst, imOut, se))
+    keepOutput('smil', imOut)
 
     smMax = 0
     tsm = dtsm.min()
@@ -180,18 +273,14 @@ def main(cli, args):
   #
   # H M I N I M A
   #
-  def skhMinima(imTst):
+  def skhMinima(imArr):
     if cli.verbose:
       print("*  Running skImage ({:d}x{:d})".format(w, h))
 
-    imArr = imTst.getNumArray().copy()
-
     se = skm.selem.diamond(1)
-    ct = tit.Timer(lambda: skm.h_minima(imArr, 10, se))
-    n = getNumber(ct)
-    dtsk = ct.repeat(nr, n)
-
-    dtsk = np.array(dtsk) * 1000. / n
+    dtsk = timeIt(lambda: skm.h_minima(imArr, 10, se))
+    if cli.verify:
+      keepOutput('skimage', skm.h_minima(imArr, 10, se))
 
     skMax = 0
     tsk = dtsk.min()
@@ -204,11 +293,8 @@ def main(cli, args):
     se = sp.CrossSE()
     imOut = sp.Image(imTst)
 
-    ct = tit.Timer(lambda: sp.hMinima(imTst, 10, imOut, se))
-    n = getNumber(ct)
-    dtsm = ct.repeat(nr, n)
-
-    dtsm = np.array(dtsm) * 1000. / n
+    dtsm = timeIt(lambda: sp.hMinima(imTst, 10, imOut, se))
+    keepOutput('smil', imOut)
 
     smMax = 0
     tsm = dtsm.min()
@@ -219,7 +305,7 @@ def main(cli, args):
   #
   # watershed
   #
-  def skWatershed(imTst):
+  def skWatershed(imArr):
     wsData = {
       'astronaut.png': [2, 5],
       'bubbles_gray.png': [1, 3],
@@ -231,24 +317,20 @@ def main(cli, args):
     if cli.verbose:
       print("*  Running skImage ({:d}x{:d})".format(w, h))
 
-    imArr = imTst.getNumArray().copy()
-
     fin = 'lena.png'
     if fin in wsData:
       szg, szo = wsData[fin]
     else:
       szg, szo = 3, 5
-    imIn = imArr.astype('uint8')
+    imIn = imArr.astype('uint8', copy=False)
     denoised = rank.median(imIn, skm.disk(szo))
     markers = rank.gradient(denoised, skm.disk(szg)) < 10
     markers = ndi.label(markers)[0]
     gradient = rank.gradient(denoised, skm.disk(2))
 
-    ct = tit.Timer(lambda: watershed(gradient, markers))
-    n = getNumber(ct)
-    dtsk = ct.repeat(repeat=nr, number=n)
-
-    dtsk = np.array(dtsk) * 1000. / n
+    dtsk = timeIt(lambda: sks.watershed(gradient, markers))
+    if cli.verify:
+      keepOutput('skimage', sks.watershed(gradient, markers))
 
     skMax = 0
     tsk = dtsk.min()
@@ -278,20 +360,31 @@ def main(cli, args):
     imMin = sp.Image(imTst)
     sp.gradient(imTst, imGrad, se)
     sp.hMinima(imGrad, 10, imMin, se)
-    imLabel = sp.Image(imTst, 'UINT32')
+    imLabel = sp.Image(imTst, cli.labelType)
     sp.label(imMin, imLabel)
     imOut = sp.Image(imTst)
-    ct = tit.Timer(lambda: sp.watershed(imGrad, imLabel, imOut, se))
-    n = getNumber(ct)
-    dtsm = ct.repeat(repeat=nr, number=n)
-
-    dtsm = np.array(dtsm) * 1000. / n
+    dtsm = timeIt(lambda: sp.watershed(imGrad, imLabel, imOut, se))
+    keepOutput('smil', imOut)
 
     smMax = 0
     tsm = dtsm.min()
 
     return tsm, smMax
 
+  skFuncs = {
+    'label': skLabel,
+    'open': skOpen,
+    'hMinima': skhMinima,
+    'watershed': skWatershed,
+  }
+
+  smFuncs = {
+    'label': smLabel,
+    'open': smOpen,
+    'hMinima': smhMinima,
+    'watershed': smWatershed,
+  }
+
   #
   # M A I N
   #
@@ -300,15 +393,45 @@ def main(cli, args):
 
   nr = cli.repeat
 
+  verify = {'round': 0, 'res': None}
+
+  sampler = None
+  if cli.memdt > 0:
+    # psutil only when sampling
+    sampler = bl.load('memSampler').MemSampler(cli.memdt / 1000.)
+    sampler.start()
+
+  if cli.which in ['smil', 'both']:
+    bl.load('smilPython')
+  if cli.which in ['skimage', 'both']:
+    for m in kSkModules.get(cli.function, []):
+      bl.load(m)
+  if cli.verbose:
+    print('Backends : ' + bl.loadString())
+
+  bo.setThreads(cli.threads)
+
   for f in files:
     r = cli.ri
+    prev = None
     for i in range(0, cli.nr):
-      imMosaic, w, h = mkMosaic(f, r, r)
-      imTst = sp.Image()
+      # round i is tiled from round i - 1, on disk
+      imMosaic = bp.mosaicGet(f, r, r, prev, cli.mosaicDir)
+      if not prev is None and not cli.keep:
+        os.remove(prev.filename)
+      prev = imMosaic
+      h, w = imMosaic.shape
+      verify['round'] = i
+      verify['res'] = None
+      imArr = imMosaic
       if cli.resize:
-        sp.resize(imMosaic, cli.imsize, cli.imsize, imTst, "closest")
-      else:
-        sp.copy(imMosaic, imTst)
+        fResized = bp.mosaicFile(f, r, r, cli.mosaicDir) + '-resized.npy'
+        imArr = bp.mosaicResize(imMosaic, cli.imsize, cli.imsize, fResized)
+      if not cli.dtype is None and imArr.dtype.name != cli.dtype:
+        # converted once, out of core and outside of any timing, values kept
+        # as they are
+        fConv = bp.mosaicFile(f, r, r, cli.mosaicDir) + '-' + cli.dtype + '.npy'
+        imArr = bp.mosaicAsType(imArr, cli.dtype, fConv)
 
       #
       # skimage
@@ -317,14 +440,8 @@ def main(cli, args):
       skMax = 0
       tsk = 0
       if cli.which in ['skimage', 'both']:
-        if cli.function == 'label':
-          tsk, skMax = skLabel(imTst)
-        if cli.function == 'open':
-          tsk, skMax = skOpen(imTst)
-        if cli.function == 'hMinima':
-          tsk, skMax = skhMinima(imTst)
-        if cli.function == 'watershed':
-          tsk, skMax = skWatershed(imTst)
+        if cli.function in skFuncs:
+          tsk, skMax = runSampled('skimage', skFuncs[cli.function], imArr)
         gc.collect()
 
       #
@@ -333,21 +450,23 @@ def main(cli, args):
       dtsm = np.array([])
       smMax = 0
       tsm = 0
-      if cli.which in ['both', 'smil']:
-        if cli.function == 'label':
-          tsm, smMax = smLabel(imTst)
-        if cli.function == 'open':
-          tsm, smMax = smOpen(imTst)
-        if cli.function == 'hMinima':
-          tsm, smMax = smhMinima(imTst)
-        if cli.function == 'watershed':
-          tsm, smMax = smWatershed(imTst)
+      if cli.which in ['both', 'smil'] and bp.smilHasType(imArr.dtype):
+        if cli.function in smFuncs:
+          # Smil can't wrap the file : the only in memory copy
+          imTst = bp.arrayToSmil(imArr)
+          tsm, smMax = runSampled('smil', smFuncs[cli.function], imTst)
+          del imTst
         gc.collect()
 
+      if cli.resize:
+        del imArr
+        if not cli.keep:
+          os.remove(fResized)
+
       #
       # the end
       #
-      if cli.which in ['both']:
+      if cli.which in ['both'] and tsm > 0:
         sUp = tsk / tsm
       else:
         sUp = 0
@@ -357,6 +476,9 @@ def main(cli, args):
       else:
         fmt = "{:3d} - {:3d} - {:6d} {:6d} - {:10.3f} {:10.3f} - {:7.3f} - {:7d} {:7d}"
       sout = fmt.format(i, r, w, h, tsm, tsk, sUp, smMax, skMax)
+      if cli.verify:
+        sep = ';' if cli.csv else ' - '
+        sout += sep + bv.verdictString(verify['res'])
       print(sout)
       if cli.save:
         with open(bOut + '.txt', 'w') as fout:
@@ -370,6 +492,16 @@ def main(cli, args):
 
       r *= 2
 
+    if not prev is None and not cli.keep:
+      os.remove(prev.filename)
+    del prev
+
+  if not sampler is None:
+    sampler.stop()
+    printMemSummary(sampler)
+    sampler.saveSamples(bOut + '-mem-samples.csv')
+    sampler.saveSummary(bOut + '-mem.csv')
+
 
 if __name__ == '__main__':
   import sys
@@ -380,14 +512,19 @@ if __name__ == '__main__':
   node = node.split('.')
   cli.node = node[0]
 
-  bName = os.path.basename(cli.files[0])
-  iName, _ = os.path.splitext(bName)
+  cli.startup, cli.imports = bl.startupTimes()
+  if cli.verbose:
+    print('Startup  : ' + bl.startupString())
+
+  iName = bsy.imageName(cli.files[0])
 
   #fmt = "usage-{:s}-{:s}-{:s}-{:03d}-{:02d}-{:05d}"
   #bOut = fmt.format(cli.function, iName, cli.which, cli.ri, cli.nr, cli.imsize)
 
   fmt = "usage-{:s}-{:s}-{:s}-{:05d}"
   bOut = fmt.format(cli.function, iName, cli.which, cli.imsize)
+  if not cli.dtype is None:
+    bOut += '-' + cli.dtype
 
   if cli.showpid:
     pid = os.getpid()
@@ -32,35 +32,37 @@
 #  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #
 #
+# first : interpreter startup time
+import benchLazy as bl
+
 import os
 import sys
 import time
 
-import timeit as tit
 from datetime import datetime, timezone
 
 import argparse as ap
 import configparser as cp
 
-import smilPython as sp
-
-#import skimage as ski
-import skimage.io as io
-import skimage.morphology as skm
-from skimage.transform import rescale, resize
-
-#import scipy.ndimage as sci
-from scipy import ndimage as ndi
-
-from skimage.segmentation import watershed
-from skimage.feature import peak_local_max
-from skimage.filters import rank
-
 import numpy as np
 import math as m
 
 import statistics as st
 
+import benchOps as bo
+import benchPyramid as bp
+import benchVerify as bv
+import benchTiming as bt
+import benchStore as bs
+import benchStats as bst
+import benchJournal as bj
+import benchSynth as bsy
+import benchPerf as bpf
+import benchStream as bsm
+
+# imported on first use
+sp = bl.lazyImport('smilPython')
+
 # -----------------------------------------------------------------------------
 #
 #
@@ -96,17 +98,6 @@ def getProcTime():
 def printProcTime(s = ''):
   print('= Time {:8.1f} : {:s}'.format(time.time() - t0, s))
 
-def getNbAuto(tc=None):
-  if tc is None:
-    return 1
-  # (nb, dt) returned by autorange()
-  lnb = tc.autorange()
-  N = lnb[0]
-  if lnb[1] < 1.:
-    N = m.ceil(lnb[0] * (1. / lnb[1]))
-  return N
-
-
 #
 #  ####   #    #     #    #
 # #       ##  ##     #    #
@@ -115,184 +106,197 @@ def getNbAuto(tc=None):
 # #    #  #    #     #    #
 #  ####   #    #     #    ######
 #
-def smilTime(cli, fs, imIn, sz, repeat, px=1):
+def pointKey(backend, fs, px, sz):
+  return '{:s}|{:s}|{:.6g}|{:d}'.format(backend, fs, px, sz)
 
-  wsData = {
-    'astronaut.png': [10, 0],
-    'bubbles_gray.png': [10, 5],
-    'hubble_EDF_gray.png': [5, 1],
-    'lena.png': [5, 0],
-    'tools.png': [10, 1],
-  }
-
-  #
-  #
-  #
-  def binSegmentation(imIn, imOut):
-    dt = []
-    se = sp.HexSE()
-    imDist = sp.Image(imIn)
-    sp.distance(imIn, imDist)
-    sp.inv(imDist, imDist)
-    sp.watershed(imDist, imOut, se)
-    sp.inv(imOut, imOut)
-    sp.inf(imIn, imOut, imOut)
-    return dt
-
-  #
-  #
-  #
-  def graySegmentation(imIn, imOut, h=5, sz=0):
-    se = sp.HexSE()
-    imOpen = sp.Image(imIn)
-    if sz > 0:
-      sp.open(imIn, imOpen, sp.HexSE(sz))
-    else:
-      sp.copy(imIn, imOpen)
-    imGrad = sp.Image(imIn)
-    imMin = sp.Image(imIn)
-    sp.gradient(imOpen, imGrad, se)
-    sp.hMinima(imGrad, h, imMin, se)
-    imLabel = sp.Image(imOpen, 'UINT16')
-    sp.label(imMin, imLabel)
-    sp.watershed(imGrad, imLabel, imOut, se)
-
-  #
-  #
-  #
-  imOut = sp.Image(imIn)
-  sp.copy(imIn, imOut)
-  if cli.squareSe:
-    se = sp.SquSE(sz)
+
+# -----------------------------------------------------------------------------
+# Pixels and compulsory traffic (bytes) of one call on the input imIn
+#
+def pointSize(backend, fs, imIn):
+  if isinstance(imIn, np.ndarray):
+    npix = imIn.size
+    itemsize = imIn.itemsize
   else:
-    se = sp.CrossSE(sz)
-
-  dt = np.zeros(repeat)
-  ctit = None
-
-  nb = 1
-  if fs == 'erode':
-    ctit = tit.Timer(lambda: sp.erode(imIn, imOut, se))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'open':
-    ctit = tit.Timer(lambda: sp.open(imIn, imOut, se))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'tophat':
-    ctit = tit.Timer(lambda: sp.topHat(imIn, imOut, se))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == "gradient":
-    ctit = tit.Timer(lambda: sp.gradient(imIn, imOut, se))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'hMaxima':
-    ctit = tit.Timer(lambda: sp.hMaxima(imIn, 10, imOut, se))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'hMinima':
-    ctit = tit.Timer(lambda: sp.hMinima(imIn, 10, imOut, se))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'label':
-    imOut = sp.Image(imIn, 'UINT32')
-    ctit = tit.Timer(lambda: sp.label(imIn, imOut, se))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'fastLabel':
-    imOut = sp.Image(imIn, 'UINT32')
-    ctit = tit.Timer(lambda: sp.fastLabel(imIn, imOut, se))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'segmentation':
-    if cli.binary:
-      ctit = tit.Timer(lambda: binSegmentation(imIn, imOut))
-      nb = getNbAuto(ctit)
-      dt = ctit.repeat(repeat = repeat, number = nb)
-    else:
-      h, sz = wsData[cli.image]
-      ctit = tit.Timer(lambda: graySegmentation(imIn, imOut, h, sz))
-      nb = getNbAuto(ctit)
-      dt = ctit.repeat(repeat = repeat, number = nb)
+    npix = imIn.getWidth() * imIn.getHeight()
+    itemsize = bp.smilArray(imIn).itemsize
+  return npix, bsm.pointBytes(backend, fs, npix, itemsize)
 
-  if fs == 'watershed':
-    if cli.binary:
-      se = sp.HexSE()
-      imDist = sp.Image(imIn)
-      sp.distance(imIn, imDist)
-      sp.inv(imDist, imDist)
-      ctit = tit.Timer(lambda: sp.watershed(imDist, imOut, se(4)))
-      nb = getNbAuto(ctit)
-      dt = ctit.repeat(repeat = repeat, number = nb)
-    else:
-      h, sz = wsData[cli.image]
-      se = sp.HexSE()
-      imOpen = sp.Image(imIn)
-      if sz > 0:
-        sp.open(imIn, imOpen, sp.HexSE(sz))
-      else:
-        sp.copy(imIn, imOpen)
-      imGrad = sp.Image(imIn)
-      imMin = sp.Image(imIn)
-      sp.gradient(imOpen, imGrad, se)
-      sp.hMinima(imGrad, h, imMin, se)
-      imLabel = sp.Image(imOpen, 'UINT16')
-      sp.label(imMin, imLabel)
-      ctit = tit.Timer(lambda: sp.watershed(imGrad, imLabel, imOut, se))
-      nb = getNbAuto(ctit)
-      dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'areaOpen':
-    if cli.arg is None:
-      cli.arg = 500
-    sz = int(cli.arg * px * px)
-    ctit = tit.Timer(lambda: sp.areaOpen(imIn, sz, imOut, se))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'areaThreshold':
-    if cli.arg is None:
-      cli.arg = 500
-    sz = int(cli.arg * px * px)
-    ctit = tit.Timer(lambda: sp.areaThreshold(imIn, sz, imOut, True))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'distance':
-    ctit = tit.Timer(lambda: sp.distanceEuclidean(imIn, imOut))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'zhangSkeleton':
-    ctit = tit.Timer(lambda: sp.zhangSkeleton(imIn, imOut))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'thinning':
-    ctit = tit.Timer(lambda: sp.fullThin(imIn, sp.HMT_hL(6), imOut))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
+
+# With a point timeout, each point is prepared and measured in a forked child
+# (its preparation artefacts aren't kept) : the adaptive loop stops at the
+# timeout and the child is killed at kHardStop times it.
+kHardStop = 2.
+
+
+def opTime(cli, backend, fs, imIn, sz, repeat, px=1):
+  key = pointKey(backend, fs, px, sz)
+  if journal.isDone(key):
+    rec = journal.get(key)
+    return np.array(rec['samples']), rec['info']
+
+  if bo.getOp(backend, fs) is None:
+    return np.zeros(repeat), None
+
+  ti = time.time()
+  measure = lambda: measurePoint(cli, backend, fs, imIn, sz, repeat, px, key)
+  if cli.pointTimeout > 0:
+    res = bt.callKillable(measure, kHardStop * cli.pointTimeout)
+  else:
+    res = measure()
+  if res is None:
+    return np.array([]), {'exceeded': True, 'stopped': time.time() - ti}
+
+  dt, info = res
+  info['elapsed'] = time.time() - ti
+  journal.save(key, dt, info['number'], info)
 
   if cli.debug:
-    print("  Debug : nb {:d}".format(int(nb)))
+    print("  Debug : nb {:d}".format(info['number']))
+
+  return np.array(dt), info
+
+
+def measurePoint(cli, backend, fs, imIn, sz, repeat, px, key):
+  call = bo.prepareOp(cli, backend, fs, imIn, sz, px)
+
+  budget = cli.budget
+  if cli.pointTimeout > 0:
+    budget = min(budget, cli.pointTimeout)
+  rec = journal.get(key) or {}
+  dt, info = bt.timeAdaptive(call,
+                             precision=cli.precision,
+                             budget=budget,
+                             minSamples=repeat,
+                             maxSamples=cli.maxRepeat,
+                             samples=rec.get('samples'),
+                             number=rec.get('number'),
+                             checkpoint=lambda s, n: journal.save(key, s, n))
+  info['pixels'], info['bytes'] = pointSize(backend, fs, imIn)
+  if not perf is None and perf.available:
+    # counted on a separate run : timed samples stay free of counter handling
+    info['perf'] = perf.count(call, info['number'])
+  return dt, info
+
+
+# -----------------------------------------------------------------------------
+# Per point statistics : as many values as cName in saveResults(). Throughput
+# figures (Mpixel/s, GB/s and fraction of the bandwidth) are those of the
+# median.
+#
+kNbStats = 10
+
+
+def timeStats(dt, info):
+  if info is None or info.get('exceeded', False):
+    return [0.] * kNbStats
+  mpix, gbps, frac = bsm.throughput(info.get('pixels', 0),
+                                    info.get('bytes', 0), info['median'],
+                                    cli.bandwidth)
+  return [
+    dt.mean(),
+    dt.std(),
+    dt.min(),
+    dt.max(), info['median'], info['samples'], info['precision'], mpix, gbps,
+    frac
+  ]
 
-  if False and not ctit is None:
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
 
-  dt = np.array(dt)
-  dt *= (1000. / nb)
+# (backend, px, sz) -> (samples, info, dtype, side) of each point
+timingData = {}
 
-  return dt
+# hardware counters (benchPerf), None unless --perf
+perf = None
+
+
+def pointString(info):
+  s = bt.infoString(info)
+  if 'perf' in info:
+    p = bpf.perfString(info['perf'], info['pixels'])
+    if p != '':
+      s += ' - ' + p
+  return s
+
+# checkpoint journal of the run (benchJournal)
+journal = None
+
+# parameters a journal can only be resumed with
+kJournalParams = [
+  'image', 'function', 'binary', 'squareSe', 'arg', 'minImSize', 'maxImSize',
+  'imGrow', 'maxSeSize', 'threads', 'repeat', 'maxRepeat', 'precision',
+  'budget', 'pyramid', 'dtype', 'labelType', 'seShape', 'seGrow', 'seSteps'
+]
+
+
+# -----------------------------------------------------------------------------
+# Predicted time (ms) of one call, from the points already measured : the
+# scaling law of the image size sweep, or the last smaller SE
+#
+def predictCall(backend, px, sz, width, height):
+  szim = []
+  szse = []
+  for (b, k, s), (dt, info, _, _) in timingData.items():
+    if b != backend or info is None or info.get('exceeded', False):
+      continue
+    if s == sz and k != px:
+      szim.append(((k * width) * (k * height), info['median']))
+    if k == px and s < sz:
+      szse.append((s, info['median']))
+
+  n = (px * width) * (px * height)
+  if len(szim) >= 2:
+    fit = bst.fitComplexity([x[0] for x in szim], [x[1] for x in szim])
+    return bst.predictTime(fit, n)[0]
+  if len(szim) == 1:
+    return szim[0][1] * n / szim[0][0]
+  if len(szse) > 0:
+    s, t = max(szse)
+    return t * sz / s
+  return None
+
+
+# -----------------------------------------------------------------------------
+# Predicted cost (s) of a point which doesn't fit in the per point timeout or
+# before the deadline, None if it does. Once a point is over budget, or a
+# measured one lasted longer than the timeout, so are the next ones (cut).
+#
+def overBudget(cli, backend, px, sz, width, height, repeat, cut=False):
+  if cli.pointTimeout <= 0 and cli.deadline <= 0:
+    return None
+  if journal.isDone(pointKey(backend, cli.function, px, sz)):
+    return None
+  t = predictCall(backend, px, sz, width, height)
+  cost = 0. if t is None else bt.estimateCost(t / 1000., repeat)
+  if cut:
+    return cost
+  if cli.pointTimeout > 0 and cost > cli.pointTimeout:
+    return cost
+  if cli.deadline > 0 and time.time() + cost > cli.deadline:
+    return cost
+  return None
+
+
+def exceededPoint(backend, px, sz, side, cost, dtype, stopped=False):
+  info = {'exceeded': True, 'predicted': cost}
+  timingData[(backend, px, sz)] = (np.array([]), info, dtype, int(px * side))
+  how = 'stopped after' if stopped else 'predicted'
+  print('{:5.1f} - {:6.0f} {:2d} - exceeded budget ({:s} {:.1f} s)'.format(
+    px, px * side, sz, how, cost))
+
+
+# -----------------------------------------------------------------------------
+# Whether the real cost of a measured point reached the per point timeout
+#
+def overTimeout(cli, info):
+  if cli.pointTimeout <= 0 or info is None:
+    return False
+  if info.get('exceeded', False):
+    return True
+  return info.get('elapsed', 0.) > cli.pointTimeout
+
+
+def smilTime(cli, fs, imIn, sz, repeat, px=1):
+  return opTime(cli, 'smil', fs, imIn, sz, repeat, px)
 
 
 # -----------------------------------------------------------------------------
@@ -304,40 +308,56 @@ def doSmil(cli, fin=None, fs=None, szIm=[], szSE=[1], repeat=7):
 
   print("* Smil\n")
 
-  im = sp.Image(fin)
-  side = im.getWidth()
-
-  imt = sp.Image(im)
+  height, side = bp.getArray(cli, fin, 1.).shape
+  imDtype = bp.getArray(cli, fin, 1.).dtype.name
+  if bp.getInput(cli, fin, 1.) is None:
+    print('  no {:s} images in this Smil build : skipped\n'.format(imDtype))
+    n = len(szIm) * len(szSE)
+    return np.zeros(n), np.zeros((n, kNbStats))
 
   m = []
   npm = np.array(())
   printHeader()
 
+  cut = False
   for szi in szIm:
-    if szi != 1.:
-      if sp.isBinary(im):
-        sp.scale(im, szi, imt, "closest")
-      else:
-        sp.scale(im, szi, szi, imt, "bilinear")
-    else:
-      sp.copy(im, imt)
-    imo = sp.Image(imt)
+    bo.prepDrop(szi)
+    imt = None
 
     for sz in szSE:
+      cost = overBudget(cli, 'smil', szi, sz, side, height, repeat, cut)
+      if not cost is None:
+        cut = True
+        exceededPoint('smil', szi, sz, side, cost, imDtype)
+        m.append(0.)
+        npm = np.append(npm, timeStats(None, None))
+        continue
+      if imt is None:
+        imt = bp.getInput(cli, fin, szi)
       if cli.debug:
         printProcTime('Call smilTime({:4.1f}, {:2d})'.format(szi, sz))
-      dt = smilTime(cli, fs, imt, sz, repeat, szi)
+      dt, info = smilTime(cli, fs, imt, sz, repeat, szi)
+      cut = cut or overTimeout(cli, info)
+      if not info is None and 'stopped' in info:
+        exceededPoint('smil', szi, sz, side, info['stopped'], imDtype, True)
+        m.append(0.)
+        npm = np.append(npm, timeStats(None, None))
+        continue
+      timingData[('smil', szi, sz)] = (dt, info, imDtype, int(szi * side))
       if cli.debug:
         printProcTime('Back from smilTime()')
+      if cli.verify:
+        verifySmil(cli, fs, imt, sz, szi)
       fmt = '{:5.1f} - {:6.0f} {:2d} - {:11.3f} {:11.3f} {:11.3f} {:11.3f} - (ms)'
       print(
         fmt.format(szi, szi * side, sz, dt.mean(), dt.std(), dt.min(),
-                   dt.max()))
+                   dt.max()), end='')
+      print(' - ' + pointString(info) if not info is None else '')
       m.append(dt.min())
-      npm = np.append(npm, [dt.mean(), dt.std(), dt.min(), dt.max()])
+      npm = np.append(npm, timeStats(dt, info))
 
   print()
-  npm = npm.reshape((npm.shape[0] // 4, 4))
+  npm = npm.reshape((npm.shape[0] // kNbStats, kNbStats))
   return np.array(m), npm
 
 
@@ -351,227 +371,11 @@ def doSmil(cli, fin=None, fs=None, szIm=[], szSE=[1], repeat=7):
 #
 
 
-# -----------------------------------------------------------------------------
-# Structuring elements
-#
-def mkSquareSE(cli, sz=1, D3=False):
-  dim = 2 * sz + 1
-  if D3:
-    se = np.ndarray((dim, dim, dim), dtype='uint8')
-    se[:, :, :] = 1
-  else:
-    se = np.ndarray((dim, dim), dtype='uint8')
-    se[:, :] = 1
-    se = skm.selem.square(2 * sz + 1)
-  return se
-
-
-# -----------------------------------------------------------------------------
-#
-#
-def mkCrossSE(cli, sz=1, D3=False):
-  dim = 2 * sz + 1
-  if D3:
-    se = np.ndarray((dim, dim, dim), dtype='uint8')
-    se[:, :, :] = 0
-    se[:, :, dim // 2] = 1
-    se[:, dim // 2, :] = 1
-    se[dim // 2, :, :] = 1
-  else:
-    se = skm.selem.diamond(sz)
-
-  return se
-
-
 # -----------------------------------------------------------------------------
 #
 #
 def skTime(cli, fs, imIn, sz, repeat, px=1):
-
-  wsData = {
-    'astronaut.png': [2, 5],
-    'bubbles_gray.png': [1, 3],
-    'hubble_EDF_gray.png': [1, 2],
-    'lena.png': [3, 5],
-    'tools.png': [1, 3],
-  }
-
-  #
-  #
-  #
-  def binSegmentation(imIn):
-    imIn = imIn.astype(int)
-    # https://scikit-image.org/docs/dev/auto_examples/segmentation/plot_watershed.html
-    distance = ndi.distance_transform_edt(imIn)
-    coords = peak_local_max(distance, footprint=np.ones((3, 3)), labels=imIn)
-    mask = np.zeros(distance.shape, dtype=bool)
-    mask[tuple(coords.T)] = True
-    markers, _ = ndi.label(mask)
-    labels = watershed(-distance, markers, mask=mask)
-    return labels
-
-  def graySegmentation(imIn, szg, szo):
-    imIn = imIn.astype('uint8')
-    # denoise image
-    denoised = rank.median(imIn, skm.disk(szo))
-    # find continuous region (low gradient -
-    # where less than 10 for this image) --> markers
-    # disk(5) is used here to get a more smooth image
-    markers = rank.gradient(denoised, skm.disk(szg)) < 10
-    markers = ndi.label(markers)[0]
-    # local gradient (disk(2) is used to keep edges thin)
-    gradient = rank.gradient(denoised, skm.disk(2))
-    # process the watershed
-    labels = watershed(gradient, markers)
-
-  #
-  #
-  #
-  def skAreaThreshold(imIn, sz):
-    imb = skm.label(imIn)
-    imOut = skm.remove_small_objects(imb, sz)
-    return imOut
-
-  #
-  #
-  #
-  if cli.squareSe:
-    se = mkSquareSE(cli, sz)
-  else:
-    se = mkCrossSE(cli, sz)
-
-  dt = np.zeros(repeat)
-  ctit = None
-
-  nb = 1
-  if fs == 'erode':
-    ctit = tit.Timer(lambda: skm.erosion(imIn, se))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'open':
-    ctit = tit.Timer(lambda: skm.opening(imIn, se))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'tophat':
-    ctit = tit.Timer(lambda: skm.white_tophat(imIn, se))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'gradient':
-    imIn = imIn.astype('uint8')
-    ctit = tit.Timer(lambda: rank.gradient(imIn, se))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'hMaxima':
-    ctit = tit.Timer(lambda: skm.h_maxima(imIn, 10, se))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'hMinima':
-    ctit = tit.Timer(lambda: skm.h_minima(imIn, 10, se))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'label':
-    ctit = tit.Timer(lambda: skm.label(imIn, connectivity=1))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'fastLabel':
-    ctit = tit.Timer(lambda: skm.label(imIn, connectivity=2))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'segmentation':
-    if cli.binary:
-      ctit = tit.Timer(lambda: binSegmentation(imIn))
-      nb = getNbAuto(ctit)
-      dt = ctit.repeat(repeat = repeat, number = nb)
-    else:
-      szg, szo = wsData[cli.image]
-      ctit = tit.Timer(lambda: graySegmentation(imIn, szg, szo))
-      nb = getNbAuto(ctit)
-      dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'watershed':
-    if cli.binary:
-      imIn = imIn.astype(int)
-      dist = ndi.distance_transform_edt(imIn)
-      se = skm.selem.diamond(3)
-      coords = peak_local_max(dist,
-                              footprint=se,
-                              labels=imIn)
-      mask = np.zeros(dist.shape, dtype=bool)
-      mask[tuple(coords.T)] = True
-      markers, _ = ndi.label(mask)
-      ctit = tit.Timer(lambda: watershed(-dist, markers, mask=imIn))
-      nb = getNbAuto(ctit)
-      dt = ctit.repeat(repeat = repeat, number = nb)
-    else:
-      szg, szo = wsData[cli.image]
-      imIn = imIn.astype('uint8')
-      # denoise image
-      denoised = rank.median(imIn, skm.disk(szo))
-      # find continuous region (low gradient -
-      # where less than 10 for this image) --> markers
-      # disk(5) is used here to get a more smooth image
-      markers = rank.gradient(denoised, skm.disk(szg)) < 10
-      markers = ndi.label(markers)[0]
-      # local gradient (disk(2) is used to keep edges thin)
-      gradient = rank.gradient(denoised, skm.disk(2))
-      # process the watershed
-      ctit = tit.Timer(lambda: watershed(gradient, markers))
-      nb = getNbAuto(ctit)
-      dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'areaOpen':
-    if cli.arg is None:
-      cli.arg = 500
-    sz = int(cli.arg * px * px)
-    ctit = tit.Timer(
-      lambda: skm.area_opening(imIn, area_threshold=sz, connectivity=1))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'areaThreshold':
-    if cli.arg is None:
-      cli.arg = 500
-    sz = int(cli.arg * px * px)
-    ctit = tit.Timer(lambda: skAreaThreshold(imIn, sz=sz))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'distance':
-    ctit = tit.Timer(lambda: ndi.distance_transform_edt(imIn))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'zhangSkeleton':
-    imIn = imIn.astype(bool)
-    ctit = tit.Timer(lambda: skm.skeletonize(imIn))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if fs == 'thinning':
-    imIn = imIn.astype(bool)
-    ctit = tit.Timer(lambda: skm.thin(imIn))
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  if cli.debug:
-    print(" Debug : nb {:d}".format(int(nb)))
-
-  if False and not ctit is None:
-    nb = getNbAuto(ctit)
-    dt = ctit.repeat(repeat = repeat, number = nb)
-
-  dt = np.array(dt)
-  dt *= (1000. / nb)
-
-  return dt
+  return opTime(cli, 'skimage', fs, imIn, sz, repeat, px)
 
 
 # -----------------------------------------------------------------------------
@@ -583,45 +387,181 @@ def doSkImage(cli, fin=None, fs=None, szIm=[], szSE=[1], repeat=7):
 
   print("* skImage\n")
 
-  im = io.imread(fin, as_gray=True)
-  side = im.shape[0]
-  sz = 1
+  height, side = bp.getArray(cli, fin, 1.).shape
+  imDtype = bp.getArray(cli, fin, 1.).dtype.name
 
   m = []
   npm = np.array(())
   printHeader()
+  cut = False
   for szi in szIm:
-    if szi != 1:
-      order = 1
-      if cli.binary:
-        order = 0
-      imt = rescale(im,
-                    szi,
-                    preserve_range=True,
-                    order=order,
-                    anti_aliasing=True,
-                    multichannel=False)
-    else:
-      imt = im.copy()
+    bo.prepDrop(szi)
+    imt = None
 
     for sz in szSE:
+      cost = overBudget(cli, 'skimage', szi, sz, side, height, repeat, cut)
+      if not cost is None:
+        cut = True
+        exceededPoint('skimage', szi, sz, side, cost, imDtype)
+        m.append(0.)
+        npm = np.append(npm, timeStats(None, None))
+        continue
+      if imt is None:
+        # same pixels as Smil, no copy
+        imt = bp.getArray(cli, fin, szi)
       if cli.debug:
         printProcTime('Call skTime({:4.1f}, {:2d})'.format(szi, sz))
-      dt = skTime(cli, fs, imt, sz, repeat, szi)
+      dt, info = skTime(cli, fs, imt, sz, repeat, szi)
+      cut = cut or overTimeout(cli, info)
+      if not info is None and 'stopped' in info:
+        exceededPoint('skimage', szi, sz, side, info['stopped'], imDtype, True)
+        m.append(0.)
+        npm = np.append(npm, timeStats(None, None))
+        continue
+      timingData[('skimage', szi, sz)] = (dt, info, imDtype, int(szi * side))
       if cli.debug:
         printProcTime('Back from skTime()')
+      if cli.verify:
+        verifySkImage(cli, fs, imt, sz, szi)
       fmt = '{:5.1f} - {:6.0f} {:2d} - {:11.3f} {:11.3f} {:11.3f} {:11.3f} - (ms)'
       print(
         fmt.format(szi, szi * side, sz, dt.mean(), dt.std(), dt.min(),
-                   dt.max()))
+                   dt.max()), end='')
+      print(' - ' + pointString(info) if not info is None else '')
       m.append(dt.min())
-      npm = np.append(npm, [dt.mean(), dt.std(), dt.min(), dt.max()])
+      npm = np.append(npm, timeStats(dt, info))
+      if cli.verify and (szi, sz) in verifyData:
+        print('{:5s}   {:6s} {:2s} - verify : {:s}'.format(
+          '', '', '', bv.verdictString(verifyData[(szi, sz)].get('res'))))
 
   print()
-  npm = npm.reshape((npm.shape[0] // 4, 4))
+  npm = npm.reshape((npm.shape[0] // kNbStats, kNbStats))
   return np.array(m), npm
 
 
+#
+# #    #  ######  #####      #    ######   #   #
+# #    #  #       #    #     #    #         # #
+# #    #  #####   #    #     #    #####      #
+# #    #  #       #####      #    #          #
+#  #  #   #       #   #      #    #          #
+#   ##    ######  #    #     #    #          #
+#
+# -----------------------------------------------------------------------------
+# Output equivalence, checked outside of the timed region : Smil output is
+# saved as reference, skimage output is compared to it when available.
+#
+verifyData = {}
+
+
+def verifyName(cli, fs, sz, px):
+  b, _ = os.path.splitext(cli.image)
+  return '{:s}-{:s}-{:.6g}-{:d}'.format(b, fs, px, sz)
+
+
+def verifySmil(cli, fs, imt, sz, px):
+  out = bo.runOp(cli, 'smil', fs, imt, sz, px)
+  if out is None:
+    return
+  h = bv.saveReference(verifyName(cli, fs, sz, px), out)
+  verifyData[(px, sz)] = {'smil': h}
+
+
+def verifySkImage(cli, fs, imt, sz, px):
+  out = bo.runOp(cli, 'skimage', fs, imt, sz, px)
+  vd = verifyData.setdefault((px, sz), {})
+  if out is None:
+    return
+  vd['skimage'] = bv.contentHash(bv.toArray(out))
+  name = verifyName(cli, fs, sz, px)
+  ref = bv.loadReference(name)
+  if ref is None:
+    return
+  mode = bv.verifyMode(fs)
+  if not mode is None:
+    vd['res'] = bv.compareOutputs(ref, out, mode, cli.tol)
+  del ref
+  bv.dropReference(name)
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def saveVerify(cli, keys, sz, fName=None, suffix="szim"):
+  if fName is None:
+    if cli.binary:
+      fName = "bin"
+    else:
+      fName = "gray"
+    fName += '-{:s}-{:s}-{:s}-verify.csv'.format(fileBase(cli), cli.function,
+                                                 suffix)
+
+  if not os.path.isdir(cli.node):
+    os.mkdir(cli.node)
+  fPath = os.path.join(cli.node, fName)
+
+  with open(fPath, "w") as fout:
+    h = [suffix, 'mode', 'verdict', 'nDiff', 'maxDiff', 'Smil-hash',
+         'skImage-hash']
+    fout.write(';'.join(h) + '\n')
+    for i in range(0, len(sz)):
+      vd = verifyData.get(keys[i], {})
+      res = vd.get('res', None)
+      sl = ['{:d}'.format(int(sz[i]))]
+      if res is None:
+        sl += ['', bv.verdictString(res), '', '']
+      else:
+        sl += [
+          res['mode'],
+          bv.verdictString(res), '{:d}'.format(res['nDiff']),
+          '{:.5f}'.format(res['maxDiff'])
+        ]
+      sl += [vd.get('smil', ''), vd.get('skimage', '')]
+      fout.write(';'.join(sl) + '\n')
+
+
+# -----------------------------------------------------------------------------
+# Image part of file names : the pixel type and the SE shape are appended
+# when not the default ones
+#
+def fileBase(cli):
+  b, _ = os.path.splitext(cli.image)
+  return bs.csvBase(b, cli.dtype, cli.seShape)
+
+
+# -----------------------------------------------------------------------------
+# Append the points of a section to the results store
+#
+def storeResults(cli, writer, keys, suffix="szim"):
+  # backends are loaded by now
+  writer.setEnv()
+  b, _ = os.path.splitext(cli.image)
+  for backend in ['smil', 'skimage']:
+    for px, sz in keys:
+      if not (backend, px, sz) in timingData:
+        continue
+      dt, info, dtype, side = timingData[(backend, px, sz)]
+      if info is None:
+        continue
+      exceeded = info.get('exceeded', False)
+      writer.add(**bs.pointRow(dt,
+                               None if exceeded else info,
+                               status='exceeded' if exceeded else 'ok',
+                               backend=backend,
+                               function=cli.function,
+                               image=b,
+                               imType='bin' if cli.binary else 'gray',
+                               axis=suffix,
+                               size=side,
+                               scale=px,
+                               se=sz,
+                               dtype=dtype,
+                               seShape=bo.seShape(cli),
+                               threads=bo.getThreads(),
+                               bandwidth=cli.bandwidth or None))
+  writer.flush()
+
+
 #
 # #    #    ##       #    #    #
 # ##  ##   #  #      #    ##   #
@@ -632,16 +572,72 @@ def doSkImage(cli, fin=None, fs=None, szIm=[], szSE=[1], repeat=7):
 #
 
 
+# -----------------------------------------------------------------------------
+# Fit T(N) = a.N^b (N : pixels) on the medians of the image size sweep and
+# predict the time of larger images
+#
+def printComplexity(cli, szCoefs, width, height):
+  print("* Complexity : T(N) = a.N^b (N : pixels, 95% CI)")
+  print()
+  sides = [int(x) for x in cli.predict.split(',') if x.strip() != '']
+  for backend, name in [('smil', 'Smil'), ('skimage', 'skImage')]:
+    n = []
+    t = []
+    for k in szCoefs:
+      dt, info, _, _ = timingData.get((backend, k, 1), (None, None, '', 0))
+      if info is None or info.get('exceeded', False):
+        continue
+      n.append((k * width) * (k * height))
+      t.append(info['median'])
+    bst.printFit(name, bst.fitComplexity(n, t), sides)
+  print()
+
+
+# -----------------------------------------------------------------------------
+# Fit T(r) = a.r^b (r : SE radius) on the medians of the SE size sweep :
+# b ~ 0 for decompositions independent of the size, 1 for homotheties, 2 for
+# whole 2D footprints
+#
+def printSeGrowth(cli, seSizes):
+  print()
+  print("* SE growth ({:s}) : T(r) = a.r^b (r : SE radius, 95% CI)".format(
+    bo.seShape(cli)))
+  print()
+  for backend, name in [('smil', 'Smil'), ('skimage', 'skImage')]:
+    r = []
+    t = []
+    for k in seSizes:
+      dt, info, _, _ = timingData.get((backend, 1, k), (None, None, '', 0))
+      if info is None or info.get('exceeded', False):
+        continue
+      r.append(k)
+      t.append(info['median'])
+    fit = bst.fitComplexity(r, t)
+    if fit is None:
+      print('  {:8s} : not enough points'.format(name))
+      continue
+    print('  {:8s} : b = {:5.3f} [{:5.3f}, {:5.3f}] - {:d} points'.format(
+      name, fit['b'], fit['bLow'], fit['bHigh'], fit['points']))
+    if len(fit['breaks']) == 0:
+      continue
+    fmt = '  {:8s}   {:6.0f} - {:6.0f} : b = {:5.3f} [{:5.3f}, {:5.3f}]'
+    for sg in fit['segments']:
+      print(fmt.format('', sg['nFrom'], sg['nTo'], sg['b'], sg['bLow'],
+                       sg['bHigh']))
+
+
 # -----------------------------------------------------------------------------
 #
 #
 def printSpeedUp(sz, msm, msk):
   if len(msk) != len(sz) or len(msk) != len(msm) or len(sz) == 0:
     return
-  rkm = msk / msm
-  rmk = msm / msk
-  lKm = np.log10(rkm)
-  lMk = np.log10(rmk)
+  # points over budget are zeros
+  with np.errstate(divide='ignore', invalid='ignore'):
+    rkm = msk / msm
+    rmk = msm / msk
+    lKm = np.log10(rkm)
+    lMk = np.log10(rmk)
 
   print("* Speed-up : (dt_skimage / dt_Smil)")
   print()
@@ -656,6 +652,31 @@ def printSpeedUp(sz, msm, msk):
   print("\n  - [*] : ratio and log10(ratio) in columns")
 
 
+# -----------------------------------------------------------------------------
+# Mpixel/s, effective GB/s and % of the measured bandwidth of the medians
+#
+def printThroughput(sz, vSm, vSk):
+  if vSm.shape[0] != len(sz) or vSk.shape[0] != len(sz) or len(sz) == 0:
+    return
+
+  print()
+  print("* Throughput : (median)")
+  print()
+  h = "  {:5s} | {:^26s} | {:^26s}".format('', 'Smil', 'skImage')
+  print(h)
+  print("  {:5s} | {:>8s} {:>8s} {:>8s} | {:>8s} {:>8s} {:>8s}".format(
+    '', 'Mpix/s', 'GB/s', '% BW', 'Mpix/s', 'GB/s', '% BW'))
+  print('-' * (len(h) + 3))
+  for i in range(0, len(sz)):
+    s = "  {:5d} |".format(int(sz[i]))
+    for v in [vSm, vSk]:
+      s += " {:8.1f} {:8.2f} {:8.1f} |".format(v[i, 7], v[i, 8], 100. * v[i, 9])
+    print(s.rstrip(' |'))
+  if cli.bandwidth > 0:
+    print("\n  - % BW : effective GB/s over {:.1f} GB/s (STREAM)".format(
+      cli.bandwidth))
+
+
 # -----------------------------------------------------------------------------
 #
 #
@@ -668,14 +689,16 @@ def saveResults(cli, sz, vSm, vSk, fName=None, suffix="szim"):
       fName = "bin"
     else:
       fName = "gray"
-    b, x = os.path.splitext(cli.image)
-    fName += '-{:s}-{:s}-{:s}.csv'.format(b, cli.function, suffix)
+    fName += '-{:s}-{:s}-{:s}.csv'.format(fileBase(cli), cli.function, suffix)
 
   if not os.path.isdir(cli.node):
     os.mkdir(cli.node)
   fPath = os.path.join(cli.node, fName)
 
-  cName = ['mean', 'stdev', 'min', 'max']
+  cName = [
+    'mean', 'stdev', 'min', 'max', 'median', 'samples', 'precision', 'mpix',
+    'gbps', 'bw'
+  ]
   with open(fPath, "w") as fout:
     h = [suffix]
     for j in range(0, vSm.shape[1]):
@@ -768,16 +791,31 @@ def getCliArgs():
   parser = ap.ArgumentParser()
   parser.add_argument('--image',
                       default='notfound.png',
-                      help='Image file',
+                      help='Image file or synthetic image (synth:key=value:...)',
                       type=str)
 
   parser.add_argument('--debug', help='', action="store_true")
   parser.add_argument('--verbose', help='', action="store_true")
 
-  parser.add_argument('--repeat', default=7, help='nb rounds', type=int)
+  parser.add_argument('--repeat',
+                      default=bt.kMinSamples,
+                      help='min nb rounds',
+                      type=int)
+  parser.add_argument('--maxRepeat',
+                      default=bt.kMaxSamples,
+                      help='max nb rounds',
+                      type=int)
+  parser.add_argument('--precision',
+                      default=bt.kPrecision,
+                      help='target precision : 95%% CI half width / median',
+                      type=float)
+  parser.add_argument('--budget',
+                      default=bt.kBudget,
+                      help='time budget per point (s)',
+                      type=float)
   parser.add_argument('--selector',
                       default='mean',
-                      help='measurement selector : mean, min, max',
+                      help='measurement selector : mean, min, max, median',
                       type=str)
 
   parser.add_argument('--minImSize',
@@ -797,6 +835,19 @@ def getCliArgs():
                       default=8,
                       help='Max Structuring Element size',
                       type=int)
+  parser.add_argument('--seGrow',
+                      default='a',
+                      help='SE growing : a arithmetic - l log-spaced',
+                      type=str)
+  parser.add_argument('--seSteps',
+                      default=12,
+                      help='number of log-spaced SE sizes',
+                      type=int)
+  parser.add_argument('--seShape',
+                      default=None,
+                      choices=bo.kSeShapes,
+                      help='SE shape (default : cross, or square)',
+                      type=str)
 
   parser.add_argument('--binary',
                       default=False,
@@ -809,11 +860,88 @@ def getCliArgs():
 
   parser.add_argument('--arg', help='Generic argument', type=float)
 
+  parser.add_argument('--dtype',
+                      default=None,
+                      choices=list(bp.kDtypes.keys()),
+                      help='input pixel type (default : native)',
+                      type=str)
+  parser.add_argument('--labelType',
+                      default=None,
+                      choices=['UINT8', 'UINT16', 'UINT32'],
+                      help='Smil label and marker images type',
+                      type=str)
+
+  parser.add_argument('--pyramid',
+                      help='read scaled images from the pyramid cache',
+                      action='store_true')
+  parser.add_argument('--pyramidDir',
+                      default=bp.kPyramidDir,
+                      help='pyramid cache directory',
+                      type=str)
+  parser.add_argument('--pyramidBudget',
+                      default=bp.kPyramidBudget,
+                      help='pyramid cache disk budget (MB)',
+                      type=int)
+
+  parser.add_argument('--verify',
+                      help='check Smil and skimage outputs are equivalent',
+                      action='store_true')
+  parser.add_argument('--perf',
+                      help='hardware counters : IPC and misses per pixel',
+                      action='store_true')
+  parser.add_argument('--streamMB',
+                      default=bsm.kStreamBytes // (1024 * 1024),
+                      help='STREAM array size (MB) - 0 : no bandwidth baseline',
+                      type=int)
+  parser.add_argument('--bandwidth',
+                      default=0.,
+                      help='bandwidth baseline (GB/s) measured by the caller - not measured again',
+                      type=float)
+  parser.add_argument('--tol',
+                      default=1e-3,
+                      help='tolerance for approximate results (distance), at least 1 on integer outputs',
+                      type=float)
+
+  parser.add_argument('--predict',
+                      default='32768,65536',
+                      help='image sides to predict the time of',
+                      type=str)
+
+  parser.add_argument('--pointTimeout',
+                      default=0,
+                      help='skip points predicted to last longer, stop those which do (s)',
+                      type=float)
+  parser.add_argument('--deadline',
+                      default=0,
+                      help="don't start points that wouldn't end before (epoch s)",
+                      type=float)
+
+  parser.add_argument('--journal',
+                      default=None,
+                      help='checkpoint journal (default : var/journal/...)',
+                      type=str)
+  parser.add_argument('--fresh',
+                      help="don't resume from the checkpoint journal",
+                      action='store_true')
+
+  parser.add_argument('--store',
+                      default=bs.kStoreFile,
+                      help='results store : SQLite file or .parquet directory',
+                      type=str)
+  parser.add_argument('--csv',
+                      help='also write the legacy CSV files',
+                      action='store_true')
+
+  parser.add_argument('--threads',
+                      default=0,
+                      help='Smil threads (default : 0 - library default)',
+                      type=int)
+
   sFuncs = ' | '.join(kFuncs.keys())
   parser.add_argument('--function', default='erode', help=sFuncs, type=str)
   cli = parser.parse_args()
 
-  okSel = ['mean', 'min', 'max']
+  okSel = ['mean', 'min', 'max', 'median']
   if not cli.selector in okSel:
     print('Invalid values for selector : {:s} - Choose one of {:s}'.format(
       cli.selector, ', '.join(okSel)))
@@ -827,6 +955,10 @@ def getCliArgs():
     print('imGrow must be "a" or "g"')
     exit(1)
 
+  if not cli.seGrow in ['a', 'l']:
+    print('seGrow must be "a" or "l"')
+    exit(1)
+
   return cli
 
 
@@ -886,6 +1018,9 @@ def XgetConfigValues(argv):
 #
 #
 def getImageSizes(fin):
+  if bsy.isSynth(fin):
+    width, height = bsy.getSize(fin)
+    return width, height, 1, bsy.isBinary(fin)
   im = sp.Image(fin)
   width = im.getWidth()
   height = im.getHeight()
@@ -904,6 +1039,8 @@ def whichData(arr, selector="mean"):
     return arr[:, 2]
   if selector == "max":
     return arr[:, 3]
+  if selector == "median":
+    return arr[:, 4]
   return arr[:, 0]
 
 
@@ -911,25 +1048,34 @@ def whichData(arr, selector="mean"):
 #
 #
 cli = getCliArgs()
-
-repeat = 7
+cli.startup, cli.imports = bl.startupTimes()
 
 fin = cli.image
 repeat = cli.repeat
 funcName = cli.function
 
 imPath = os.path.join('images', fin)
-if not os.path.isfile(imPath):
+if bsy.isSynth(fin):
+  # the specification is the input, its name is used everywhere else
+  imPath = fin
+  cli.synth = fin
+  cli.image = bsy.specName(fin)
+  fin = cli.image
+elif not os.path.isfile(imPath):
   print("Image file {:s} not found".format(imPath))
   exit(1)
 
 cli.node = os.uname().nodename.split('.')[0]
 
+bo.setThreads(cli.threads)
+
 width, height, depth, isBin = getImageSizes(imPath)
 
 dt = datetime.now()
 print('Date     : {:s}'.format(dt.strftime("%d/%m/%Y %I:%M:%S %p")))
 print('Image    : {:s}'.format(fin))
+if bsy.isSynth(imPath):
+  print('  spec   : {:s}'.format(imPath))
 print('  width  : {:5d}'.format(width))
 print('  height : {:5d}'.format(height))
 print('  depth  : {:5d}'.format(depth))
@@ -937,8 +1083,26 @@ if isBin:
   print('  type   : binary')
 else:
   print('  type   : gray')
+print('  pixel  : {:s}'.format(cli.dtype or 'native'))
+if not cli.labelType is None:
+  print('  labels : {:s}'.format(cli.labelType))
 print('Function : {:s}'.format(cli.function))
-print('  repeat : {:5d}'.format(repeat))
+print('  repeat : {:5d} - {:d}'.format(repeat, cli.maxRepeat))
+print('  target : {:5.1f} % - {:.0f} s per point'.format(100. * cli.precision,
+                                                      cli.budget))
+print('Threads  : {:5d}'.format(bo.getThreads()))
+print('Startup  : {:s}'.format(bl.startupString()))
+# before the store writer : the baseline is saved with the run parameters
+if cli.bandwidth > 0:
+  print('Memory   : {:.1f} GB/s (given)'.format(cli.bandwidth))
+elif cli.streamMB > 0:
+  # as many threads as Smil
+  bw = bsm.streamBandwidth(cli.streamMB * 1024 * 1024,
+                           threads=bo.getThreads())
+  cli.bandwidth = bw['best']
+  print('Memory   : {:s}'.format(bsm.streamString(bw)))
+else:
+  cli.bandwidth = 0.
 
 print()
 
@@ -956,7 +1120,40 @@ if len(szCoefs) == 0:
 if isBin and not cli.binary:
   cli.binary = True
 
-seSizes = [k for k in range(1, cli.maxSeSize + 1)]
+if cli.seGrow == 'l':
+  seSizes = np.geomspace(1, cli.maxSeSize, max(cli.seSteps, 2))
+  seSizes = sorted(set([int(round(k)) for k in seSizes]))
+else:
+  seSizes = [k for k in range(1, cli.maxSeSize + 1)]
+if kFuncs[cli.function]:
+  print('SE       : {:s} - {:s}'.format(bo.seShape(cli),
+                                        ' '.join([str(k) for k in seSizes])))
+  print()
+if cli.verify and not bo.seMatched(cli):
+  print('* {:s} SE differ between backends : no verification'.format(
+    bo.seShape(cli)))
+  print()
+  cli.verify = False
+
+writer = bs.StoreWriter(cli.store, cli)
+
+if cli.journal is None:
+  cli.journal = os.path.join(
+    bj.kJournalDir, '{:s}-{:s}-{:s}.jsonl'.format(
+      'bin' if cli.binary else 'gray', fileBase(cli), cli.function))
+journal = bj.Journal(cli.journal, {k: getattr(cli, k) for k in kJournalParams},
+                     not cli.fresh)
+if cli.perf:
+  perf = bpf.PerfCounters()
+  if not perf.available:
+    print('* Hardware counters not available ({:s}) : timing only'.format(
+      perf.reason))
+    print()
+
+if len(journal.points) > 0:
+  print('* Resuming : {:d} points in {:s}'.format(len(journal.points),
+                                                  cli.journal))
+  print()
 
 #
 # Varying image size
@@ -986,7 +1183,15 @@ msk = whichData(npsk, cli.selector)
 sz = width * np.array(szCoefs)
 
 printSpeedUp(sz, msm, msk)
-saveResults(cli, sz, npsm, npsk, fName=None, suffix="szim")
+printThroughput(sz, npsm, npsk)
+printComplexity(cli, szCoefs, width, height)
+if not journal.getTag('stored-szim', False):
+  storeResults(cli, writer, [(k, 1) for k in szCoefs], suffix="szim")
+  journal.setTag('stored-szim')
+if cli.csv:
+  saveResults(cli, sz, npsm, npsk, fName=None, suffix="szim")
+if cli.verify:
+  saveVerify(cli, [(k, 1) for k in szCoefs], sz, fName=None, suffix="szim")
 printElapsed(ti, tf)
 
 #
@@ -1016,8 +1221,21 @@ if kFuncs[cli.function]:
 
   sz = np.array(seSizes)
   printSpeedUp(sz, msm, msk)
-  saveResults(cli, sz, npsm, npsk, fName=None, suffix="szse")
+  printThroughput(sz, npsm, npsk)
+  printSeGrowth(cli, seSizes)
+  if not journal.getTag('stored-szse', False):
+    storeResults(cli, writer, [(1, k) for k in seSizes], suffix="szse")
+    journal.setTag('stored-szse')
+  if cli.csv:
+    saveResults(cli, sz, npsm, npsk, fName=None, suffix="szse")
+  if cli.verify:
+    saveVerify(cli, [(1, k) for k in seSizes], sz, fName=None, suffix="szse")
   printElapsed(ti, tf)
   print()
 
 printSectionHeader()
+print('Backends : {:s}'.format(bl.loadString()))
+print()
+
+writer.close()
+journal.close(remove=True)
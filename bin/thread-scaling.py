@@ -0,0 +1,422 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  thread-scaling.py
+#
+#  Copyright 2021 jose-marcio <martins@jose-marcio.org>
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the  nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#  Thread scaling of Smil and skimage functions.
+#
+#  Each point (backend, function, threads) runs in its own process, pinned to
+#  the first n CPUs with OMP_NUM_THREADS=n, so that the thread pool of each
+#  library is sized from the start.
+#
+#  * strong scaling : the image is the same for all thread counts
+#  * weak scaling   : the image is a mosaic of n copies of the source image
+#
+import os
+import sys
+import json
+import subprocess
+
+from datetime import datetime
+
+import argparse as ap
+
+import benchTiming as bt
+import benchSynth as bsy
+
+kBackends = ['smil', 'skimage']
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def getCliArgs():
+  parser = ap.ArgumentParser()
+
+  parser.add_argument('--debug', help='', action="store_true")
+  parser.add_argument('--verbose', help='', action="store_true")
+
+  parser.add_argument('--image',
+                      default='lena.png',
+                      help='Image file (in images/) or synthetic image (synth:...)',
+                      type=str)
+  parser.add_argument('--binary',
+                      default=False,
+                      help='Image is binary',
+                      action="store_true")
+  parser.add_argument('--squareSe',
+                      default=False,
+                      help='Structuring Element Square (default is Cross)',
+                      action='store_true')
+  parser.add_argument('--seSize',
+                      default=1,
+                      help='Structuring Element size',
+                      type=int)
+  parser.add_argument('--arg', help='Generic argument', type=float)
+
+  parser.add_argument('--funcs',
+                      default=None,
+                      help='comma separated list of functions (default : all)',
+                      type=str)
+  parser.add_argument('--which',
+                      default='both',
+                      help='which ? both, smil skimage (default : both)',
+                      type=str)
+  parser.add_argument('--mode',
+                      default='both',
+                      help='strong, weak or both (default : both)',
+                      type=str)
+  parser.add_argument('--maxThreads',
+                      default=0,
+                      help='max number of threads (default : available CPUs)',
+                      type=int)
+  parser.add_argument('--ri',
+                      default=1,
+                      help='strong scaling image size multiplier (default : 1)',
+                      type=int)
+
+  parser.add_argument('--repeat',
+                      default=bt.kMinSamples,
+                      help='min nb rounds',
+                      type=int)
+  parser.add_argument('--precision',
+                      default=bt.kPrecision,
+                      help='target precision : 95%% CI half width / median',
+                      type=float)
+  parser.add_argument('--budget',
+                      default=bt.kBudget,
+                      help='time budget per point (s)',
+                      type=float)
+
+  # internal : measure a single point
+  parser.add_argument('--worker', help=ap.SUPPRESS, action='store_true')
+  parser.add_argument('--backend', default='smil', help=ap.SUPPRESS)
+  parser.add_argument('--function', default='erode', help=ap.SUPPRESS)
+  parser.add_argument('--threads', default=1, help=ap.SUPPRESS, type=int)
+  parser.add_argument('--tiles', default=1, help=ap.SUPPRESS, type=int)
+
+  cli = parser.parse_args()
+
+  if not cli.mode in ['strong', 'weak', 'both']:
+    print('mode must be "strong", "weak" or "both"')
+    exit(1)
+
+  if not cli.which in ['smil', 'skimage', 'both']:
+    print('which must be "smil", "skimage" or "both"')
+    exit(1)
+
+  return cli
+
+
+#
+# #    #   ####   #####   #    #  ######  #####
+# #    #  #    #  #    #  #   #   #       #    #
+# #    #  #    #  #    #  ####    #####   #    #
+# # ## #  #    #  #####   #  #    #       #####
+# ##  ##  #    #  #   #   #   #   #       #   #
+# #    #   ####   #    #  #    #  ######  #    #
+#
+# -----------------------------------------------------------------------------
+# Mosaic with nt copies of the source image, as close to a square as possible
+#
+def mosaicShape(nt):
+  ny = int(nt**0.5)
+  while nt % ny != 0:
+    ny -= 1
+  return nt // ny, ny
+
+
+def mkMosaic(sp, fin, nx=1, ny=1):
+  if bsy.isSynth(fin):
+    import benchPyramid as bp
+    return bp.arrayToSmil(bsy.synthGet(fin, nx, ny))
+
+  imIn = sp.Image(fin)
+  if nx == 1 and ny == 1:
+    return imIn
+
+  w = imIn.getWidth()
+  h = imIn.getHeight()
+
+  imOut = sp.Image(imIn)
+  imOut.setSize(w * nx, h * ny)
+
+  sp.copyPattern(imIn, 0, 0, w, h, imOut, nx, ny)
+  return imOut
+
+
+# -----------------------------------------------------------------------------
+# Measure one point and print it, as JSON, on the last line of stdout
+#
+def runWorker(cli):
+  import smilPython as sp
+  import benchOps as bo
+  import benchPyramid as bp
+
+  bo.setThreads(cli.threads)
+
+  nx, ny = mosaicShape(cli.tiles)
+  imSm = mkMosaic(sp, os.path.join('images', cli.image), nx, ny)
+  if sp.isBinary(imSm):
+    cli.binary = True
+
+  imIn = imSm
+  if cli.backend == 'skimage':
+    imIn = bp.smilArray(imSm)
+
+  # mosaic tiles keep the objects size : no area rescaling
+  call = bo.prepareOp(cli, cli.backend, cli.function, imIn, cli.seSize, 1)
+  if call is None:
+    print(json.dumps({'error': 'not implemented'}))
+    return 1
+
+  dt, info = bt.timeAdaptive(call,
+                             precision=cli.precision,
+                             budget=cli.budget,
+                             minSamples=cli.repeat)
+
+  res = {
+    'backend': cli.backend,
+    'function': cli.function,
+    'threads': cli.threads,
+    'smilThreads': bo.getThreads(),
+    'width': imSm.getWidth(),
+    'height': imSm.getHeight(),
+    'dt': dt,
+    'precision': info['precision'],
+  }
+  print(json.dumps(res))
+  return 0
+
+
+#
+#  ####   #    #  ######  ######  #####
+# #       #    #  #       #       #    #
+#  ####   #    #  #####   #####   #    #
+#      #  # ## #  #       #       #####
+# #    #  ##  ##  #       #       #
+#  ####   #    #  ######  ######  #
+#
+# -----------------------------------------------------------------------------
+#
+#
+def getThreadCounts(cli):
+  ncpu = len(os.sched_getaffinity(0))
+  nmax = cli.maxThreads if cli.maxThreads > 0 else ncpu
+  counts = []
+  nt = 1
+  while nt < nmax:
+    counts.append(nt)
+    nt *= 2
+  counts.append(nmax)
+  return counts
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def runPoint(cli, backend, fs, nt, tiles):
+  cpus = sorted(os.sched_getaffinity(0))[:nt]
+
+  cmd = [
+    sys.executable,
+    os.path.abspath(__file__), '--worker', '--backend', backend,
+    '--function', fs, '--threads',
+    str(nt), '--tiles',
+    str(tiles), '--image', cli.image, '--seSize',
+    str(cli.seSize), '--repeat',
+    str(cli.repeat), '--precision',
+    str(cli.precision), '--budget',
+    str(cli.budget)
+  ]
+  if cli.binary:
+    cmd.append('--binary')
+  if cli.squareSe:
+    cmd.append('--squareSe')
+  if not cli.arg is None:
+    cmd += ['--arg', str(cli.arg)]
+
+  env = dict(os.environ)
+  env['OMP_NUM_THREADS'] = str(nt)
+
+  r = subprocess.run(cmd,
+                     stdout=subprocess.PIPE,
+                     env=env,
+                     universal_newlines=True,
+                     preexec_fn=lambda: os.sched_setaffinity(0, cpus))
+  lines = r.stdout.strip().split('\n')
+  if r.returncode != 0 or len(lines) == 0:
+    return None
+  try:
+    res = json.loads(lines[-1])
+  except ValueError:
+    return None
+  if 'error' in res:
+    return None
+  res['tmin'] = min(res['dt'])
+  return res
+
+
+# -----------------------------------------------------------------------------
+# Amdahl : T(n) = T(1) * (f + (1 - f) / n). Least squares fit of the serial
+# fraction f on y = T(n)/T(1) - 1/n = f * (1 - 1/n)
+#
+def fitAmdahl(counts, times):
+  sxy = 0.
+  sxx = 0.
+  for n, t in zip(counts, times):
+    if n <= 1:
+      continue
+    x = 1. - 1. / n
+    y = t / times[0] - 1. / n
+    sxy += x * y
+    sxx += x * x
+  if sxx == 0:
+    return None
+  return min(max(sxy / sxx, 0.), 1.)
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def printScaling(mode, backend, fs, points):
+  t1 = points[0]['tmin']
+  print('* {:s} scaling - {:s} - {:s}'.format(mode, backend, fs))
+  print()
+  h = '  {:>7s} | {:>11s} | {:>11s} | {:>8s} | {:>10s}'.format(
+    'Threads', 'Size', 'T (ms)', 'Speedup', 'Efficiency')
+  print(h)
+  print('-' * (len(h) + 3))
+  for p in points:
+    n = p['threads']
+    if mode == 'strong':
+      sUp = t1 / p['tmin']
+      eff = sUp / n
+    else:
+      # work grows with n : scaled speed-up n * T(1) / T(n)
+      sUp = n * t1 / p['tmin']
+      eff = t1 / p['tmin']
+    p['speedup'] = sUp
+    p['efficiency'] = eff
+    size = '{:d}x{:d}'.format(p['width'], p['height'])
+    print('  {:7d} | {:>11s} | {:11.3f} | {:8.3f} | {:10.3f}'.format(
+      n, size, p['tmin'], sUp, eff))
+  if mode == 'strong':
+    f = fitAmdahl([p['threads'] for p in points], [p['tmin'] for p in points])
+    if not f is None:
+      print()
+      sMax = '{:.1f}'.format(1. / f) if f > 0 else 'inf'
+      print('  Amdahl serial fraction : {:.4f} - max speed-up : {:s}'.format(
+        f, sMax))
+  print()
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def saveScaling(cli, node, mode, fs, results):
+  if not os.path.isdir(node):
+    os.mkdir(node)
+  b = bsy.imageName(cli.image)
+  prefix = 'bin' if cli.binary else 'gray'
+  fName = '{:s}-{:s}-{:s}-threads-{:s}.csv'.format(prefix, b, fs, mode)
+
+  h = ['backend', 'threads', 'width', 'height', 'min', 'speedup', 'efficiency']
+  with open(os.path.join(node, fName), 'w') as fout:
+    fout.write(';'.join(h) + '\n')
+    for backend in results.keys():
+      for p in results[backend]:
+        sl = [
+          backend, '{:d}'.format(p['threads']), '{:d}'.format(p['width']),
+          '{:d}'.format(p['height']), '{:.5f}'.format(p['tmin']),
+          '{:.5f}'.format(p['speedup']), '{:.5f}'.format(p['efficiency'])
+        ]
+        fout.write(';'.join(sl) + '\n')
+
+
+# =============================================================================
+#
+#
+#
+def main(args):
+  cli = getCliArgs()
+
+  if cli.worker:
+    return runWorker(cli)
+
+  fin = os.path.join('images', cli.image)
+  if not bsy.isSynth(fin) and not os.path.isfile(fin):
+    print("Image file {:s} not found".format(cli.image))
+    return 1
+  if bsy.isSynth(fin) and bsy.isBinary(fin):
+    cli.binary = True
+
+  import benchOps as bo
+
+  funcs = [k for k in bo.smilOps.keys() if k in bo.skimageOps]
+  if not cli.funcs is None:
+    funcs = cli.funcs.split(',')
+  backends = kBackends if cli.which == 'both' else [cli.which]
+  modes = ['strong', 'weak'] if cli.mode == 'both' else [cli.mode]
+  counts = getThreadCounts(cli)
+
+  node = os.uname().nodename.split('.')[0]
+
+  dt = datetime.now()
+  print('Date     : {:s}'.format(dt.strftime("%d/%m/%Y %I:%M:%S %p")))
+  print('Image    : {:s}'.format(cli.image))
+  print('Threads  : {:s}'.format(' '.join([str(n) for n in counts])))
+  print()
+
+  for fs in funcs:
+    for mode in modes:
+      results = {}
+      for backend in backends:
+        points = []
+        for nt in counts:
+          tiles = cli.ri * cli.ri if mode == 'strong' else nt
+          p = runPoint(cli, backend, fs, nt, tiles)
+          if p is None:
+            break
+          points.append(p)
+        if len(points) == 0:
+          continue
+        printScaling(mode, backend, fs, points)
+        results[backend] = points
+      if len(results) > 0:
+        saveScaling(cli, node, mode, fs, results)
+
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv))
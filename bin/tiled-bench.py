@@ -0,0 +1,301 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  benchStore.py
+#
+#  Copyright 2021 jose-marcio <martins@jose-marcio.org>
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the  nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#  Tiled (halo overlap) execution against whole image calls.
+#
+#  For each function, SE size and backend : the whole image call is timed,
+#  then the tiled one for each tile size (the auto-tuner keeps the fastest),
+#  and throughput (Mpixel/s), tiled overhead and chosen tile are reported.
+#
+#  The input is a mosaic of ri x ri copies of the image (benchPyramid). The
+#  Smil library threads are set to 1 for tiled runs : parallelism comes from
+#  the tile pool.
+#
+import os
+import sys
+
+from datetime import datetime
+
+import argparse as ap
+
+import numpy as np
+
+import benchTiming as bt
+
+kBackends = ['smil', 'skimage']
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def getCliArgs():
+  parser = ap.ArgumentParser()
+
+  parser.add_argument('--debug', help='', action="store_true")
+  parser.add_argument('--verbose', help='', action="store_true")
+
+  parser.add_argument('--image',
+                      default='lena.png',
+                      help='Image file (in images/) or synthetic image (synth:...)',
+                      type=str)
+  parser.add_argument('--binary',
+                      default=False,
+                      help='Image is binary',
+                      action="store_true")
+  parser.add_argument('--squareSe',
+                      default=False,
+                      help='Structuring Element Square (default is Cross)',
+                      action='store_true')
+  parser.add_argument('--seSizes',
+                      default='1,2,4,8',
+                      help='comma separated SE sizes (default : 1,2,4,8)',
+                      type=str)
+  parser.add_argument('--arg', help='Generic argument', type=float)
+
+  parser.add_argument('--funcs',
+                      default='erode,open,gradient,tophat',
+                      help='comma separated list of functions',
+                      type=str)
+  parser.add_argument('--which',
+                      default='both',
+                      help='which ? both, smil skimage (default : both)',
+                      type=str)
+  parser.add_argument('--ri',
+                      default=4,
+                      help='image size multiplier (mosaic, default : 4)',
+                      type=int)
+  parser.add_argument('--mosaicDir',
+                      default=os.path.join('var', 'mosaic'),
+                      help='directory of the memory-mapped mosaics',
+                      type=str)
+
+  parser.add_argument('--threads',
+                      default=0,
+                      help='tile pool workers and Smil threads (default : CPUs)',
+                      type=int)
+  parser.add_argument('--tile',
+                      default=0,
+                      help='tile size (default : 0 - auto-tuned)',
+                      type=int)
+  parser.add_argument('--minTile',
+                      default=64,
+                      help='smallest tile size tried (default : 64)',
+                      type=int)
+  parser.add_argument('--verify',
+                      help='check tiled and whole image outputs are equal',
+                      action='store_true')
+
+  parser.add_argument('--repeat',
+                      default=bt.kMinSamples,
+                      help='min nb rounds',
+                      type=int)
+  parser.add_argument('--precision',
+                      default=bt.kPrecision,
+                      help='target precision : 95%% CI half width / median',
+                      type=float)
+  parser.add_argument('--budget',
+                      default=bt.kBudget,
+                      help='time budget per point (s)',
+                      type=float)
+  parser.add_argument('--tuneBudget',
+                      default=2.,
+                      help='time budget per tried tile size (s)',
+                      type=float)
+
+  cli = parser.parse_args()
+  if cli.threads <= 0:
+    cli.threads = len(os.sched_getaffinity(0))
+  return cli
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def timeMedian(cli, call, budget):
+  dt, info = bt.timeAdaptive(call,
+                             precision=cli.precision,
+                             budget=budget,
+                             minSamples=cli.repeat)
+  if cli.verbose:
+    print('    {:s}'.format(bt.infoString(info)))
+  return info['median']
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def printHeader():
+  h = '  {:8s} {:10s} {:>2s} | {:>6s} | {:>11s} {:>9s} | {:>11s} {:>9s} | {:>8s}'.format(
+    'Backend', 'Function', 'SE', 'Tile', 'Whole (ms)', 'Mpix/s', 'Tiled (ms)',
+    'Mpix/s', 'Overhead')
+  print(h)
+  print('-' * (len(h) + 3))
+
+
+def saveTiled(cli, node, results):
+  if not os.path.isdir(node):
+    os.mkdir(node)
+  b, _ = os.path.splitext(cli.image)
+  prefix = 'bin' if cli.binary else 'gray'
+  fName = '{:s}-{:s}-tiled.csv'.format(prefix, b)
+
+  h = [
+    'backend', 'function', 'se', 'width', 'height', 'workers', 'tile',
+    'whole', 'tiled', 'wholeMpix', 'tiledMpix', 'overhead', 'verify'
+  ]
+  with open(os.path.join(node, fName), 'w') as fout:
+    fout.write(';'.join(h) + '\n')
+    for r in results:
+      sl = [
+        r['backend'], r['function'], '{:d}'.format(r['se']),
+        '{:d}'.format(r['width']), '{:d}'.format(r['height']),
+        '{:d}'.format(cli.threads), '{:d}'.format(r['tile']),
+        '{:.5f}'.format(r['whole']), '{:.5f}'.format(r['tiled']),
+        '{:.3f}'.format(r['wholeMpix']), '{:.3f}'.format(r['tiledMpix']),
+        '{:.5f}'.format(r['overhead']), r['verify']
+      ]
+      fout.write(';'.join(sl) + '\n')
+
+
+# =============================================================================
+#
+#
+#
+def main(args):
+  cli = getCliArgs()
+
+  import benchSynth as bsy
+
+  fin = os.path.join('images', cli.image)
+  if bsy.isSynth(cli.image):
+    fin = cli.image
+    cli.image = bsy.specName(fin)
+  elif not os.path.isfile(fin):
+    print("Image file {:s} not found".format(cli.image))
+    return 1
+
+  import benchOps as bo
+  import benchPyramid as bp
+  import benchTiles as btl
+  import benchVerify as bv
+
+  funcs = [f for f in cli.funcs.split(',') if f in btl.kReach]
+  seSizes = [int(x) for x in cli.seSizes.split(',')]
+  backends = kBackends if cli.which == 'both' else [cli.which]
+
+  arr = bp.mosaicGet(fin, cli.ri, cli.ri, None, cli.mosaicDir)
+  imSm = bp.arrayToSmil(arr)
+  if bp.sp.isBinary(imSm):
+    cli.binary = True
+  arr = bp.smilArray(imSm)
+  h, w = arr.shape
+  mpix = w * h / 1e6
+
+  node = os.uname().nodename.split('.')[0]
+
+  dt = datetime.now()
+  print('Date     : {:s}'.format(dt.strftime("%d/%m/%Y %I:%M:%S %p")))
+  print('Image    : {:s} ({:d}x{:d} mosaic : {:d}x{:d})'.format(
+    cli.image, cli.ri, cli.ri, w, h))
+  print('Workers  : {:d}'.format(cli.threads))
+  print()
+  printHeader()
+
+  pool = btl.newPool(cli.threads)
+  results = []
+  for fs in funcs:
+    for sz in seSizes:
+      for backend in backends:
+        imIn = imSm if backend == 'smil' else arr
+
+        bo.setThreads(cli.threads)
+        call = bo.prepareOp(cli, backend, fs, imIn, sz, 1)
+        if call is None:
+          continue
+        tWhole = timeMedian(cli, call, cli.budget)
+
+        bo.setThreads(1)
+        out = btl.allocOutput(cli, backend, fs, arr, sz)
+        sizes = [cli.tile] if cli.tile > 0 else btl.tileSizes(
+          fs, sz, h, w, cli.minTile)
+        tile, tried = btl.autoTune(cli, backend, fs, arr, sz, pool, out, sizes,
+                                   lambda c: timeMedian(cli, c, cli.tuneBudget))
+        if tile is None:
+          continue
+        if cli.verbose:
+          for t, ms in tried:
+            print('    tile {:6d} : {:11.3f} ms - {:9.1f} Mpix/s'.format(
+              t, ms, 1000. * mpix / ms))
+        slots = btl.prepareTiles(cli, backend, fs, arr, sz, tile)
+        tTiled = timeMedian(
+          cli,
+          lambda: btl.runTiled(cli, backend, fs, arr, sz, tile, pool, out, slots),
+          cli.budget)
+        del slots
+        bo.prepDrop(None)
+
+        verdict = ''
+        if cli.verify:
+          res = bv.compareOutputs(bv.toArray(bo.runOp(cli, backend, fs, imIn, sz,
+                                                      1)), out, 'exact')
+          verdict = bv.verdictString(res)
+        bo.prepDrop(None)
+
+        r = {
+          'backend': backend,
+          'function': fs,
+          'se': sz,
+          'width': w,
+          'height': h,
+          'tile': tile,
+          'whole': tWhole,
+          'tiled': tTiled,
+          'wholeMpix': 1000. * mpix / tWhole,
+          'tiledMpix': 1000. * mpix / tTiled,
+          'overhead': tTiled / tWhole - 1.,
+          'verify': verdict,
+        }
+        results.append(r)
+        print('  {:8s} {:10s} {:2d} | {:6d} | {:11.3f} {:9.1f} | {:11.3f} {:9.1f} | {:+7.1f}% {:s}'.format(
+          backend, fs, sz, tile, tWhole, r['wholeMpix'], tTiled,
+          r['tiledMpix'], 100. * r['overhead'], verdict))
+
+  pool.shutdown()
+  print()
+  saveTiled(cli, node, results)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv))
@@ -0,0 +1,324 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  benchStore.py
+#
+#  Copyright 2021 jose-marcio <martins@jose-marcio.org>
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following disclaimer
+#    in the documentation and/or other materials provided with the
+#    distribution.
+#  * Neither the name of the  nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+#  "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+#  LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+#  A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+#  OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+#  SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+#  LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+#  DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+#  THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+#  (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+#  OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+#
+#  3D (volumetric) benchmark of Smil and skimage.
+#
+#  Volumes of side 64 up to 1024 voxels are generated (or cropped out of a
+#  volume file, e.g. micro-CT data) and erode, open, label, distance and
+#  watershed are timed in both libraries, with 3D structuring elements.
+#
+#  Each point runs inside a memory sampling phase : peak RSS of the call
+#  (kernel high water mark) and its increase over the RSS before the call
+#  are reported along with time and throughput. Points whose estimated
+#  memory needs exceed the available memory are skipped.
+#
+import os
+import sys
+import gc
+
+from datetime import datetime
+
+import argparse as ap
+
+import psutil
+
+import benchTiming as bt
+from memSampler import MemSampler
+
+kBackends = ['skimage', 'smil']
+kSeFuncs = ['erode', 'open']
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def getCliArgs():
+  parser = ap.ArgumentParser()
+
+  parser.add_argument('--debug', help='', action="store_true")
+  parser.add_argument('--verbose', help='', action="store_true")
+
+  parser.add_argument('--volume',
+                      default=None,
+                      help='volume file, .npy or read by Smil (default : generated)',
+                      type=str)
+  parser.add_argument('--sides',
+                      default='64,128,256,512,1024',
+                      help='comma separated volume sides (default : 64,...,1024)',
+                      type=str)
+  parser.add_argument('--seed',
+                      default=0,
+                      help='seed of generated volumes',
+                      type=int)
+  parser.add_argument('--binary',
+                      default=False,
+                      help='binary volume',
+                      action="store_true")
+  parser.add_argument('--volDir',
+                      default=os.path.join('var', 'volume'),
+                      help='directory of generated volumes',
+                      type=str)
+  parser.add_argument('--keep',
+                      help='keep generated volume files when done',
+                      action='store_true')
+
+  parser.add_argument('--squareSe',
+                      default=False,
+                      help='Structuring Element Cube (default is Cross3D)',
+                      action='store_true')
+  parser.add_argument('--seSizes',
+                      default='1,2,4',
+                      help='comma separated SE sizes of erode and open',
+                      type=str)
+
+  parser.add_argument('--funcs',
+                      default='erode,open,label,distance,watershed',
+                      help='comma separated list of functions',
+                      type=str)
+  parser.add_argument('--which',
+                      default='both',
+                      help='which ? both, smil skimage (default : both)',
+                      type=str)
+  parser.add_argument('--threads',
+                      default=0,
+                      help='Smil threads (default : 0 - unchanged)',
+                      type=int)
+
+  parser.add_argument('--repeat',
+                      default=bt.kMinSamples,
+                      help='min nb rounds',
+                      type=int)
+  parser.add_argument('--precision',
+                      default=bt.kPrecision,
+                      help='target precision : 95%% CI half width / median',
+                      type=float)
+  parser.add_argument('--budget',
+                      default=bt.kBudget,
+                      help='time budget per point (s)',
+                      type=float)
+  parser.add_argument('--memdt',
+                      default=10.,
+                      help='memory sampling period (ms)',
+                      type=float)
+  parser.add_argument('--verify',
+                      help='check Smil and skimage outputs are equivalent',
+                      action='store_true')
+
+  cli = parser.parse_args()
+  # name used by the prepare cache and the output files
+  cli.image = 'synth'
+  if not cli.volume is None:
+    cli.image = os.path.basename(cli.volume)
+  return cli
+
+
+# -----------------------------------------------------------------------------
+#
+#
+def printHeader():
+  h = '  {:>5s} {:8s} {:10s} {:>2s} | {:>11s} {:>9s} | {:>10s} {:>10s} | {:s}'.format(
+    'Side', 'Backend', 'Function', 'SE', 'Median (ms)', 'Mvox/s',
+    'Peak (MB)', 'Extra (MB)', 'Verify')
+  print(h)
+  print('-' * (len(h) + 3))
+
+
+def saveVolume(cli, bOut, results):
+  h = [
+    'side', 'backend', 'function', 'se', 'median', 'ciLow', 'ciHigh',
+    'samples', 'mvox', 'peakRSS', 'extraRSS', 'status', 'verify'
+  ]
+  with open(bOut + '.csv', 'w') as fout:
+    fout.write(';'.join(h) + '\n')
+    for r in results:
+      sl = [
+        '{:d}'.format(r['side']), r['backend'], r['function'],
+        '{:d}'.format(r['se']), '{:.5f}'.format(r['median']),
+        '{:.5f}'.format(r['ciLow']), '{:.5f}'.format(r['ciHigh']),
+        '{:d}'.format(r['samples']), '{:.3f}'.format(r['mvox']),
+        '{:d}'.format(r['peak'] // 1024), '{:d}'.format(r['extra'] // 1024),
+        r['status'], r['verify']
+      ]
+      fout.write(';'.join(sl) + '\n')
+
+
+# =============================================================================
+#
+#
+#
+def main(args):
+  cli = getCliArgs()
+
+  if not cli.volume is None and not os.path.isfile(cli.volume):
+    print("Volume file {:s} not found".format(cli.volume))
+    return 1
+
+  import benchOps as bo
+  import benchPyramid as bp
+  import benchVerify as bv
+  import benchVolume as bvol
+
+  funcs = [f for f in cli.funcs.split(',') if f in bvol.kOps['smil']]
+  sides = [int(x) for x in cli.sides.split(',')]
+  seSizes = [int(x) for x in cli.seSizes.split(',')]
+  backends = kBackends if cli.which == 'both' else [cli.which]
+
+  bo.setThreads(cli.threads)
+
+  node = os.uname().nodename.split('.')[0]
+  if not os.path.isdir(node):
+    os.mkdir(node)
+  prefix = 'bin' if cli.binary else 'gray'
+  b, _ = os.path.splitext(cli.image)
+  bOut = os.path.join(node, 'volume-{:s}-{:s}'.format(prefix, b))
+
+  dt = datetime.now()
+  print('Date     : {:s}'.format(dt.strftime("%d/%m/%Y %I:%M:%S %p")))
+  print('Volume   : {:s}'.format(cli.image))
+  print('SE       : {:s}'.format('Cube' if cli.squareSe else 'Cross3D'))
+  print()
+  printHeader()
+
+  proc = psutil.Process()
+  sampler = MemSampler(cli.memdt / 1000.)
+  sampler.start()
+
+  results = []
+  for side in sides:
+    vol = bvol.volumeGet(side, cli.volume, cli.seed, cli.binary,
+                         vDir=cli.volDir)
+    if vol is None:
+      print('  {:5d} volume smaller than that : skipped'.format(side))
+      continue
+    mvox = vol.size / 1e6
+
+    imSm = None
+    for fs in funcs:
+      sizes = seSizes if fs in kSeFuncs else [1]
+      for sz in sizes:
+        name = 'volume-{:s}-{:s}-{:d}-{:d}'.format(prefix, fs, side, sz)
+        need = bvol.kMemFactor.get(fs, 1) * vol.nbytes
+        for backend in backends:
+          r = {
+            'side': side,
+            'backend': backend,
+            'function': fs,
+            'se': sz,
+            'median': 0.,
+            'ciLow': 0.,
+            'ciHigh': 0.,
+            'samples': 0,
+            'mvox': 0.,
+            'peak': 0,
+            'extra': 0,
+            'status': 'ok',
+            'verify': '',
+          }
+          results.append(r)
+          if need > psutil.virtual_memory().available:
+            r['status'] = 'memory'
+            print('  {:5d} {:8s} {:10s} {:2d} | needs ~ {:.1f} GB : skipped'.
+                  format(side, backend, fs, sz, need / 2**30))
+            continue
+
+          if backend == 'smil':
+            if imSm is None:
+              # Smil can't wrap NumPy arrays : its own copy of the volume
+              imSm = bp.arrayToSmil(vol)
+            imIn = imSm
+          else:
+            imIn = vol
+
+          call = bo.prepareOp(cli, backend, fs, imIn, sz, side,
+                              ops=bvol.kOps)
+          gc.collect()
+          rss0 = proc.memory_info().rss
+          with sampler.phase(backend=backend, function=fs, size=side):
+            dts, info = bt.timeAdaptive(call,
+                                        precision=cli.precision,
+                                        budget=cli.budget,
+                                        minSamples=cli.repeat)
+          del call
+          hwm = sampler.phases[-1]['hwm']
+          r['median'] = info['median']
+          r['ciLow'] = info['ciLow']
+          r['ciHigh'] = info['ciHigh']
+          r['samples'] = info['samples']
+          r['mvox'] = 1000. * mvox / info['median']
+          r['peak'] = hwm
+          r['extra'] = max(hwm - rss0, 0)
+
+          # skimage runs first : its output is the reference
+          if cli.verify and cli.which == 'both':
+            out = bo.runOp(cli, backend, fs, imIn, sz, side,
+                           ops=bvol.kOps)
+            if backend == 'skimage':
+              bv.saveReference(name, out)
+            else:
+              ref = bv.loadReference(name)
+              res = None
+              mode = bv.verifyMode(fs)
+              if not ref is None and not mode is None:
+                res = bv.compareOutputs(ref, out, mode)
+              r['verify'] = bv.verdictString(res)
+              del ref
+              bv.dropReference(name)
+            del out
+
+          print(
+            '  {:5d} {:8s} {:10s} {:2d} | {:11.3f} {:9.2f} | {:10.1f} {:10.1f} | {:s}'
+            .format(side, backend, fs, sz, r['median'], r['mvox'],
+                    r['peak'] / 2**20, r['extra'] / 2**20, r['verify']))
+          if cli.verbose:
+            print('      {:s}'.format(bt.infoString(info)))
+
+    bo.prepDrop(None)
+    del imSm
+    del vol
+    gc.collect()
+    if cli.volume is None and not cli.keep:
+      fPath = bvol.volumeFile(side, cli.seed, cli.binary, vDir=cli.volDir)
+      if os.path.isfile(fPath):
+        os.remove(fPath)
+
+  sampler.stop()
+  print()
+  saveVolume(cli, bOut, results)
+  sampler.saveSamples(bOut + '-mem-samples.csv')
+  sampler.saveSummary(bOut + '-mem.csv')
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv))